@@ -0,0 +1,363 @@
+"""
+Reproducible synthetic document corpus for the conversion benchmarks.
+
+Documents are built from a seeded word list with only the standard library
+(hand-written OOXML for .docx/.xlsx, a minimal text PDF writer and a PNG
+encoder), so the same arguments always produce the same bytes. .pptx files
+are generated with python-pptx, which markitdown[pptx] already depends on,
+and are skipped if it is not installed.
+"""
+import io
+import os
+import random
+import struct
+import datetime
+import zipfile
+import zlib
+from typing import Dict, List, Optional, Union
+from xml.sax.saxutils import escape
+
+WORDS = (
+    "project budget schedule risk owner status review design test release "
+    "customer contract invoice payment delivery server network database backup "
+    "security audit policy report summary meeting action decision quarter target "
+    "revenue cost margin forecast team resource milestone scope change request"
+).split()
+
+# Fixed timestamp for zip entries so archives are byte-for-byte reproducible
+ZIP_DATE = (2020, 1, 1, 0, 0, 0)
+
+# Files generated per format and document sizes for each preset
+SIZE_PRESETS: Dict[str, Dict[str, int]] = {
+    "small": {"files_per_format": 5, "rows": 200, "pages": 3, "slides": 5, "paragraphs": 40},
+    "medium": {"files_per_format": 20, "rows": 2000, "pages": 20, "slides": 20, "paragraphs": 300},
+    "large": {"files_per_format": 50, "rows": 20000, "pages": 100, "slides": 60, "paragraphs": 2000},
+}
+
+def _sentence(rng: random.Random, words: int = 10) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def _write_zip(path: str, parts: Dict[str, Union[str, bytes]]) -> None:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, content in parts.items():
+            info = zipfile.ZipInfo(name, date_time=ZIP_DATE)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            zf.writestr(info, content.encode("utf-8") if isinstance(content, str) else content)
+
+# ----- Word -----
+
+def write_docx(path: str, rng: random.Random, paragraphs: int) -> None:
+    """
+    Write a .docx with headings, body paragraphs and a table.
+
+    Args:
+        path: Destination file path
+        rng: Seeded random generator
+        paragraphs: Number of body paragraphs
+    """
+    body = []
+    for i in range(paragraphs):
+        if i % 10 == 0:
+            body.append(f'<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr><w:r><w:t>Section {i // 10 + 1}: {escape(_sentence(rng, 4))}</w:t></w:r></w:p>')
+        body.append(f"<w:p><w:r><w:t>{escape(' '.join(_sentence(rng) for _ in range(3)))}</w:t></w:r></w:p>")
+    rows = []
+    for r in range(20):
+        cells = "".join(f"<w:tc><w:p><w:r><w:t>{escape(rng.choice(WORDS) if r else f'Column {c + 1}')}</w:t></w:r></w:p></w:tc>" for c in range(4))
+        rows.append(f"<w:tr>{cells}</w:tr>")
+    body.append(f"<w:tbl>{''.join(rows)}</w:tbl>")
+
+    _write_zip(path, {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+            '</Relationships>'
+        ),
+        "word/document.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{''.join(body)}</w:body></w:document>"
+        ),
+    })
+
+# ----- Excel -----
+
+def _column_name(index: int) -> str:
+    name = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(65 + remainder) + name
+    return name
+
+def write_xlsx(path: str, rng: random.Random, rows: int, sheets: int = 3, columns: int = 8) -> None:
+    """
+    Write an .xlsx with several large sheets of text, numbers and empty cells.
+
+    Args:
+        path: Destination file path
+        rng: Seeded random generator
+        rows: Number of data rows per sheet
+        sheets: Number of sheets
+        columns: Number of columns per sheet
+    """
+    parts = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + "".join(
+                f'<Override PartName="/xl/worksheets/sheet{s + 1}.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for s in range(sheets)
+            )
+            + '</Types>'
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ),
+        "xl/workbook.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + "".join(f'<sheet name="Sheet{s + 1}" sheetId="{s + 1}" r:id="rId{s + 1}"/>' for s in range(sheets))
+            + '</sheets></workbook>'
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(
+                f'<Relationship Id="rId{s + 1}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet{s + 1}.xml"/>'
+                for s in range(sheets)
+            )
+            + '</Relationships>'
+        ),
+    }
+    for s in range(sheets):
+        sheet_rows = []
+        for r in range(rows + 1):
+            cells = []
+            for c in range(columns):
+                ref = f"{_column_name(c)}{r + 1}"
+                if r == 0:
+                    cells.append(f'<c r="{ref}" t="inlineStr"><is><t>{escape(rng.choice(WORDS).title())} {c + 1}</t></is></c>')
+                elif c % 3 == 2 and rng.random() < 0.3:
+                    # Leave gaps, they show up as NaN cells in the converted tables
+                    continue
+                elif c % 2:
+                    cells.append(f'<c r="{ref}"><v>{rng.randint(0, 100000) / 100}</v></c>')
+                else:
+                    cells.append(f'<c r="{ref}" t="inlineStr"><is><t>{escape(rng.choice(WORDS))}</t></is></c>')
+            sheet_rows.append(f'<row r="{r + 1}">{"".join(cells)}</row>')
+        parts[f"xl/worksheets/sheet{s + 1}.xml"] = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f"<sheetData>{''.join(sheet_rows)}</sheetData></worksheet>"
+        )
+    _write_zip(path, parts)
+
+# ----- PowerPoint -----
+
+def write_pptx(path: str, rng: random.Random, slides: int) -> bool:
+    """
+    Write a .pptx with a title and bullet points per slide.
+
+    Args:
+        path: Destination file path
+        rng: Seeded random generator
+        slides: Number of slides
+
+    Returns:
+        False if python-pptx is not installed
+    """
+    try:
+        from pptx import Presentation
+    except ImportError:
+        return False
+    presentation = Presentation()
+    presentation.core_properties.created = datetime.datetime(*ZIP_DATE)
+    presentation.core_properties.modified = datetime.datetime(*ZIP_DATE)
+    for i in range(slides):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+        slide.shapes.title.text = f"Slide {i + 1}: {_sentence(rng, 4)}"
+        body = slide.placeholders[1].text_frame
+        body.text = _sentence(rng)
+        for _ in range(4):
+            body.add_paragraph().text = _sentence(rng)
+        slide.notes_slide.notes_text_frame.text = _sentence(rng, 20)
+    buffer = io.BytesIO()
+    presentation.save(buffer)
+    # Re-pack with fixed entry dates, python-pptx stamps the current time
+    with zipfile.ZipFile(buffer) as zf:
+        _write_zip(path, {name: zf.read(name) for name in zf.namelist()})
+    return True
+
+# ----- PDF -----
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path: str, rng: random.Random, pages: int, lines_per_page: int = 45) -> None:
+    """
+    Write a text PDF using the built-in Helvetica font.
+
+    Args:
+        path: Destination file path
+        rng: Seeded random generator
+        pages: Number of pages
+        lines_per_page: Lines of text per page
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{4 + 2 * i} 0 R" for i in range(pages)), pages)).encode("ascii"),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(pages):
+        lines = [f"Page {i + 1}"] + [_sentence(rng, 12) for _ in range(lines_per_page)]
+        stream = ("BT /F1 10 Tf 14 TL 60 780 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET").encode("latin-1")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode("ascii"))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    with open(path, "wb") as f:
+        f.write(out)
+
+# ----- Images -----
+
+def write_png(path: str, rng: random.Random, width: int = 640, height: int = 480) -> None:
+    """
+    Write an RGB PNG with a seeded block pattern.
+
+    Args:
+        path: Destination file path
+        rng: Seeded random generator
+        width: Image width in pixels
+        height: Image height in pixels
+    """
+    palette = [bytes(rng.randrange(256) for _ in range(3)) for _ in range(16)]
+    rows = []
+    for y in range(height):
+        row = bytearray(b"\x00")
+        for x in range(width):
+            row += palette[((x // 32) + (y // 32) * 3) % len(palette)]
+        rows.append(bytes(row))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    png = b"\x89PNG\r\n\x1a\n"
+    png += chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+    png += chunk(b"IDAT", zlib.compress(b"".join(rows), 6))
+    png += chunk(b"IEND", b"")
+    with open(path, "wb") as f:
+        f.write(png)
+
+# ----- Corpus -----
+
+def write_document(path: str, seed: int, rows: int, pages: int, slides: int, paragraphs: int) -> bool:
+    """
+    Write one document whose format is taken from the file extension.
+
+    Args:
+        path: Destination file path
+        seed: Seed for the document content
+        rows: Rows per sheet for .xlsx
+        pages: Pages for .pdf
+        slides: Slides for .pptx
+        paragraphs: Paragraphs for .docx
+
+    Returns:
+        False if the format could not be generated in this environment
+    """
+    rng = random.Random(seed)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".docx":
+        write_docx(path, rng, paragraphs)
+    elif ext == ".xlsx":
+        write_xlsx(path, rng, rows)
+    elif ext == ".pptx":
+        return write_pptx(path, rng, slides)
+    elif ext == ".pdf":
+        write_pdf(path, rng, pages)
+    elif ext == ".png":
+        write_png(path, rng)
+    else:
+        raise ValueError(f"Unsupported benchmark format: {ext}")
+    return True
+
+def generate_corpus(root: str, size: str = "small", formats: Optional[List[str]] = None, seed: int = 0, **overrides: int) -> Dict[str, List[str]]:
+    """
+    Generate a corpus with one sub-folder per format.
+
+    Args:
+        root: Folder to create the corpus in
+        size: Name of a SIZE_PRESETS entry
+        formats: Extensions to generate (default: .docx, .xlsx, .pptx, .pdf, .png)
+        seed: Base seed, the same seed always gives the same corpus
+        **overrides: Values replacing the preset (files_per_format, rows, pages, slides, paragraphs)
+
+    Returns:
+        Dict mapping extension to the generated file paths
+    """
+    params = dict(SIZE_PRESETS[size])
+    params.update({key: value for key, value in overrides.items() if value is not None})
+    formats = formats or [".docx", ".xlsx", ".pptx", ".pdf", ".png"]
+
+    corpus: Dict[str, List[str]] = {}
+    for ext in formats:
+        folder = os.path.join(root, ext.lstrip("."))
+        os.makedirs(folder, exist_ok=True)
+        paths = []
+        for i in range(params["files_per_format"]):
+            path = os.path.join(folder, f"doc_{i:04d}{ext}")
+            if not write_document(path, seed * 100003 + i, params["rows"], params["pages"], params["slides"], params["paragraphs"]):
+                break
+            paths.append(path)
+        if paths:
+            corpus[ext] = paths
+    return corpus
+
+def modify_corpus(corpus: Dict[str, List[str]], fraction: float, seed: int = 1, size: str = "small", **overrides: int) -> List[str]:
+    """
+    Regenerate a deterministic fraction of the corpus with new content.
+
+    Args:
+        corpus: Result of generate_corpus
+        fraction: Share of files to change in each format
+        seed: Seed for the new content
+        size: Name of a SIZE_PRESETS entry
+        **overrides: Values replacing the preset
+
+    Returns:
+        Paths of the changed files
+    """
+    params = dict(SIZE_PRESETS[size])
+    params.update({key: value for key, value in overrides.items() if value is not None})
+    changed = []
+    for paths in corpus.values():
+        count = max(1, int(len(paths) * fraction))
+        for i, path in enumerate(paths[:count]):
+            write_document(path, seed * 100003 + i + 7919, params["rows"], params["pages"], params["slides"], params["paragraphs"])
+            changed.append(path)
+    return changed
@@ -0,0 +1,426 @@
+#!/usr/bin/env python
+"""
+End-to-end conversion benchmarks on a synthetic corpus.
+
+Scenarios:
+- startup: import time of convert_cli and wall time of "cvmd --help", checked against a budget
+- cold: first conversion of the whole corpus into an empty output folder
+- warm_noop: the same run again with nothing changed
+- partial: a fraction of the documents rewritten, then converted again
+- per_format: cold conversion of each format on its own, as files/s and MB/s
+- postprocess: time, peak memory and output size of the post-processing stage against
+  the former blanket "NaN" replace, on the largest spreadsheet of the corpus
+- serve: every document posted to a local "cvmd serve" endpoint by concurrent clients,
+  against one "cvmd convert" process per document
+
+Everything runs locally (no pip, no GitHub) in a temporary project folder and
+the results are printed or written as JSON so runs can be compared over time.
+
+Usage:
+    python benchmarks/run_benchmarks.py --size small --output results.json
+    python benchmarks/run_benchmarks.py --scenarios startup --check-startup
+"""
+import os
+import io
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from corpus import SIZE_PRESETS, generate_corpus, modify_corpus
+
+SCENARIOS = ["startup", "cold", "warm_noop", "partial", "per_format", "postprocess", "serve"]
+
+# Modules that must not be imported just to print the CLI help
+HEAVY_MODULES = ["markitdown", "requests", "pandas", "concurrent.futures", "multiprocessing"]
+
+# ----- Helpers -----
+
+def folder_size(paths: List[str]) -> int:
+    return sum(os.path.getsize(path) for path in paths)
+
+def timed_convert(input_path: str, output_folder: str, config: Dict[str, Any], jobs: Optional[int]) -> Dict[str, Any]:
+    """
+    Run convert_files once with its console output suppressed.
+
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files
+        config: Configuration dictionary
+        jobs: Number of worker processes
+
+    Returns:
+        Dict with the wall time and the number of converted files
+    """
+    from convert_utils import convert_files
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        converted = convert_files(input_path, output_folder, config["file_types"], config, jobs=jobs)
+    elapsed = time.perf_counter() - start
+    manifest_line = next((line for line in log.getvalue().splitlines() if line.startswith("Manifest:")), None)
+    return {"seconds": round(elapsed, 4), "converted": len(converted), "manifest": manifest_line}
+
+def run_python(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable] + args, cwd=REPO_DIR, capture_output=True, text=True)
+
+# ----- Scenarios -----
+
+def bench_startup(repeat: int, budget_ms: float) -> Dict[str, Any]:
+    """
+    Measure how long the CLI takes before doing any work.
+
+    Args:
+        repeat: Number of runs per measurement, the median is reported
+        budget_ms: Allowed "cvmd --help" time above a bare interpreter start
+
+    Returns:
+        Dict with import times, help wall times, heavy modules loaded and the budget verdict
+    """
+    def wall_ms(args: List[str]) -> float:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run_python(args)
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    baseline_ms = wall_ms(["-c", "pass"])
+    help_ms = wall_ms(["convert_cli.py", "--help"])
+
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    imported = run_python(["-X", "importtime", "convert_cli.py", "--help"]).stderr
+    modules = [line.rsplit("|", 1)[-1].strip() for line in imported.splitlines() if line.startswith("import time:") and "|" in line]
+    heavy_loaded = [name for name in HEAVY_MODULES if name in modules]
+
+    module_import = run_python(["-X", "importtime", "-c", "import convert_cli"]).stderr
+    match = re.search(r"^import time:\s+\d+\s+\|\s+(\d+)\s+\|\s+convert_cli\s*$", module_import, re.MULTILINE)
+
+    overhead_ms = help_ms - baseline_ms
+    return {
+        "interpreter_ms": round(baseline_ms, 1),
+        "help_ms": round(help_ms, 1),
+        "overhead_ms": round(overhead_ms, 1),
+        "convert_cli_import_ms": round(int(match.group(1)) / 1000, 1) if match else None,
+        "heavy_modules_loaded": heavy_loaded,
+        "budget_ms": budget_ms,
+        "within_budget": overhead_ms <= budget_ms and not heavy_loaded
+    }
+
+def bench_conversion(work_dir: str, corpus: Dict[str, List[str]], config: Dict[str, Any], jobs: Optional[int], scenarios: List[str], size: str, change_fraction: float, overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Time the cold, warm no-op and partially changed runs on the whole corpus.
+
+    Args:
+        work_dir: Temporary project folder holding the corpus
+        corpus: Result of generate_corpus
+        config: Configuration dictionary
+        jobs: Number of worker processes
+        scenarios: Selected scenario names
+        size: Corpus size preset
+        change_fraction: Share of documents rewritten for the partial scenario
+        overrides: Corpus parameters overriding the preset
+
+    Returns:
+        Dict mapping scenario name to its measurements
+    """
+    input_path = os.path.join(work_dir, "corpus")
+    output_folder = os.path.join(work_dir, "doc_base")
+    total_files = sum(len(paths) for paths in corpus.values())
+    results: Dict[str, Any] = {}
+
+    # The warm and partial runs need the cold run's output and manifest
+    cold = timed_convert(input_path, output_folder, config, jobs)
+    if "cold" in scenarios:
+        cold["files_per_second"] = round(total_files / cold["seconds"], 2) if cold["seconds"] else None
+        results["cold"] = cold
+    if "warm_noop" in scenarios:
+        results["warm_noop"] = timed_convert(input_path, output_folder, config, jobs)
+    if "partial" in scenarios:
+        changed = modify_corpus(corpus, change_fraction, size=size, **overrides)
+        partial = timed_convert(input_path, output_folder, config, jobs)
+        partial["changed_files"] = len(changed)
+        results["partial"] = partial
+    return results
+
+def bench_per_format(work_dir: str, corpus: Dict[str, List[str]], config: Dict[str, Any], jobs: Optional[int]) -> Dict[str, Any]:
+    """
+    Time a cold conversion of each format separately.
+
+    Args:
+        work_dir: Temporary project folder holding the corpus
+        corpus: Result of generate_corpus
+        config: Configuration dictionary
+        jobs: Number of worker processes
+
+    Returns:
+        Dict mapping extension to its throughput
+    """
+    results: Dict[str, Any] = {}
+    for ext, paths in corpus.items():
+        input_path = os.path.dirname(paths[0])
+        output_folder = os.path.join(work_dir, f"doc_base_{ext.lstrip('.')}")
+        run = timed_convert(input_path, output_folder, config, jobs)
+        size_mb = folder_size(paths) / (1024 * 1024)
+        results[ext] = {
+            "files": len(paths),
+            "input_mb": round(size_mb, 3),
+            "seconds": run["seconds"],
+            "files_per_second": round(len(paths) / run["seconds"], 2) if run["seconds"] else None,
+            "mb_per_second": round(size_mb / run["seconds"], 3) if run["seconds"] else None
+        }
+        shutil.rmtree(output_folder, ignore_errors=True)
+    return results
+
+def bench_postprocess(corpus: Dict[str, List[str]], config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compare the post-processing stage with the blanket "NaN" replace it replaced.
+
+    The largest spreadsheet is converted once and both variants run on the same
+    Markdown. Peak memory counts only what each variant allocates on top of it.
+
+    Args:
+        corpus: Result of generate_corpus
+        config: Configuration dictionary
+
+    Returns:
+        Dict with the Markdown size and, per variant, its time, peak memory and output size
+    """
+    import tracemalloc
+    from convert_utils import build_markitdown, get_converter_settings
+    from convert_markdown import postprocess_markdown
+
+    paths = corpus.get(".xlsx")
+    if not paths:
+        return {"skipped": "no .xlsx files in the corpus"}
+    path = max(paths, key=os.path.getsize)
+    text = build_markitdown(config).convert(path).text_content
+    settings = get_converter_settings(config)
+    variants = {
+        "nan_replace": lambda: text.replace("NaN", ""),
+        "postprocess": lambda: postprocess_markdown(text, settings)
+    }
+
+    results: Dict[str, Any] = {"input_mb": round(os.path.getsize(path) / (1024 * 1024), 3), "markdown_bytes": len(text.encode("utf-8"))}
+    for name, variant in variants.items():
+        # Timed without tracemalloc, which slows allocations down
+        start = time.perf_counter()
+        variant()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        output = variant()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {
+            "seconds": round(elapsed, 4),
+            "peak_mb": round(peak / (1024 * 1024), 3),
+            "output_bytes": len(output.encode("utf-8"))
+        }
+        del output
+    return results
+
+def bench_serve(corpus: Dict[str, List[str]], config: Dict[str, Any], jobs: Optional[int], concurrency: int, cli_samples: int = 5) -> Dict[str, Any]:
+    """
+    Load-test the conversion server with every document of the corpus.
+
+    The server listens on a free loopback port in this process and clients post
+    the documents from concurrency threads once the workers are warm. A few
+    documents are also converted with one "cvmd convert" process each, the cost
+    the server saves.
+
+    Args:
+        corpus: Result of generate_corpus
+        config: Configuration dictionary
+        jobs: Number of worker processes
+        concurrency: Number of concurrent clients
+        cli_samples: Documents converted with "cvmd convert" for comparison
+
+    Returns:
+        Dict with throughput, client latency percentiles, status counts, the server's metrics
+        and the per-document time of "cvmd convert"
+    """
+    import threading
+    import http.client
+    import concurrent.futures
+    from convert_server import ConversionServer, make_http_server
+    from convert_utils import percentile
+
+    paths = [path for ext_paths in corpus.values() for path in ext_paths]
+    conversion = ConversionServer(config, jobs, queue_size=concurrency)
+    server = make_http_server(conversion, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    def post(path: str) -> Tuple[int, float]:
+        with open(path, "rb") as f:
+            data = f.read()
+        start = time.perf_counter()
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+        try:
+            connection.request("POST", f"/convert?format={os.path.splitext(path)[1].lstrip('.')}", body=data)
+            response = connection.getresponse()
+            response.read()
+            return response.status, time.perf_counter() - start
+        finally:
+            connection.close()
+
+    try:
+        # One request per worker first, so the timed run only sees warm workers
+        with concurrent.futures.ThreadPoolExecutor(conversion.jobs) as executor:
+            list(executor.map(post, paths[:conversion.jobs]))
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+            responses = list(executor.map(post, paths))
+        elapsed = time.perf_counter() - start
+        metrics = conversion.metrics()
+    finally:
+        server.shutdown()
+        server.server_close()
+        conversion.close()
+
+    latencies = [latency for _, latency in responses]
+    statuses: Dict[str, int] = {}
+    for status, _ in responses:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    cli_seconds = []
+    for path in paths[:cli_samples]:
+        start = time.perf_counter()
+        run_python(["convert_cli.py", "convert", path])
+        cli_seconds.append(time.perf_counter() - start)
+
+    return {
+        "requests": len(paths),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 4),
+        "requests_per_second": round(len(paths) / elapsed, 2) if elapsed else None,
+        "latency_s": {f"p{pct}": round(percentile(latencies, pct), 4) for pct in (50, 90, 99)},
+        "statuses": statuses,
+        "server": metrics,
+        "cli_convert_s": round(statistics.median(cli_seconds), 4) if cli_seconds else None
+    }
+
+# ----- Report -----
+
+def describe_environment(jobs: Optional[int]) -> Dict[str, Any]:
+    try:
+        from importlib.metadata import version
+        markitdown_version = version("markitdown")
+    except Exception:
+        markitdown_version = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "jobs": jobs or os.cpu_count(),
+        "markitdown": markitdown_version,
+        "commit": commit
+    }
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark document conversion on a synthetic corpus.")
+    parser.add_argument("--size", choices=sorted(SIZE_PRESETS), default="small",
+                        help="Corpus size preset (default: small)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run (default: {','.join(SCENARIOS)})")
+    parser.add_argument("--formats", default=".docx,.xlsx,.pptx,.pdf,.png",
+                        help="Comma-separated formats in the corpus")
+    parser.add_argument("--files-per-format", type=int, help="Override the preset file count per format")
+    parser.add_argument("--rows", type=int, help="Override the preset rows per Excel sheet")
+    parser.add_argument("--pages", type=int, help="Override the preset pages per PDF")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed (default: 0)")
+    parser.add_argument("--change-fraction", type=float, default=0.1,
+                        help="Share of documents rewritten for the partial scenario (default: 0.1)")
+    parser.add_argument("--jobs", "-j", type=int, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per startup measurement (default: 5)")
+    parser.add_argument("--startup-budget-ms", type=float, default=100.0,
+                        help="Allowed CLI startup overhead over a bare interpreter (default: 100)")
+    parser.add_argument("--check-startup", action="store_true",
+                        help="Exit with status 1 if the startup scenario is over budget")
+    parser.add_argument("--serve-concurrency", type=int, default=8,
+                        help="Concurrent clients for the serve scenario (default: 8)")
+    parser.add_argument("--work-dir", help="Keep the corpus and outputs in this folder instead of a temporary one")
+    parser.add_argument("--output", "-o", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_arguments()
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    overrides = {"files_per_format": args.files_per_format, "rows": args.rows, "pages": args.pages}
+    config = {
+        "file_types": [ext.strip() for ext in args.formats.split(",") if ext.strip()],
+        "ignore_patterns": [],
+        "converter_options": {}
+    }
+    report: Dict[str, Any] = {"environment": describe_environment(args.jobs), "corpus": None, "results": {}}
+
+    if "startup" in scenarios:
+        report["results"]["startup"] = bench_startup(args.repeat, args.startup_budget_ms)
+
+    if any(name != "startup" for name in scenarios):
+        work_dir = os.path.abspath(args.work_dir) if args.work_dir else tempfile.mkdtemp(prefix="cvmd-bench-")
+        os.makedirs(work_dir, exist_ok=True)
+        previous_cwd = os.getcwd()
+        # convert_files writes project files (.vscode, .gitignore, rules) into the current folder
+        os.chdir(work_dir)
+        try:
+            start = time.perf_counter()
+            corpus = generate_corpus(os.path.join(work_dir, "corpus"), args.size, config["file_types"], args.seed, **overrides)
+            report["corpus"] = {
+                "size": args.size,
+                "seed": args.seed,
+                "generate_seconds": round(time.perf_counter() - start, 3),
+                "formats": {ext: {"files": len(paths), "mb": round(folder_size(paths) / (1024 * 1024), 3)} for ext, paths in corpus.items()}
+            }
+            if "per_format" in scenarios:
+                report["results"]["per_format"] = bench_per_format(work_dir, corpus, config, args.jobs)
+            if any(name in scenarios for name in ("cold", "warm_noop", "partial")):
+                report["results"].update(bench_conversion(work_dir, corpus, config, args.jobs, scenarios, args.size, args.change_fraction, overrides))
+            if "postprocess" in scenarios:
+                report["results"]["postprocess"] = bench_postprocess(corpus, config)
+            if "serve" in scenarios:
+                report["results"]["serve"] = bench_serve(corpus, config, args.jobs, args.serve_concurrency)
+        finally:
+            os.chdir(previous_cwd)
+            if not args.work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"Benchmark report written to {args.output}")
+    else:
+        print(output)
+
+    startup = report["results"].get("startup")
+    if args.check_startup and startup and not startup["within_budget"]:
+        print(f"Startup over budget: {startup['overhead_ms']} ms overhead, heavy modules: {startup['heavy_modules_loaded']}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
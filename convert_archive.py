@@ -0,0 +1,359 @@
+import io
+import os
+import json
+import stat
+import time
+import zlib
+import shutil
+import zipfile
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from convert_utils import get_state_path, write_file_atomic
+
+ARCHIVES_VERSION = 1
+# Extensions of the archives walked as folders
+ARCHIVE_EXTENSIONS = (".zip",)
+# Errors zipfile raises for damaged, encrypted or unsupported archives and members
+ARCHIVE_ERRORS = (zipfile.BadZipFile, zipfile.LargeZipFile, KeyError, RuntimeError, NotImplementedError, EOFError, zlib.error)
+
+def get_archive_options(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the archive settings from defaults and the config's archive_options.
+    
+    Args:
+        config: Optional configuration dictionary containing archive_options
+    
+    Returns:
+        Dict with enabled, max_depth and spool_mb
+    """
+    options = {
+        "enabled": True,
+        # Archives inside archives are opened down to this depth, so a zip quine can't recurse forever
+        "max_depth": 3,
+        # Nested archives up to this size are extracted in memory, larger ones to a temporary file
+        "spool_mb": 64
+    }
+    
+    # Override with settings from config if provided
+    if config and "archive_options" in config:
+        options.update(config["archive_options"])
+    
+    return options
+
+def is_archive(file_path: str) -> bool:
+    """
+    Tell whether a file is walked as a folder of documents.
+    
+    Args:
+        file_path: File name or path
+    
+    Returns:
+        True for zip archives
+    """
+    return os.path.splitext(file_path)[1].lower() in ARCHIVE_EXTENSIONS
+
+class ArchiveIndex:
+    """
+    Zip archives of the source tree seen as folders, with their listings kept between runs.
+    
+    Members get virtual paths below the archive's own path (specs/bundle.zip/a/b.docx),
+    so their outputs are mirrored under bundle.zip/ in the output folder. An archive
+    whose size and mtime are unchanged is not opened to be listed again, and a nested
+    archive whose CRC and size in the outer archive are unchanged is not extracted to
+    be listed. Members are read straight from the archive into memory; nested archives
+    are extracted in memory or to a temporary file, never next to the source.
+    """
+    
+    def __init__(self, path: str, options: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Args:
+            path: Listing cache file, see get_archives_path
+            options: Archive settings, see get_archive_options
+        """
+        options = options or get_archive_options()
+        self.path = path
+        self.max_depth = max(1, int(options["max_depth"]))
+        self.spool_bytes = int(options["spool_mb"] * 1024 * 1024)
+        # Listings of the previous run, by archive path relative to the input folder
+        self._previous: Dict[str, Dict[str, Any]] = {}
+        # Listings of this run
+        self._current: Dict[str, Dict[str, Any]] = {}
+        # Members found in this run, by virtual path: (archive path, member names from the
+        # outermost archive in, CRC, size, mtime_ns)
+        self._members: Dict[str, Tuple[str, Tuple[str, ...], int, int, int]] = {}
+        # Each reader thread keeps the archive it read last open
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened: List[List[Any]] = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                archives = json.load(f)
+            if archives.get("version") == ARCHIVES_VERSION:
+                self._previous = archives["archives"]
+        except (OSError, ValueError, KeyError):
+            pass
+    
+    def expand(self, archive_path: str, relative_path: str, file_types: List[str], is_ignored: Callable[[str, bool], bool], counters: Optional[Dict[str, int]] = None) -> Iterator[Tuple[str, List[str]]]:
+        """
+        Walk an archive and the archives inside it like folders.
+        
+        Args:
+            archive_path: Path to the archive
+            relative_path: Archive path relative to the input folder, "/"-separated
+            file_types: List of file extensions to convert
+            is_ignored: Function (relative path, is folder) -> True if skipped, see compile_ignore_patterns
+            counters: Optional scan counters of iter_source_files to update
+        
+        Yields:
+            Tuple of (virtual folder path, names of matching members in that folder)
+        """
+        try:
+            archive_stat = os.stat(archive_path)
+        except OSError:
+            return
+        signature = [archive_stat.st_size, archive_stat.st_mtime_ns]
+        yield from self._expand(archive_path, (), archive_path, relative_path, signature, file_types, is_ignored, counters if counters is not None else {})
+    
+    def _expand(self, archive_path: str, chain: Tuple[str, ...], virtual_path: str, relative_path: str, signature: List[int], file_types: List[str], is_ignored: Callable[[str, bool], bool], counters: Dict[str, int]) -> Iterator[Tuple[str, List[str]]]:
+        members = self._list(archive_path, chain, relative_path, signature, counters)
+        if members is None:
+            return
+        counters["files_seen"] = counters.get("files_seen", 0) + len(members)
+        
+        folders: Dict[str, List[str]] = {}
+        nested: List[Tuple[str, str, str, List[int]]] = []
+        ignored_dirs: Dict[str, bool] = {}
+        for name, crc, size, mtime_ns in members:
+            parts = name.replace("\\", "/").split("/")
+            # Names that would escape the archive's output folder are never converted
+            if any(part in ("", ".", "..") or ":" in part for part in parts):
+                continue
+            member_archive = is_archive(name)
+            if not member_archive and os.path.splitext(name)[1].lower() not in file_types:
+                continue
+            # Any ignored parent folder hides the member, as in the walk
+            hidden = False
+            for i in range(1, len(parts)):
+                dir_path = f"{relative_path}/{'/'.join(parts[:i])}"
+                if dir_path not in ignored_dirs:
+                    ignored_dirs[dir_path] = is_ignored(dir_path, True)
+                hidden = hidden or ignored_dirs[dir_path]
+            member_relative = f"{relative_path}/{'/'.join(parts)}"
+            if hidden or is_ignored(member_relative, False):
+                counters["files_ignored"] = counters.get("files_ignored", 0) + 1
+                continue
+            
+            root = os.path.join(virtual_path, *parts[:-1])
+            member_path = os.path.join(root, parts[-1])
+            if member_archive:
+                if len(chain) + 1 < self.max_depth:
+                    nested.append((name, member_path, member_relative, [crc, size]))
+                continue
+            self._members[member_path] = (archive_path, chain + (name,), crc, size, mtime_ns)
+            folders.setdefault(root, []).append(parts[-1])
+        
+        for root, names in folders.items():
+            counters["files_matched"] = counters.get("files_matched", 0) + len(names)
+            yield root, names
+        for name, member_path, member_relative, nested_signature in nested:
+            yield from self._expand(archive_path, chain + (name,), member_path, member_relative, nested_signature, file_types, is_ignored, counters)
+    
+    def _list(self, archive_path: str, chain: Tuple[str, ...], relative_path: str, signature: List[int], counters: Dict[str, int]) -> Optional[List[List[Any]]]:
+        # Member listing as [name, CRC, size, mtime_ns], from the previous run if the archive is unchanged
+        previous = self._previous.get(relative_path)
+        if previous is not None and previous["signature"] == signature:
+            counters["archives_cached"] = counters.get("archives_cached", 0) + 1
+            self._current[relative_path] = previous
+            return previous["members"]
+        
+        handles: List[Any] = []
+        try:
+            archive = self._open(archive_path, chain, handles)
+            members = [
+                [info.filename, info.CRC, info.file_size, _get_mtime_ns(info.date_time)]
+                for info in archive.infolist()
+                # Encrypted members can't be read without their password
+                if not info.is_dir() and not info.flag_bits & 0x1
+            ]
+        except (OSError,) + ARCHIVE_ERRORS as e:
+            # Unreadable archives are skipped, like unreadable folders
+            print(f"Error reading archive {os.path.join(archive_path, *chain)}: {e}")
+            return None
+        finally:
+            _close_handles(handles)
+        counters["archives_scanned"] = counters.get("archives_scanned", 0) + 1
+        self._current[relative_path] = {"signature": signature, "members": members}
+        return members
+    
+    def _open(self, archive_path: str, chain: Tuple[str, ...], handles: List[Any]) -> zipfile.ZipFile:
+        # Opens the innermost archive of the chain; every file and archive opened is added to handles
+        archive = zipfile.ZipFile(archive_path)
+        handles.append(archive)
+        for name in chain:
+            if archive.getinfo(name).file_size <= self.spool_bytes:
+                buffer: Any = io.BytesIO(archive.read(name))
+            else:
+                buffer = tempfile.TemporaryFile()
+                handles.append(buffer)
+                with archive.open(name) as member:
+                    shutil.copyfileobj(member, buffer, 1024 * 1024)
+                buffer.seek(0)
+            archive = zipfile.ZipFile(buffer)
+            handles.append(archive)
+        return archive
+    
+    def is_member(self, path: str) -> bool:
+        """
+        Tell whether a path is a member found by expand.
+        
+        Args:
+            path: Source path
+        
+        Returns:
+            True if the path is inside an archive
+        """
+        return path in self._members
+    
+    def get_archive_path(self, path: str) -> str:
+        """
+        Get the file on disk holding a source.
+        
+        Args:
+            path: Source path
+        
+        Returns:
+            Path to the outermost archive of a member, or the path itself
+        """
+        member = self._members.get(path)
+        return member[0] if member is not None else path
+    
+    def crc(self, path: str) -> Optional[int]:
+        """
+        Get the CRC of a member as listed in its archive.
+        
+        Args:
+            path: Source path
+        
+        Returns:
+            CRC-32 of the member's content, or None if the path isn't inside an archive
+        """
+        member = self._members.get(path)
+        return member[2] if member is not None else None
+    
+    def stat(self, path: str) -> os.stat_result:
+        """
+        Stat a source, inside an archive or not.
+        
+        Args:
+            path: Source path
+        
+        Returns:
+            os.stat result, or for a member one built from its size and modification time in the archive
+        """
+        member = self._members.get(path)
+        if member is None:
+            return os.stat(path)
+        size, mtime_ns = member[3], member[4]
+        mtime = mtime_ns // 10**9
+        return os.stat_result(
+            (stat.S_IFREG | 0o444, 0, 0, 1, 0, 0, size, mtime, mtime, mtime),
+            {"st_atime": mtime_ns / 1e9, "st_mtime": mtime_ns / 1e9, "st_ctime": mtime_ns / 1e9, "st_atime_ns": mtime_ns, "st_mtime_ns": mtime_ns, "st_ctime_ns": mtime_ns}
+        )
+    
+    def read(self, path: str) -> bytes:
+        """
+        Read a source, inside an archive or not.
+        
+        Args:
+            path: Source path
+        
+        Returns:
+            Content of the file or member
+        
+        Raises:
+            OSError: If the file can't be read, or the member can't be extracted from its archive
+        """
+        member = self._members.get(path)
+        if member is None:
+            with open(path, "rb") as f:
+                return f.read()
+        archive_path, chain = member[0], member[1]
+        try:
+            return self._get_archive(archive_path, chain[:-1]).read(chain[-1])
+        except ARCHIVE_ERRORS as e:
+            raise OSError(f"Error extracting {chain[-1]} from {os.path.join(archive_path, *chain[:-1])}: {e}")
+    
+    def _get_archive(self, archive_path: str, chain: Tuple[str, ...]) -> zipfile.ZipFile:
+        # Members are read folder by folder, so keeping the last archive open saves
+        # reading its central directory (and extracting a nested archive) per member
+        key = (archive_path, chain)
+        cached = getattr(self._local, "archive", None)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        handles: List[Any] = []
+        try:
+            archive = self._open(archive_path, chain, handles)
+        except BaseException:
+            _close_handles(handles)
+            raise
+        with self._lock:
+            if cached is not None:
+                _close_handles(cached[2])
+                self._opened.remove(cached[2])
+            self._opened.append(handles)
+        self._local.archive = (key, archive, handles)
+        return archive
+    
+    def close(self) -> None:
+        """Close the archives kept open by read."""
+        with self._lock:
+            for handles in self._opened:
+                _close_handles(handles)
+            self._opened = []
+        self._local = threading.local()
+    
+    def save(self, complete: bool = True) -> None:
+        """
+        Save the listings of the archives expanded in this run.
+        
+        Args:
+            complete: True if every archive of the tree was expanded, so listings of archives not seen are dropped
+        """
+        current = self._current if complete else dict(self._previous, **self._current)
+        if current == self._previous:
+            return
+        try:
+            write_file_atomic(self.path, json.dumps({"version": ARCHIVES_VERSION, "archives": current}, separators=(",", ":")))
+        except OSError as e:
+            print(f"Error saving archive listings {self.path}: {e}")
+        self._previous = current
+
+def _get_mtime_ns(date_time: Tuple[int, ...]) -> int:
+    # Zip timestamps are local time with 2 s resolution
+    try:
+        return int(time.mktime(tuple(date_time) + (0, 0, -1))) * 10**9
+    except (OverflowError, ValueError):
+        return 0
+
+def _close_handles(handles: List[Any]) -> None:
+    # Innermost first, so nested archives are closed before the files under them
+    for handle in reversed(handles):
+        try:
+            handle.close()
+        except Exception:
+            pass
+
+def get_archives_path(output_folder: str, suffix: str = "") -> str:
+    """
+    Get the path of the archive listings of an output folder.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+        suffix: Shard suffix, see get_shard_suffix
+    
+    Returns:
+        Path to the listings file
+    """
+    return get_state_path(output_folder, f"archives{suffix}.json")
@@ -0,0 +1,148 @@
+import os
+import time
+import zlib
+import sqlite3
+from typing import Optional
+
+from convert_utils import get_cache_dir
+
+OCR_CACHE_FILENAME = "ocr_cache.sqlite"
+# Bump when the stored format changes, the cache is then emptied
+OCR_CACHE_SCHEMA_VERSION = 1
+# Evict down to this share of the size cap, so eviction doesn't run on every insert once full
+EVICT_TARGET = 0.9
+
+def get_ocr_cache_path() -> str:
+    """
+    Get the default location of the OCR cache, shared by all projects of the user.
+    
+    Returns:
+        Path to the SQLite database in the user's cache directory
+    """
+    return os.path.join(get_cache_dir(), OCR_CACHE_FILENAME)
+
+class OcrCache:
+    """
+    Size-capped, least-recently-used cache of OCR results on disk.
+    
+    Keys combine the hash of the image or document content with the hash of
+    the converter settings, so the same scan is recognized once no matter
+    which file, folder or project it appears in. Worker processes share the
+    database; any SQLite error disables the cache for the rest of the run
+    instead of failing the conversion.
+    """
+    
+    def __init__(self, path: Optional[str] = None, max_size_mb: float = 512) -> None:
+        """
+        Args:
+            path: SQLite database file (default: get_ocr_cache_path())
+            max_size_mb: Total size of the cached text, compressed, above which the least recently used entries are evicted
+        """
+        self.path = path or get_ocr_cache_path()
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disabled = False
+    
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        # Opened on first use, so workers that never OCR never touch the database
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode = WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != OCR_CACHE_SCHEMA_VERSION:
+                with conn:
+                    conn.execute("DROP TABLE IF EXISTS entries")
+                    conn.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+                    conn.execute("CREATE INDEX entries_last_used ON entries (last_used)")
+                    conn.execute(f"PRAGMA user_version = {OCR_CACHE_SCHEMA_VERSION}")
+            self._conn = conn
+        except (sqlite3.Error, OSError) as e:
+            self._disable(e)
+        return self._conn
+    
+    def _disable(self, error: Exception) -> None:
+        print(f"Warning: OCR cache {self.path} disabled: {error}")
+        self._disabled = True
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached OCR result and mark it as recently used.
+        
+        Args:
+            key: Content hash and settings hash, see _convert_data
+        
+        Returns:
+            The cached text, or None on a miss
+        """
+        conn = self._connect()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            with conn:
+                conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            return zlib.decompress(row[0]).decode("utf-8")
+        except (sqlite3.Error, zlib.error) as e:
+            self._disable(e)
+            return None
+    
+    def put(self, key: str, text: str) -> None:
+        """
+        Store an OCR result, evicting the least recently used entries if the cache grows past its cap.
+        
+        Args:
+            key: Content hash and settings hash
+            text: Recognized text
+        """
+        conn = self._connect()
+        if conn is None:
+            return
+        value = zlib.compress(text.encode("utf-8"), 6)
+        if len(value) > self.max_bytes:
+            return
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)", (key, value, len(value), time.time()))
+            self.evict()
+        except sqlite3.Error as e:
+            self._disable(e)
+    
+    def evict(self) -> int:
+        """
+        Remove least recently used entries until the cache is back under its cap.
+        
+        Returns:
+            Number of entries removed
+        """
+        conn = self._connect()
+        if conn is None:
+            return 0
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        
+        target = total - int(self.max_bytes * EVICT_TARGET)
+        removed = freed = 0
+        with conn:
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+                if freed >= target:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                freed += size
+                removed += 1
+        return removed
+    
+    def close(self) -> None:
+        """
+        Close the database connection.
+        """
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -2,15 +2,11 @@
 import os
 import sys
 import argparse
+import time
 from typing import NamedTuple, List, Optional
-from convert_utils import (
-    install_package,
-    setup_markitdown,
-    load_config,
-    update_cursorignore,
-    convert_files,
-    update_metadata_file
-)
+
+# convert_utils is imported after argument parsing so "--help" and argument
+# errors return without loading the conversion machinery.
 
 class CliArgs(NamedTuple):
     """Class to hold parsed command line arguments."""
@@ -18,6 +14,17 @@ class CliArgs(NamedTuple):
     output: str
     config: str
     setup_only: bool
+    jobs: Optional[int]
+    scan_only: bool
+    offline: bool
+    refresh_env: bool
+    watch: bool
+    debounce: float
+    timeout: Optional[float]
+    max_memory: Optional[float]
+    profile: bool
+    shard: Optional[str]
+    retry_failed: bool
 
 def parse_arguments() -> CliArgs:
     """
@@ -35,28 +42,233 @@ def parse_arguments() -> CliArgs:
                       help="Path to configuration file (default: convert_config.json)")
     parser.add_argument("--setup-only", action="store_true",
                       help="Only setup MarkItDown and dependencies without converting files")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                      help="Number of parallel conversion processes (default: CPU count)")
+    parser.add_argument("--scan-only", action="store_true",
+                      help="Only scan the input directory and report timing and pruned entries")
+    parser.add_argument("--offline", action="store_true", default=bool(os.environ.get("CVMD_OFFLINE")),
+                      help="Skip pip installs and GitHub version checks (also enabled by CVMD_OFFLINE=1)")
+    parser.add_argument("--refresh-env", action="store_true",
+                      help="Re-check installed packages and the latest version even if checked recently")
+    parser.add_argument("--watch", action="store_true",
+                      help="After converting, keep watching the input directory and sync changes")
+    parser.add_argument("--debounce", type=float, default=1.0,
+                      help="Seconds to wait for changes to settle in watch mode (default: 1.0)")
+    parser.add_argument("--timeout", type=float, default=None,
+                      help="Maximum seconds to spend converting a single file (default: 600)")
+    parser.add_argument("--max-memory", type=float, default=None,
+                      help="Memory ceiling in MB for a worker converting a single file (default: none)")
+    parser.add_argument("--profile", action="store_true",
+                      help="Profile the conversion phase with cProfile and write <output>/.cvmd/profile.pstats")
+    parser.add_argument("--shard", default=None, metavar="I/N",
+                      help="Convert only shard I of N (e.g. 2/4), combine the shards afterwards with 'cvmd merge'")
+    parser.add_argument("--retry-failed", action="store_true",
+                      help="Convert again files that failed in an earlier run, even if unchanged")
     
     args = parser.parse_args()
     return CliArgs(
         input=args.input,
         output=args.output,
         config=args.config,
-        setup_only=args.setup_only
+        setup_only=args.setup_only,
+        jobs=args.jobs,
+        scan_only=args.scan_only,
+        offline=args.offline,
+        refresh_env=args.refresh_env,
+        watch=args.watch,
+        debounce=args.debounce,
+        timeout=args.timeout,
+        max_memory=args.max_memory,
+        profile=args.profile,
+        shard=args.shard,
+        retry_failed=args.retry_failed
     )
 
+def run_scan_only(args: CliArgs) -> None:
+    """
+    Walk the input directory and print a timing report without converting.
+    
+    Args:
+        args: Parsed command line arguments
+    """
+    from convert_utils import load_config, scan_files
+    
+    config = load_config(args.config)
+    file_types = config.get("file_types", [".pdf", ".xlsx", ".docx", ".pptx", ".xls", ".doc", ".xlsm", ".png", ".jpg", ".jpeg"])
+    ignore_patterns = config.get("ignore_patterns", ["*"])
+    input_path = os.path.abspath(args.input)
+    output_folder = os.path.join(os.getcwd(), args.output)
+    
+    stats = scan_files(input_path, output_folder, file_types, ignore_patterns)
+    print(f"Scanned {input_path} in {stats['elapsed'] * 1000:.1f} ms")
+    print(f"  Directories scanned: {stats['dirs_scanned']}")
+    print(f"  Directories pruned:  {stats['dirs_pruned']}")
+    print(f"  Files seen:          {stats['files_seen']}")
+    print(f"  Files ignored:       {stats['files_ignored']}")
+    print(f"  Files to convert:    {stats['files_matched']}")
+
+def run_search_command(argv: List[str]) -> None:
+    """
+    Handle "cvmd search <query>": print ranked documents and matching sections.
+    
+    Args:
+        argv: Command line arguments after "search"
+    """
+    parser = argparse.ArgumentParser(prog="cvmd search", description="Search the converted Markdown documents.")
+    parser.add_argument("query", nargs="+", help="Words to search for (all must match)")
+    parser.add_argument("--output", "-o", default="doc_base",
+                      help="Output directory holding the converted files and search index (default: doc_base)")
+    parser.add_argument("--limit", "-n", type=int, default=10,
+                      help="Maximum number of files to show (default: 10)")
+    parser.add_argument("--raw", action="store_true",
+                      help="Pass the query to SQLite FTS5 unchanged (OR, NEAR, prefix*, heading:word)")
+    parser.add_argument("--json", action="store_true",
+                      help="Print results as JSON")
+    args = parser.parse_args(argv)
+    
+    from convert_search import run_search
+    run_search(os.path.join(os.getcwd(), args.output), " ".join(args.query), limit=args.limit, raw=args.raw, as_json=args.json)
+
+def run_merge_command(argv: List[str]) -> None:
+    """
+    Handle "cvmd merge <shard folders>": combine sharded runs into one output folder.
+    
+    Args:
+        argv: Command line arguments after "merge"
+    """
+    parser = argparse.ArgumentParser(prog="cvmd merge", description="Combine the outputs of 'cvmd --shard I/N' runs without converting again.")
+    parser.add_argument("shards", nargs="*",
+                      help="Output directories of the shards (default: the output directory, for shards sharing it)")
+    parser.add_argument("--input", "-i", default=os.getcwd(),
+                      help="Input directory the shards converted (default: current directory)")
+    parser.add_argument("--output", "-o", default="doc_base",
+                      help="Output directory receiving the merged files (default: doc_base)")
+    parser.add_argument("--config", "-c", default="convert_config.json",
+                      help="Path to configuration file (default: convert_config.json)")
+    args = parser.parse_args(argv)
+    
+    from convert_utils import load_config, merge_shards, update_cursorignore, update_metadata_file
+    
+    config = load_config(args.config)
+    file_types = config.get("file_types", [".pdf", ".xlsx", ".docx", ".pptx", ".xls", ".doc", ".xlsm", ".png", ".jpg", ".jpeg"])
+    ignore_patterns = config.get("ignore_patterns", ["*"])
+    project_folder = os.getcwd()
+    output_folder = os.path.join(project_folder, args.output)
+    shard_folders = [os.path.abspath(folder) for folder in args.shards] or [output_folder]
+    
+    converted_files = merge_shards(shard_folders, os.path.abspath(args.input), output_folder, config)
+    update_cursorignore(project_folder, ignore_patterns, file_types, converted_files)
+    if converted_files:
+        update_metadata_file(project_folder, converted_files)
+
+def run_convert_command(argv: List[str]) -> None:
+    """
+    Handle "cvmd convert <source>": convert one document and write its Markdown to stdout.
+    
+    Nothing else is printed to stdout and nothing is written to disk: no default
+    config file, project setup files, manifest or environment checks.
+    
+    Args:
+        argv: Command line arguments after "convert"
+    """
+    parser = argparse.ArgumentParser(prog="cvmd convert", description="Convert a single document to Markdown on stdout.")
+    parser.add_argument("source", help="Path of the document, or - to read it from stdin")
+    parser.add_argument("--format", "-f", default=None,
+                      help="Document format, e.g. pdf or .docx (required for stdin, default: the source's extension)")
+    parser.add_argument("--config", "-c", default=None,
+                      help="Configuration file to read converter_options from (default: none)")
+    args = parser.parse_args(argv)
+    
+    file_extension = args.format or ("" if args.source == "-" else os.path.splitext(args.source)[1])
+    if not file_extension:
+        parser.error("--format is required when the source has no extension")
+    
+    from convert_utils import convert_document, get_converter_settings, read_config
+    
+    try:
+        config = read_config(args.config)
+        if args.source == "-":
+            data = sys.stdin.buffer.read()
+        else:
+            with open(args.source, "rb") as f:
+                data = f.read()
+        text = convert_document(data, file_extension, config)
+    except Exception as e:
+        # Errors go to stderr so stdout only ever carries Markdown
+        print(f"Error converting {args.source}: {e}", file=sys.stderr)
+        sys.exit(1)
+    sys.stdout.buffer.write(text.encode(get_converter_settings(config)["output_encoding"]))
+    sys.stdout.buffer.flush()
+
+def run_serve_command(argv: List[str]) -> None:
+    """
+    Handle "cvmd serve": keep warm conversion workers behind a local HTTP endpoint.
+    
+    Args:
+        argv: Command line arguments after "serve"
+    """
+    parser = argparse.ArgumentParser(prog="cvmd serve", description="Serve conversions from pre-warmed workers over local HTTP or a Unix socket.")
+    parser.add_argument("--host", default="127.0.0.1",
+                      help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", "-p", type=int, default=8765,
+                      help="TCP port to listen on (default: 8765)")
+    parser.add_argument("--socket", default=None,
+                      help="Listen on this Unix socket instead of a TCP port")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                      help="Number of warm worker processes (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=None,
+                      help="Requests allowed to wait for a worker before answering 503 (default: 64)")
+    parser.add_argument("--config", "-c", default=None,
+                      help="Configuration file to read converter, worker and server options from (default: none)")
+    parser.add_argument("--verbose", "-v", action="store_true",
+                      help="Log every request")
+    args = parser.parse_args(argv)
+    
+    from convert_utils import read_config
+    from convert_server import serve
+    
+    serve(read_config(args.config), jobs=args.jobs, host=args.host, port=args.port, socket_path=args.socket, queue_size=args.queue_size, verbose=args.verbose)
+
+# Subcommands given as the first argument; without one, cvmd converts files
+SUBCOMMANDS = {
+    "search": run_search_command,
+    "merge": run_merge_command,
+    "convert": run_convert_command,
+    "serve": run_serve_command
+}
+
 def main() -> None:
     """
     Main entry point for the command line interface.
     """
+    start_time = time.perf_counter()
     try:
+        if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+            SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+            return
+        
         # Parse command line arguments
         args = parse_arguments()
         
-        # Setup MarkItDown with all dependencies
-        setup_markitdown()
+        from convert_utils import (
+            ensure_environment,
+            load_config,
+            update_cursorignore,
+            convert_files,
+            update_metadata_file,
+            get_shard_suffix,
+            parse_shard,
+            DEFAULT_ENV_CHECK_INTERVAL_HOURS
+        )
         
-        # If only setup was requested, exit
+        # Scan-only runs report on the directory walk without touching the environment
+        if args.scan_only:
+            run_scan_only(args)
+            return
+        
+        # If only setup was requested, install and exit
         if args.setup_only:
+            ensure_environment(force=True)
             print("MarkItDown setup completed. Use 'cvmd' command to convert files.")
             return
         
@@ -65,6 +277,27 @@ def main() -> None:
         file_types = config.get("file_types", [".pdf", ".xlsx", ".docx", ".pptx", ".xls", ".doc", ".xlsm", ".png", ".jpg", ".jpeg"])
         ignore_patterns = config.get("ignore_patterns", ["*"])
         
+        # Per-file limits given on the command line override the config file
+        worker_options = config.setdefault("worker_options", {})
+        if args.timeout is not None:
+            worker_options["timeout"] = args.timeout
+        if args.max_memory is not None:
+            worker_options["max_memory_mb"] = args.max_memory
+        if args.profile:
+            config["profile"] = True
+        if args.shard:
+            config["shard"] = parse_shard(args.shard)
+        if args.retry_failed:
+            config["retry_failed"] = True
+        
+        # Setup MarkItDown with all dependencies, skipped when verified recently
+        ensure_environment(
+            offline=args.offline or bool(config.get("offline", False)),
+            force=args.refresh_env,
+            interval_hours=config.get("env_check_interval_hours", DEFAULT_ENV_CHECK_INTERVAL_HOURS)
+        )
+        print(f"Startup took {time.perf_counter() - start_time:.2f}s")
+        
         # Configure directories
         input_path = os.path.abspath(args.input)
         project_folder = os.getcwd()  # Use current working directory for metadata
@@ -73,16 +306,23 @@ def main() -> None:
         print(f"Converting files from: {input_path}")
         print(f"Output directory: {output_folder}")
         print(f"File types to convert: {', '.join(file_types)}")
+        print(f"Parallel jobs: {args.jobs or os.cpu_count() or 1}")
+        
+        # Watch mode does its own initial pass, then keeps the output in sync
+        if args.watch:
+            from convert_watch import watch
+            watch(input_path, output_folder, file_types, config, project_folder=project_folder, jobs=args.jobs, debounce=args.debounce)
+            return
         
         # Update .cursorignore to exclude original files
         update_cursorignore(project_folder, ignore_patterns, file_types)
         
         # Convert files directly from input path
-        converted_files = convert_files(input_path, output_folder, file_types, config)
+        converted_files = convert_files(input_path, output_folder, file_types, config, jobs=args.jobs)
         
-        # Update metadata file
+        # Update metadata file, each shard keeps its own until 'cvmd merge'
         if converted_files:
-            update_metadata_file(project_folder, converted_files)
+            update_metadata_file(project_folder, converted_files, f"metadata{get_shard_suffix(config)}")
             print(f"Successfully converted {len(converted_files)} files")
         else:
             print(f"No matching files found in {input_path}")
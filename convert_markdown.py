@@ -0,0 +1,582 @@
+import os
+import re
+import json
+import shutil
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+SECTIONS_SUFFIX = ".sections.json"
+SECTIONS_VERSION = 2
+PARTS_SUFFIX = ".parts"
+# Sections that always start a part of their own when an output is split
+PART_KINDS = {"sheet", "slide"}
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+FENCE_RE = re.compile(r"^\s*(```|~~~)")
+# Slide markers written by MarkItDown's PowerPoint converter
+SLIDE_RE = re.compile(r"^<!-- Slide number: (\d+) -->\s*$")
+# Formats whose level-2 headings are sheet names
+SHEET_EXTENSIONS = {".xlsx", ".xls", ".xlsm", ".csv"}
+
+# Runs of table rows, padding around their cell contents, cells holding only NaN and runs of blank lines
+TABLE_RE = re.compile(r"(?:^[ \t]*\|.*(?:\n|\Z))+", re.MULTILINE)
+TABLE_PADDING_RE = re.compile(r"(?<=\|)[ \t]{2,}|[ \t]{2,}(?=\|)")
+NAN_CELL_RE = re.compile(r"(?<=\|)[ \t]*NaN[ \t]*(?=\|)")
+BLANK_RUN_RE = re.compile(r"\n(?:[ \t]*\n){2,}")
+# A fenced code block, up to its closing fence or the end of the document
+FENCED_BLOCK_RE = re.compile(r"^[ \t]*(`{3,}|~{3,}).*?(?:^[ \t]*\1[ \t]*$|\Z)", re.MULTILINE | re.DOTALL)
+
+# ----- Post-processing -----
+
+def _outside_code(text: str, transform: Callable[[str], str]) -> str:
+    # Applies transform to the text between fenced code blocks, leaving code as written
+    if "```" not in text and "~~~" not in text:
+        return transform(text)
+    pieces: List[str] = []
+    end = 0
+    for match in FENCED_BLOCK_RE.finditer(text):
+        pieces.append(transform(text[end:match.start()]))
+        pieces.append(match.group(0))
+        end = match.end()
+    pieces.append(transform(text[end:]))
+    return "".join(pieces)
+
+def _sub_table_rows(pattern: "re.Pattern[str]", replacement: str, text: str) -> str:
+    # Only lines starting with a pipe are table rows; pipes in prose are left alone
+    return _outside_code(text, lambda segment: TABLE_RE.sub(lambda table: pattern.sub(replacement, table.group(0)), segment))
+
+def _drop_nan_cells(text: str, settings: Dict[str, Any]) -> str:
+    # Empty spreadsheet cells come out of pandas as "| NaN |"; only whole cells are
+    # emptied, so "NaN" in ordinary text (e.g. "NaNo") is left alone
+    if "NaN" not in text:
+        return text
+    return _sub_table_rows(NAN_CELL_RE, " " if settings.get("compact_tables", True) else "  ", text)
+
+def _compact_tables(text: str, settings: Dict[str, Any]) -> str:
+    if "  |" not in text and "|  " not in text:
+        return text
+    return _sub_table_rows(TABLE_PADDING_RE, " ", text)
+
+def _collapse_blank_lines(text: str, settings: Dict[str, Any]) -> str:
+    if "\n\n\n" not in text and not re.search(r"\n[ \t]+\n", text):
+        return text
+    return _outside_code(text, lambda segment: BLANK_RUN_RE.sub("\n\n", segment))
+
+# Transforms applied to every converted document, in order. Each name is also the
+# converter_options flag that turns it off. A transform returns its input unchanged
+# when there is nothing to do, so a clean document is never copied.
+POSTPROCESSORS: Dict[str, Callable[[str, Dict[str, Any]], str]] = {
+    "compact_tables": _compact_tables,
+    "drop_nan_cells": _drop_nan_cells,
+    "collapse_blank_lines": _collapse_blank_lines
+}
+
+def postprocess_markdown(text: str, settings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Clean up converted Markdown with the enabled transforms of POSTPROCESSORS.
+    
+    Transforms check for their pattern before touching the text and work with
+    precompiled regexes, so at most one extra copy of the document is alive at
+    a time. Fenced code blocks are never changed.
+    
+    Args:
+        text: Markdown produced by MarkItDown
+        settings: Converter settings; a transform is disabled by setting its name to false
+    
+    Returns:
+        Cleaned Markdown
+    """
+    settings = settings or {}
+    for name, transform in POSTPROCESSORS.items():
+        if settings.get(name, True):
+            text = transform(text, settings)
+    return text
+
+# ----- Section Splitting -----
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the number of LLM tokens in a text (about 4 characters per token).
+    
+    Args:
+        text: Text to measure
+    
+    Returns:
+        Estimated token count
+    """
+    return (len(text) + 3) // 4
+
+def split_lines(text: str) -> List[str]:
+    """
+    Split text into lines at "\n" only, keeping the separators.
+    
+    Unlike str.splitlines, form feeds and other Unicode line breaks stay inside
+    their line, so line numbers match editors and grep -n.
+    
+    Args:
+        text: Text to split
+    
+    Returns:
+        Lines ending with "\n", except a last line without one
+    """
+    lines = [line + "\n" for line in text.split("\n")]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+def split_markdown(text: str, source_ext: str = "", char_starts: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """
+    Split a converted document into sections with the byte range each occupies on disk.
+    
+    Slides split PowerPoint output, form feeds split PDF pages, and headings
+    split everything else (level-2 headings of workbooks are sheets). Any text
+    before the first boundary becomes a "preamble" section, so the sections
+    cover the whole file back to back.
+    
+    Args:
+        text: Markdown content as it is written to the output file
+        source_ext: Extension of the source document (e.g. ".xlsx")
+        char_starts: Optional list that receives the character offset in text where each section starts
+    
+    Returns:
+        List of dicts with title, kind (heading, sheet, page, slide or preamble),
+        level, 1-based line, start and end byte offsets and estimated tokens
+    """
+    if re.search(r"^<!-- Slide number: \d+ -->", text, re.MULTILINE):
+        mode = "slide"
+    elif "\f" in text:
+        mode = "page"
+    else:
+        mode = "heading"
+    
+    sections: List[Dict[str, Any]] = []
+    # Text mode writes translate "\n" to os.linesep, offsets must count the bytes on disk
+    translate_newlines = os.linesep != "\n"
+    byte_offset = 0
+    char_start = char_offset = 0
+    # Form feeds seen before the current line, each one ends a page
+    form_feeds = 0
+    in_fence = False
+    title_pending = False
+    previous = ""
+    
+    def close_section() -> None:
+        if sections:
+            sections[-1]["end"] = byte_offset
+            sections[-1]["tokens"] = estimate_tokens(text[char_start:char_offset])
+    
+    for line_number, piece in enumerate(split_lines(text), 1):
+        line = piece.rstrip("\r\n")
+        boundary = None
+        if mode == "page":
+            # A page starts on the line after a form feed, or at the form feeds leading a line
+            leading = len(line) - len(line.lstrip("\f"))
+            if line_number == 1 or leading or previous.endswith("\f"):
+                boundary = ("page", f"Page {form_feeds + leading + 1}", 0)
+            form_feeds += line.count("\f")
+        elif mode == "slide":
+            match = SLIDE_RE.match(line)
+            heading = HEADING_RE.match(line)
+            if match:
+                boundary = ("slide", f"Slide {match.group(1)}", 0)
+                title_pending = True
+            elif title_pending and heading:
+                # The slide title heading names the slide instead of starting a section
+                sections[-1]["title"] = heading.group(2)
+                title_pending = False
+            elif line.strip():
+                title_pending = False
+        else:
+            if FENCE_RE.match(line):
+                in_fence = not in_fence
+            heading = None if in_fence else HEADING_RE.match(line)
+            if heading:
+                level = len(heading.group(1))
+                kind = "sheet" if level == 2 and source_ext.lower() in SHEET_EXTENSIONS else "heading"
+                boundary = (kind, heading.group(2), level)
+        
+        if boundary is not None or not sections:
+            close_section()
+            kind, title, level = boundary or ("preamble", "", 0)
+            sections.append({"title": title, "kind": kind, "level": level, "line": line_number, "start": byte_offset, "end": byte_offset, "tokens": 0})
+            char_start = char_offset
+            if char_starts is not None:
+                char_starts.append(char_offset)
+        
+        byte_offset += len((piece.replace("\n", os.linesep) if translate_newlines else piece).encode("utf-8"))
+        char_offset += len(piece)
+        previous = line
+    close_section()
+    return sections
+
+# ----- Section Index -----
+
+def get_section_index_path(markdown_path: str) -> str:
+    """
+    Get the path of the section index stored next to a converted file.
+    
+    Args:
+        markdown_path: Path to the converted Markdown file
+    
+    Returns:
+        Path to <file>.md.sections.json
+    """
+    return markdown_path + SECTIONS_SUFFIX
+
+def write_section_index(markdown_path: str, text: str, source_ext: str = "") -> str:
+    """
+    Split converted text into sections and store their index next to the output.
+    
+    Args:
+        markdown_path: Path the text was written to
+        text: Markdown content of the file
+        source_ext: Extension of the source document
+    
+    Returns:
+        Path to the section index
+    """
+    return save_section_index(markdown_path, split_markdown(text, source_ext))
+
+def save_section_index(markdown_path: str, sections: List[Dict[str, Any]], parts: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    Store sections computed by split_markdown next to the output they describe.
+    
+    Args:
+        markdown_path: Path the sectioned text was written to
+        sections: Result of split_markdown for that text
+        parts: Parts of a split output (name, title, size, tokens); sections then
+            carry the number of their part and offsets within it
+    
+    Returns:
+        Path to the section index
+    """
+    from convert_utils import write_file_atomic
+    
+    index_path = get_section_index_path(markdown_path)
+    index: Dict[str, Any] = {
+        "version": SECTIONS_VERSION,
+        # A split output's own file is the list of its parts
+        "size": os.path.getsize(markdown_path) if parts is not None else sections[-1]["end"] if sections else 0,
+        "tokens": sum(section["tokens"] for section in sections),
+        "sections": sections
+    }
+    if parts is not None:
+        index["parts"] = parts
+    write_file_atomic(index_path, json.dumps(index, ensure_ascii=False, separators=(",", ":")))
+    return index_path
+
+def load_section_index(markdown_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Load the section index of a converted file.
+    
+    Args:
+        markdown_path: Path to the converted Markdown file
+    
+    Returns:
+        Index dict with size, tokens and sections, or None if there is no usable index
+    """
+    try:
+        with open(get_section_index_path(markdown_path), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        # An index whose size doesn't match the output describes a previous version of it
+        if index.get("version") != SECTIONS_VERSION or os.path.getsize(markdown_path) != index.get("size"):
+            return None
+    except (OSError, ValueError):
+        return None
+    return index
+
+def find_section(index: Dict[str, Any], selector: Union[int, str]) -> Dict[str, Any]:
+    """
+    Pick a section from an index by position or title.
+    
+    Args:
+        index: Index dict from load_section_index
+        selector: Section number (0-based) or title; titles match exactly first, then by substring, ignoring case
+    
+    Returns:
+        The section dict
+    """
+    sections = index["sections"]
+    if isinstance(selector, int):
+        return sections[selector]
+    wanted = selector.casefold()
+    for section in sections:
+        if section["title"].casefold() == wanted:
+            return section
+    for section in sections:
+        if wanted in section["title"].casefold():
+            return section
+    raise KeyError(f"No section titled {selector!r}")
+
+def read_section(markdown_path: str, selector: Union[int, str]) -> str:
+    """
+    Read one section of a converted file without loading the rest of it.
+    
+    Args:
+        markdown_path: Path to the converted Markdown file
+        selector: Section number (0-based) or title, see find_section
+    
+    Returns:
+        Text of the section
+    """
+    index = load_section_index(markdown_path)
+    if index is None:
+        raise FileNotFoundError(f"No up-to-date section index for {markdown_path}")
+    section = find_section(index, selector)
+    if "part" in section:
+        markdown_path = os.path.join(get_parts_dir(markdown_path), index["parts"][section["part"]]["name"])
+    with open(markdown_path, "rb") as f:
+        f.seek(section["start"])
+        data = f.read(section["end"] - section["start"])
+    return data.decode("utf-8")
+
+# ----- Split Outputs -----
+
+def get_parts_dir(markdown_path: str) -> str:
+    """
+    Get the folder holding the parts of a split output.
+    
+    Args:
+        markdown_path: Path to the converted Markdown file
+    
+    Returns:
+        Path to <file>.md.parts
+    """
+    return markdown_path + PARTS_SUFFIX
+
+def list_output_parts(markdown_path: str) -> List[str]:
+    """
+    List the part files of a converted file in document order.
+    
+    Args:
+        markdown_path: Path to the converted Markdown file
+    
+    Returns:
+        Paths to the parts, or an empty list if the output is a single file
+    """
+    parts_dir = get_parts_dir(markdown_path)
+    try:
+        names = os.listdir(parts_dir)
+    except OSError:
+        return []
+    return [os.path.join(parts_dir, name) for name in sorted(names) if name.endswith(".md")]
+
+def _part_title(sections: List[Dict[str, Any]]) -> str:
+    titled = [section for section in sections if section["kind"] != "preamble"] or sections
+    if len(titled) > 1 and titled[0]["kind"] == "page":
+        return f"Pages {titled[0]['title'].split()[-1]}-{titled[-1]['title'].split()[-1]}"
+    return titled[0]["title"] or "Preamble"
+
+def split_parts(text: str, sections: List[Dict[str, Any]], char_starts: List[int], max_part_bytes: int) -> Iterator[Dict[str, Any]]:
+    """
+    Group the sections of a converted document into parts stored as separate files.
+    
+    Sheets and slides each get a part of their own, pages and headings are
+    grouped into parts of up to max_part_bytes. Sections are never cut, so a
+    single section larger than that makes a larger part.
+    
+    Args:
+        text: Markdown content of the document
+        sections: Result of split_markdown for text
+        char_starts: Character offsets of the sections, filled in by split_markdown
+        max_part_bytes: Size on disk up to which sections are grouped into one part
+    
+    Yields:
+        Dicts with name (file name in the parts folder), title, text and sections
+        (with lines and offsets relative to the part), one part sliced at a time
+    """
+    groups: List[List[int]] = []
+    size = 0
+    for number, section in enumerate(sections):
+        section_bytes = section["end"] - section["start"]
+        # Text before the first boundary stays with the part that follows it
+        preamble_only = bool(groups) and len(groups[-1]) == 1 and sections[groups[-1][0]]["kind"] == "preamble"
+        if not groups or (not preamble_only and (section["kind"] in PART_KINDS or size + section_bytes > max_part_bytes)):
+            groups.append([])
+            size = 0
+        groups[-1].append(number)
+        size += section_bytes
+    
+    char_ends = char_starts[1:] + [len(text)]
+    for number, group in enumerate(groups, 1):
+        members = [sections[index] for index in group]
+        first = members[0]
+        title = _part_title(members)
+        slug = re.sub(r"\W+", "-", title.lower()).strip("-")[:50] or "part"
+        yield {
+            "name": f"{number:04d}-{slug}.md",
+            "title": title,
+            "text": text[char_starts[group[0]]:char_ends[group[-1]]],
+            "sections": [
+                dict(section, line=section["line"] - first["line"] + 1, start=section["start"] - first["start"], end=section["end"] - first["start"])
+                for section in members
+            ]
+        }
+
+def remove_staged_parts(parts: Iterable[Dict[str, Any]]) -> None:
+    """
+    Remove the temporary files of staged parts that were not moved into place.
+    
+    Args:
+        parts: Parts from stage_parts
+    """
+    for part in parts:
+        try:
+            os.remove(part["staged"])
+        except OSError:
+            pass
+
+def stage_parts(parts: Iterable[Dict[str, Any]], staging_dir: str) -> List[Dict[str, Any]]:
+    """
+    Write parts to temporary files as they are sliced, keeping only their metadata.
+    
+    Converted in a worker, a split document is then never held in memory more
+    than once plus one part, and only paths go back to the parent process.
+    
+    Args:
+        parts: Parts from split_parts
+        staging_dir: Folder for the temporary files, on the same file system as the output
+    
+    Returns:
+        The parts with their text replaced by staged (path of the temporary file)
+    """
+    import uuid
+    
+    os.makedirs(staging_dir, exist_ok=True)
+    staged: List[Dict[str, Any]] = []
+    try:
+        for part in parts:
+            # Not mkstemp: its owner-only mode would carry over to the moved part
+            path = os.path.join(staging_dir, f"{os.getpid()}-{uuid.uuid4().hex}.md")
+            text = part.pop("text")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            del text
+            staged.append(dict(part, staged=path))
+    except BaseException:
+        remove_staged_parts(staged)
+        raise
+    return staged
+
+def render_parts_index(markdown_path: str, parts: List[Dict[str, Any]]) -> str:
+    """
+    Render the Markdown file that lists the parts of a split output.
+    
+    Args:
+        markdown_path: Path the list is written to
+        parts: Dicts with name, title, size and tokens of each part
+    
+    Returns:
+        Markdown content linking to every part
+    """
+    from urllib.parse import quote
+    
+    name = os.path.basename(markdown_path)
+    parts_dir = os.path.basename(get_parts_dir(markdown_path))
+    lines = [
+        f"# {name[:-3] if name.endswith('.md') else name}",
+        "",
+        f"This document was split into {len(parts)} parts:",
+        "",
+        "| Part | Title | Size | Tokens |",
+        "|------|-------|------|--------|"
+    ]
+    for part in parts:
+        title = part["title"].replace("|", "\\|")
+        lines.append(f"| [{part['name']}]({quote(parts_dir + '/' + part['name'])}) | {title} | {part['size'] / 1024:.0f} KB | {part['tokens']} |")
+    return "\n".join(lines) + "\n"
+
+def write_split_output(markdown_path: str, parts: List[Dict[str, Any]], section_index: bool = True) -> int:
+    """
+    Write the parts of a split output, the file listing them and their section index.
+    
+    Parts are moved into place from the files stage_parts wrote. Parts of a
+    previous version that are not overwritten are removed.
+    
+    Args:
+        markdown_path: Path of the converted file, which receives the list of parts
+        parts: Result of stage_parts
+        section_index: Also write the section index
+    
+    Returns:
+        Total size in bytes of the parts and the list
+    """
+    from convert_utils import write_file_atomic
+    
+    parts_dir = get_parts_dir(markdown_path)
+    os.makedirs(parts_dir, exist_ok=True)
+    stale = set(os.listdir(parts_dir))
+    listing: List[Dict[str, Any]] = []
+    sections: List[Dict[str, Any]] = []
+    total = 0
+    
+    try:
+        for part in parts:
+            part_path = os.path.join(parts_dir, part["name"])
+            os.replace(part["staged"], part_path)
+            stale.discard(part["name"])
+            size = os.path.getsize(part_path)
+            sections.extend(dict(section, part=len(listing)) for section in part["sections"])
+            listing.append({"name": part["name"], "title": part["title"], "size": size, "tokens": sum(section["tokens"] for section in part["sections"])})
+            total += size
+    finally:
+        # Parts not moved because the write failed
+        remove_staged_parts(parts)
+    for name in stale:
+        stale_path = os.path.join(parts_dir, name)
+        if os.path.isdir(stale_path):
+            shutil.rmtree(stale_path)
+        else:
+            os.remove(stale_path)
+    
+    write_file_atomic(markdown_path, render_parts_index(markdown_path, listing))
+    if section_index:
+        save_section_index(markdown_path, sections, listing)
+    return total + os.path.getsize(markdown_path)
+
+def remove_output_parts(markdown_path: str) -> None:
+    """
+    Remove the parts folder of a converted file, if it has one.
+    
+    Args:
+        markdown_path: Path to the converted Markdown file
+    """
+    parts_dir = get_parts_dir(markdown_path)
+    if os.path.isdir(parts_dir):
+        shutil.rmtree(parts_dir)
+
+def link_output(source_path: str, target_path: str, section_index: bool = True) -> str:
+    """
+    Materialize a converted file at another path, with its section index and parts.
+    
+    Args:
+        source_path: Existing converted Markdown file
+        target_path: Path receiving the copy
+        section_index: Also link the section index
+    
+    Returns:
+        How the Markdown file (or the parts of a split output) was materialized, see link_or_copy
+    """
+    from convert_utils import link_or_copy, write_file_atomic
+    
+    remove_output_parts(target_path)
+    source_parts = list_output_parts(source_path)
+    if not source_parts:
+        method = link_or_copy(source_path, target_path)
+        if section_index and os.path.exists(get_section_index_path(source_path)):
+            link_or_copy(get_section_index_path(source_path), get_section_index_path(target_path))
+        return method
+    
+    method = "copy"
+    for part_path in source_parts:
+        method = link_or_copy(part_path, os.path.join(get_parts_dir(target_path), os.path.basename(part_path)))
+    # The list of parts links to them through the output's own name, so it is rendered for the target
+    index = load_section_index(source_path)
+    if index is not None and "parts" in index:
+        listing = index["parts"]
+    else:
+        listing = [{"name": os.path.basename(path), "title": os.path.basename(path)[5:-3], "size": os.path.getsize(path), "tokens": (os.path.getsize(path) + 3) // 4} for path in source_parts]
+    write_file_atomic(target_path, render_parts_index(target_path, listing))
+    if section_index and index is not None:
+        save_section_index(target_path, index["sections"], listing)
+    return method
@@ -0,0 +1,486 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import concurrent.futures
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from convert_utils import make_run_record, get_record_seconds, hash_bytes, write_file_atomic
+
+# Queue depth and concurrency of each stage, overridden by "pipeline_options" in the config
+PIPELINE_DEFAULTS: Dict[str, int] = {
+    # Files found by the scanner waiting for their manifest check
+    "scan_queue": 256,
+    # Manifest checks (stat, hash when the mtime changed) running at once
+    "stat_concurrency": 16,
+    # Files to convert waiting to be read
+    "read_queue": 64,
+    # Files being read at once
+    "read_concurrency": 4,
+    # Converted documents waiting to be written
+    "write_queue": 16,
+    # Documents being written at once
+    "write_concurrency": 4,
+    # Finished files waiting for the caller
+    "result_queue": 64
+}
+
+def get_pipeline_options(config: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """
+    Get the stage settings of the conversion pipeline from config.
+    
+    Args:
+        config: Optional configuration dictionary containing pipeline_options
+    
+    Returns:
+        PIPELINE_DEFAULTS updated with the configured values
+    """
+    options = dict(PIPELINE_DEFAULTS)
+    configured = config.get("pipeline_options", {}) if config else {}
+    for key, value in configured.items():
+        if key in options and value:
+            options[key] = max(1, int(value))
+    return options
+
+def _timed(fn: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    # Runs on the I/O threads, so the time doesn't include waiting for a free thread
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+# ----- Pipeline -----
+
+class ConversionPipeline:
+    """
+    Asyncio pipeline that overlaps the directory scan, manifest checks, reads,
+    conversion and writes of one run.
+    
+    scanner -> scan queue -> checkers -> read queue -> readers -> worker
+    processes -> write queue -> writers -> result queue -> caller
+    
+    Blocking file system calls run on a thread pool, so on network shares many
+    stats, reads and writes are in flight while the worker processes convert.
+    Every queue is bounded and at most max_in_flight documents are held between
+    their read and their write, so a slow stage (or caller) holds back the
+    stages before it instead of letting data pile up. The event loop only runs
+    while the caller waits for the next result.
+    
+    With a schedule function, files to convert wait in a window of at most
+    schedule_window checked files and the longest predicted conversion is read
+    first whenever a reader is free, so the largest documents don't start last
+    while conversion still starts as soon as the scan finds work. Files whose
+    estimated worker memory would take the documents being converted over
+    memory_budget_mb wait for memory to be freed; a file over the budget on its
+    own converts alone.
+    """
+    
+    def __init__(self, input_path: str, output_folder: str, sources: Iterable[Tuple[str, List[str]]], check: Callable[[str, str, str], Tuple[os.stat_result, bool, Optional[str]]], submit: Callable[[Tuple[str, bytes, bool, str]], "concurrent.futures.Future[Any]"], options: Optional[Dict[str, int]] = None, max_in_flight: int = 2, dedupe: bool = True, section_index: bool = True, quick_check: Optional[Callable[[str, List[str]], Dict[str, Tuple[Optional[os.stat_result], str]]]] = None, schedule: Optional[Callable[[Dict[str, Any]], Tuple[float, float]]] = None, memory_budget_mb: Optional[float] = None, schedule_window: Optional[int] = None, known_failure: Optional[Callable[[str], Optional[str]]] = None, read: Optional[Callable[[str], bytes]] = None) -> None:
+        """
+        Args:
+            input_path: Directory containing files to convert
+            output_folder: Directory for converted Markdown files
+            sources: Iterable of (folder path, names of files to convert in that folder)
+            check: Function (input path, output path, manifest key) -> (stat, up to date, content hash or None),
+                run on the I/O threads
+            submit: Function scheduling _convert_data on a worker process for (input path, content, with sections, content hash)
+            options: Queue depths and concurrency, see PIPELINE_DEFAULTS
+            max_in_flight: Maximum documents between their read and their write
+            dedupe: Convert each distinct content once and link the other copies to its output
+            section_index: Write the section index of each converted document
+            quick_check: Optional function (folder path, file names) -> {name: (stat or None, content hash)}
+                of the files known to be up to date without a manifest check, run on the I/O threads
+            schedule: Optional function (item) -> (predicted conversion seconds, estimated worker MB)
+                of a checked file to convert; enables longest-first scheduling
+            memory_budget_mb: Estimated worker memory allowed across the documents being converted
+            schedule_window: Checked files held back to pick the longest from (default: 4 * max_in_flight)
+            known_failure: Optional function (content hash) -> error of an earlier run that failed to
+                convert the same content with the same settings, or None; such files are not converted
+            read: Optional function (input path) -> content run on the I/O threads, for sources that are
+                not plain files (default: read the file)
+        """
+        self.input_path = input_path
+        self.output_folder = output_folder
+        self.sources = sources
+        self.check = check
+        self.submit = submit
+        self.options = dict(PIPELINE_DEFAULTS, **(options or {}))
+        self.max_in_flight = max(1, max_in_flight)
+        self.dedupe = dedupe
+        self.section_index = section_index
+        self.quick_check = quick_check
+        self.schedule = schedule
+        self.memory_budget_mb = memory_budget_mb
+        self.schedule_window = max(1, schedule_window or 4 * self.max_in_flight)
+        self.known_failure = known_failure
+        self.read = read or _read_file
+        
+        threads = self.options["stat_concurrency"] + self.options["read_concurrency"] + self.options["write_concurrency"] + 1
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix="cvmd-io")
+        self._converting: Set["asyncio.Future[Any]"] = set()
+        # Outputs with known content in this run, by content hash: (output path, manifest key)
+        self._outputs: Dict[str, Tuple[str, str]] = {}
+        # Copies waiting for the file with the same content that is being converted, by content hash
+        self._waiting: Dict[str, List[Dict[str, Any]]] = {}
+        # Sources whose conversion failed, by content hash
+        self._failed: Dict[str, str] = {}
+        # Checked files waiting to be scheduled, as (-predicted seconds, order, item)
+        self._scheduled: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._schedule_order = itertools.count()
+        self._checks_done = False
+        # Estimated worker memory of the documents dispatched and not converted yet
+        self._reserved_mb = 0.0
+    
+    def results(self) -> Iterator[Dict[str, Any]]:
+        """
+        Run the pipeline, yielding each file as it is finished.
+        
+        Yields:
+            Dicts with source, output, key (manifest key), record (run record whose status is
+            "skipped", "converted", "duplicate" or "failed", with cache "failed" for known failures),
+            stat, digest, quick (skipped by quick_check), convert_failed (the converter itself failed),
+            limit_exceeded (it was stopped by the worker timeout or memory limit) and, for duplicates, source_output
+        """
+        loop = asyncio.new_event_loop()
+        runner: Optional["asyncio.Future[Any]"] = None
+        try:
+            loop.run_until_complete(self._create_queues())
+            runner = asyncio.ensure_future(self._run(), loop=loop)
+            done = False
+            while not done:
+                # Every result already waiting is taken at once, so unchanged trees don't pay a loop run per file
+                for item in loop.run_until_complete(self._next_results(runner)):
+                    if item is None:
+                        done = True
+                        break
+                    yield item
+            loop.run_until_complete(runner)
+        finally:
+            # Stopped early or failed: cancel every stage before closing the loop
+            pending = [task for task in [runner] + list(self._converting) if task is not None and not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._executor.shutdown(wait=True)
+            loop.close()
+    
+    async def _create_queues(self) -> None:
+        # Created on the pipeline's own loop
+        self._scan_queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(self.options["scan_queue"])
+        self._read_queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(self.options["read_queue"])
+        self._write_queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(self.options["write_queue"])
+        self._result_queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(self.options["result_queue"])
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._memory = asyncio.Condition()
+        # Signalled when the scheduling window or the read queue changes
+        self._schedule_changed = asyncio.Condition()
+    
+    async def _next_results(self, runner: "asyncio.Future[Any]") -> List[Optional[Dict[str, Any]]]:
+        getter = asyncio.ensure_future(self._result_queue.get())
+        await asyncio.wait([getter, runner], return_when=asyncio.FIRST_COMPLETED)
+        if getter.done():
+            items = [getter.result()]
+            while not self._result_queue.empty():
+                items.append(self._result_queue.get_nowait())
+            return items
+        getter.cancel()
+        # The pipeline failed before finishing, raise its error
+        runner.result()
+        return [None]
+    
+    async def _in_thread(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_event_loop().run_in_executor(self._executor, fn, *args)
+    
+    async def _run(self) -> None:
+        scanner = asyncio.ensure_future(self._scan())
+        checkers = [asyncio.ensure_future(self._check_files()) for _ in range(self.options["stat_concurrency"])]
+        readers = [asyncio.ensure_future(self._read_files()) for _ in range(self.options["read_concurrency"])]
+        writers = [asyncio.ensure_future(self._write_files()) for _ in range(self.options["write_concurrency"])]
+        dispatchers = [asyncio.ensure_future(self._dispatch_scheduled())] if self.schedule is not None else []
+        try:
+            # Each stage is told to stop once the stage feeding it is done
+            await scanner
+            for _ in checkers:
+                await self._scan_queue.put(None)
+            await asyncio.gather(*checkers)
+            if dispatchers:
+                async with self._schedule_changed:
+                    self._checks_done = True
+                    self._schedule_changed.notify_all()
+                await asyncio.gather(*dispatchers)
+            for _ in readers:
+                await self._read_queue.put(None)
+            await asyncio.gather(*readers)
+            while self._converting:
+                await asyncio.gather(*list(self._converting))
+            for _ in writers:
+                await self._write_queue.put(None)
+            await asyncio.gather(*writers)
+        except BaseException:
+            for task in [scanner] + checkers + dispatchers + readers + writers + list(self._converting):
+                task.cancel()
+            raise
+        await self._result_queue.put(None)
+    
+    # ----- Stages -----
+    
+    async def _scan(self) -> None:
+        sources = iter(self.sources)
+        while True:
+            # The directory walk itself blocks on the file system too
+            folder, current = await self._in_thread(self._next_folder, sources)
+            if folder is None:
+                return
+            root, names = folder
+            relative_path = os.path.relpath(root, self.input_path)
+            output_dir = os.path.join(self.output_folder, relative_path) if relative_path != '.' else self.output_folder
+            prefix = "" if relative_path == "." else relative_path.replace(os.sep, "/") + "/"
+            for filename in names:
+                key = prefix + filename
+                item = {
+                    "source": os.path.join(root, filename),
+                    "output": os.path.join(output_dir, f"{filename}.md"),
+                    "key": key,
+                    "record": make_run_record(key),
+                    "stat": None,
+                    "digest": None,
+                    "quick": filename in current
+                }
+                if item["quick"]:
+                    stat, digest = current[filename]
+                    item["record"].update(cache="hit", status="skipped", input_bytes=stat.st_size if stat else None)
+                    item.update(stat=stat, digest=digest)
+                    self._outputs.setdefault(digest, (item["output"], key))
+                    await self._result_queue.put(item)
+                else:
+                    await self._scan_queue.put(item)
+    
+    def _next_folder(self, sources: Iterator[Tuple[str, List[str]]]) -> Tuple[Optional[Tuple[str, List[str]]], Dict[str, Tuple[Optional[os.stat_result], str]]]:
+        # Runs on the I/O threads: the next folder of the walk and its files known to be up to date
+        folder = next(sources, None)
+        if folder is None or self.quick_check is None:
+            return folder, {}
+        return folder, self.quick_check(*folder)
+    
+    async def _check_files(self) -> None:
+        while True:
+            item = await self._scan_queue.get()
+            if item is None:
+                return
+            record = item["record"]
+            try:
+                (stat, is_current, digest), record["stat_s"] = await self._in_thread(_timed, self.check, item["source"], item["output"], item["key"])
+            except Exception as e:
+                # Any error of a single file fails only that file, the run goes on
+                await self._finish_failed(item, str(e))
+                continue
+            record["input_bytes"] = stat.st_size
+            item.update(stat=stat, digest=digest)
+            if is_current:
+                record.update(cache="hit", status="skipped")
+                self._outputs.setdefault(digest, (item["output"], item["key"]))
+                await self._result_queue.put(item)
+            elif await self._skip_known_failure(item):
+                continue
+            elif self.schedule is not None:
+                predicted_s, item["memory_mb"] = self.schedule(item)
+                record["predicted_s"] = predicted_s
+                async with self._schedule_changed:
+                    # A full window holds back the checks rather than growing with the tree
+                    await self._schedule_changed.wait_for(lambda: len(self._scheduled) < self.schedule_window)
+                    heapq.heappush(self._scheduled, (-predicted_s, next(self._schedule_order), item))
+                    self._schedule_changed.notify_all()
+            else:
+                await self._read_queue.put(item)
+    
+    async def _dispatch_scheduled(self) -> None:
+        # Longest predicted conversion in the window first, each waiting until its memory fits the budget.
+        # Only a few files are handed to the read queue ahead of the readers, so the choice is made late.
+        def ready() -> bool:
+            if not self._scheduled:
+                return self._checks_done
+            return self._read_queue.qsize() < self.options["read_concurrency"]
+        
+        while True:
+            async with self._schedule_changed:
+                await self._schedule_changed.wait_for(ready)
+                if not self._scheduled:
+                    return
+                item = heapq.heappop(self._scheduled)[2]
+                self._schedule_changed.notify_all()
+            memory_mb = item["memory_mb"]
+            if self.memory_budget_mb:
+                async with self._memory:
+                    await self._memory.wait_for(lambda: self._reserved_mb <= 0 or self._reserved_mb + memory_mb <= self.memory_budget_mb)
+            self._reserved_mb += memory_mb
+            await self._read_queue.put(item)
+    
+    async def _release_memory(self, item: Dict[str, Any]) -> None:
+        # Called once a dispatched document no longer needs a worker
+        memory_mb = item.pop("memory_mb", None)
+        if memory_mb is None:
+            return
+        async with self._memory:
+            self._reserved_mb -= memory_mb
+            self._memory.notify_all()
+    
+    async def _read_files(self) -> None:
+        while True:
+            item = await self._read_queue.get()
+            if item is None:
+                return
+            if self.schedule is not None:
+                async with self._schedule_changed:
+                    self._schedule_changed.notify_all()
+            # A slot is held from the read until the output is written, bounding the data in memory
+            await self._slots.acquire()
+            record = item["record"]
+            try:
+                data, record["read_s"] = await self._in_thread(_timed, self.read, item["source"])
+                if item["digest"] is None:
+                    item["digest"], record["hash_s"] = await self._in_thread(_timed, hash_bytes, data)
+            except Exception as e:
+                self._slots.release()
+                await self._release_memory(item)
+                await self._finish_failed(item, str(e))
+                continue
+            if await self._skip_known_failure(item):
+                # Content seen failing before under another name or mtime
+                self._slots.release()
+                await self._release_memory(item)
+                continue
+            if self.dedupe:
+                if await self._deduplicate(item):
+                    self._slots.release()
+                    await self._release_memory(item)
+                    continue
+                # Copies read while this file converts wait for its output
+                self._waiting[item["digest"]] = []
+                item["primary"] = True
+            try:
+                future = self.submit((item["source"], data, self.section_index, item["digest"]))
+            except Exception as e:
+                self._slots.release()
+                await self._release_memory(item)
+                await self._finish_failed(item, str(e))
+                continue
+            finally:
+                del data
+            task = asyncio.ensure_future(self._convert(item, future))
+            self._converting.add(task)
+            task.add_done_callback(self._converting.discard)
+    
+    async def _convert(self, item: Dict[str, Any], future: "concurrent.futures.Future[Any]") -> None:
+        from convert_workers import ConversionMemoryExceeded, ConversionTimeout
+        try:
+            text, sections, error, metrics = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            text, sections, error, metrics = None, None, str(e), {}
+            # Stopped by the worker limits rather than failed by the converter
+            item["limit_exceeded"] = isinstance(e, (ConversionTimeout, ConversionMemoryExceeded))
+        await self._release_memory(item)
+        item["record"].update(metrics)
+        if error is not None:
+            item["convert_failed"] = True
+            self._slots.release()
+            await self._finish_failed(item, error)
+            return
+        item.update(text=text, sections=sections)
+        await self._write_queue.put(item)
+    
+    async def _write_files(self) -> None:
+        while True:
+            item = await self._write_queue.get()
+            if item is None:
+                return
+            record = item["record"]
+            text, sections = item.pop("text"), item.pop("sections")
+            try:
+                record["output_bytes"], record["write_s"] = await self._in_thread(_timed, _write_output, item["output"], text, sections, self.section_index)
+            except Exception as e:
+                await self._finish_failed(item, str(e))
+                continue
+            finally:
+                del text, sections
+                self._slots.release()
+            record["status"] = "converted"
+            await self._result_queue.put(item)
+            self._outputs[item["digest"]] = (item["output"], item["key"])
+            for duplicate in self._waiting.pop(item["digest"], []):
+                await self._link(duplicate, item["output"], item["key"], get_record_seconds(record))
+    
+    # ----- Duplicates & Failures -----
+    
+    async def _deduplicate(self, item: Dict[str, Any]) -> bool:
+        # Returns True if the item was handled as a copy of another file
+        digest = item["digest"]
+        if digest in self._outputs:
+            output, key = self._outputs[digest]
+            await self._link(item, output, key, None)
+        elif digest in self._waiting:
+            self._waiting[digest].append(item)
+        elif digest in self._failed:
+            await self._finish_failed(item, f"identical to {self._failed[digest]}")
+        else:
+            return False
+        return True
+    
+    async def _link(self, item: Dict[str, Any], source_output: str, source_key: str, saved_s: Optional[float]) -> None:
+        try:
+            method = await self._in_thread(_link_output, source_output, item["output"], self.section_index)
+        except Exception as e:
+            await self._finish_failed(item, str(e))
+            return
+        item["record"].update(status="duplicate", duplicate_of=source_key, link=method, saved_s=saved_s)
+        item["source_output"] = source_output
+        await self._result_queue.put(item)
+    
+    async def _skip_known_failure(self, item: Dict[str, Any]) -> bool:
+        # Returns True if the item's content already failed to convert with these settings
+        if self.known_failure is None or item["digest"] is None:
+            return False
+        error = self.known_failure(item["digest"])
+        if error is None:
+            return False
+        item["record"].update(cache="failed", status="failed", error=error)
+        await self._result_queue.put(item)
+        return True
+    
+    async def _finish_failed(self, item: Dict[str, Any], error: str) -> None:
+        item["record"].update(status="failed", error=error)
+        await self._result_queue.put(item)
+        # Copies of a file that failed would fail the same way
+        if not item.get("primary"):
+            return
+        digest = item["digest"]
+        waiting = self._waiting.pop(digest, [])
+        self._failed[digest] = item["source"]
+        for duplicate in waiting:
+            duplicate["record"].update(status="failed", error=f"identical to {item['source']}: {error}")
+            await self._result_queue.put(duplicate)
+
+# ----- Blocking Steps -----
+
+def _read_file(file_path: str) -> bytes:
+    with open(file_path, "rb") as f:
+        return f.read()
+
+def _write_output(output_path: str, content: Union[str, List[Dict[str, Any]]], sections: Optional[List[Dict[str, Any]]], section_index: bool) -> int:
+    from convert_markdown import save_section_index, write_split_output, remove_output_parts
+    if isinstance(content, list):
+        # Parts from split_parts, each released once written
+        return write_split_output(output_path, content, section_index)
+    # Write atomically so an interrupted run leaves no truncated output
+    write_file_atomic(output_path, content)
+    if sections is not None:
+        save_section_index(output_path, sections)
+    # The document may have been split by an earlier run
+    remove_output_parts(output_path)
+    return os.path.getsize(output_path)
+
+def _link_output(source_output: str, output_path: str, section_index: bool) -> str:
+    from convert_markdown import link_output
+    return link_output(source_output, output_path, section_index)
@@ -0,0 +1,178 @@
+import os
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from convert_utils import get_state_path, write_file_atomic
+
+COSTS_VERSION = 1
+# Weight of the samples already in the model when a new one is added, so estimates
+# follow the last few hundred conversions of each format
+DECAY = 0.995
+
+# Starting estimates per format until previous runs have been timed:
+# (seconds per file, seconds per MB of input, worker MB per MB of input)
+DEFAULT_COSTS: Dict[str, Tuple[float, float, float]] = {
+    ".pdf": (0.3, 2.0, 8.0),
+    ".docx": (0.2, 1.0, 10.0),
+    ".doc": (0.3, 1.0, 10.0),
+    ".xlsx": (0.3, 4.0, 30.0),
+    ".xlsm": (0.3, 4.0, 30.0),
+    ".xls": (0.3, 4.0, 30.0),
+    ".pptx": (0.3, 0.5, 5.0),
+    ".png": (0.5, 1.0, 10.0),
+    ".jpg": (0.5, 1.0, 10.0),
+    ".jpeg": (0.5, 1.0, 10.0)
+}
+FALLBACK_COST = (0.3, 1.0, 10.0)
+# Memory of a worker converting a tiny file
+BASE_MEMORY_MB = 50.0
+
+def get_schedule_options(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the scheduling settings from defaults and the config's schedule_options.
+    
+    Args:
+        config: Optional configuration dictionary containing schedule_options
+    
+    Returns:
+        Dict with enabled, memory_budget_mb (None for half the physical memory),
+        memory_factor (worker MB per MB of input, by extension) and window (checked
+        files held back to pick the longest from, None for 4 times the documents in flight)
+    """
+    options: Dict[str, Any] = {
+        "enabled": True,
+        "memory_budget_mb": None,
+        "memory_factor": {},
+        "window": None
+    }
+    
+    # Override with settings from config if provided
+    if config and "schedule_options" in config:
+        options.update(config["schedule_options"])
+    
+    if options["memory_budget_mb"] is None:
+        total_mb = get_physical_memory_mb()
+        options["memory_budget_mb"] = total_mb / 2 if total_mb else 4096
+    return options
+
+def get_physical_memory_mb() -> Optional[float]:
+    """
+    Get the physical memory of this machine.
+    
+    Returns:
+        Memory in megabytes, or None if it can't be measured on this platform
+    """
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.virtual_memory().total / (1024 * 1024)
+    except Exception:
+        return None
+
+class CostModel:
+    """
+    Conversion time per format as a function of input size, learned from previous runs.
+    
+    Each format keeps decayed least-squares sums of (input MB, convert seconds),
+    so its estimate is a fixed cost per file plus a cost per MB. Formats with
+    too few timed files use DEFAULT_COSTS.
+    """
+    
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path: Model file, see get_costs_path
+        """
+        self.path = path
+        self._sums: Dict[str, List[float]] = {}
+        self._loaded: Dict[str, List[float]] = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                costs = json.load(f)
+            if costs.get("version") == COSTS_VERSION:
+                self._sums = {ext: list(sums) for ext, sums in costs["formats"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        self._loaded = {ext: list(sums) for ext, sums in self._sums.items()}
+    
+    def predict(self, ext: str, size_bytes: int) -> float:
+        """
+        Estimate how long a file takes to convert.
+        
+        Args:
+            ext: File extension including the dot
+            size_bytes: Size of the file
+        
+        Returns:
+            Estimated conversion time in seconds
+        """
+        mb = size_bytes / (1024 * 1024)
+        sums = self._sums.get(ext.lower())
+        if sums:
+            n, sx, sy, sxx, sxy = sums
+            if n >= 2:
+                variance = n * sxx - sx * sx
+                if variance > 1e-9 * n * n:
+                    slope = max(0.0, (n * sxy - sx * sy) / variance)
+                    return max(0.0, (sy - slope * sx) / n) + slope * mb
+                # All files about the same size: scale their mean time
+                return sy / n if sx <= 0 else sy / sx * mb
+        base_s, per_mb_s, _ = DEFAULT_COSTS.get(ext.lower(), FALLBACK_COST)
+        return base_s + per_mb_s * mb
+    
+    def observe(self, ext: str, size_bytes: int, seconds: float) -> None:
+        """
+        Add the measured conversion time of one file to the model.
+        
+        Args:
+            ext: File extension including the dot
+            size_bytes: Size of the file
+            seconds: Measured conversion time
+        """
+        mb = size_bytes / (1024 * 1024)
+        sums = self._sums.setdefault(ext.lower(), [0.0] * 5)
+        for i, value in enumerate((1.0, mb, seconds, mb * mb, mb * seconds)):
+            sums[i] = sums[i] * DECAY + value
+    
+    def save(self) -> None:
+        """Save the model if it learned anything in this run."""
+        if self._sums == self._loaded:
+            return
+        try:
+            write_file_atomic(self.path, json.dumps({"version": COSTS_VERSION, "formats": self._sums}))
+        except OSError as e:
+            print(f"Error saving cost model {self.path}: {e}")
+        self._loaded = {ext: list(sums) for ext, sums in self._sums.items()}
+
+def estimate_memory_mb(ext: str, size_bytes: int, memory_factor: Optional[Dict[str, float]] = None) -> float:
+    """
+    Estimate the memory a worker needs to convert a file.
+    
+    Args:
+        ext: File extension including the dot
+        size_bytes: Size of the file
+        memory_factor: Worker MB per MB of input overriding DEFAULT_COSTS, by extension
+    
+    Returns:
+        Estimated peak worker memory in megabytes
+    """
+    factor = (memory_factor or {}).get(ext.lower())
+    if factor is None:
+        factor = DEFAULT_COSTS.get(ext.lower(), FALLBACK_COST)[2]
+    return BASE_MEMORY_MB + factor * size_bytes / (1024 * 1024)
+
+def get_costs_path(output_folder: str, suffix: str = "") -> str:
+    """
+    Get the path of the cost model of an output folder.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+        suffix: Shard suffix, see get_shard_suffix
+    
+    Returns:
+        Path to the cost model file
+    """
+    return get_state_path(output_folder, f"costs{suffix}.json")
@@ -0,0 +1,280 @@
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from convert_utils import get_state_path
+from convert_markdown import HEADING_RE, FENCE_RE, list_output_parts
+
+SEARCH_DB_FILENAME = "search.sqlite"
+# Bump when the schema or the way documents are split changes, the index is then rebuilt
+SEARCH_SCHEMA_VERSION = 2
+# bm25 weights of the (key, heading, body, line) columns: heading matches count ten times a body match
+HEADING_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+# ----- Document Splitting -----
+
+def split_sections(text: str, title: str) -> List[Tuple[str, str, int]]:
+    """
+    Split a Markdown document into sections at its headings.
+    
+    Args:
+        text: Markdown content
+        title: Document title used as the root of every heading path (the file name)
+    
+    Returns:
+        List of (heading path such as "book.xlsx > Sheet1", body, 1-based start line)
+    """
+    sections: List[Tuple[str, str, int]] = []
+    headings: List[Tuple[int, str]] = []
+    body: List[str] = []
+    start_line = 1
+    in_fence = False
+    
+    def flush() -> None:
+        content = "\n".join(body).strip()
+        if content or headings:
+            path = " > ".join([title] + [heading for _, heading in headings])
+            sections.append((path, content, start_line))
+    
+    # Split on "\n" only, so line numbers match editors even with form feeds in PDF output
+    for line_number, line in enumerate(text.split("\n"), 1):
+        line = line.rstrip("\r")
+        if FENCE_RE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else HEADING_RE.match(line)
+        if match is None:
+            body.append(line)
+            continue
+        flush()
+        level = len(match.group(1))
+        # A heading closes every open heading of the same or a deeper level
+        headings = [(lvl, heading) for lvl, heading in headings if lvl < level]
+        headings.append((level, match.group(2)))
+        body = []
+        start_line = line_number
+    flush()
+    if not sections:
+        sections.append((title, "", 1))
+    return sections
+
+# ----- Index Maintenance -----
+
+def get_search_db_path(output_folder: str) -> str:
+    """
+    Get the path of the search index of an output folder.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+    
+    Returns:
+        Path to the SQLite database
+    """
+    return get_state_path(output_folder, SEARCH_DB_FILENAME)
+
+def open_search_index(output_folder: str) -> sqlite3.Connection:
+    """
+    Open the search index, creating or rebuilding its schema if needed.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+    
+    Returns:
+        Open SQLite connection
+    """
+    db_path = get_search_db_path(output_folder)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SEARCH_SCHEMA_VERSION:
+        conn.executescript("DROP TABLE IF EXISTS documents; DROP TABLE IF EXISTS sections;")
+        conn.execute("CREATE TABLE documents (key TEXT PRIMARY KEY, signature TEXT NOT NULL)")
+        try:
+            # Folding diacritics lets "tai lieu" match "tài liệu"
+            conn.execute("CREATE VIRTUAL TABLE sections USING fts5(key UNINDEXED, heading, body, line UNINDEXED, tokenize='unicode61 remove_diacritics 2')")
+        except sqlite3.OperationalError:
+            conn.execute("CREATE VIRTUAL TABLE sections USING fts5(key UNINDEXED, heading, body, line UNINDEXED)")
+        conn.execute(f"PRAGMA user_version = {SEARCH_SCHEMA_VERSION}")
+        conn.commit()
+    return conn
+
+def sync_search_index(output_folder: str, signatures: Dict[str, str]) -> Tuple[int, int]:
+    """
+    Bring the search index in line with the converted documents.
+    
+    Only documents whose signature changed are re-read and re-indexed, and
+    documents that are no longer listed are removed, so a run where nothing
+    changed costs a single query.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+        signatures: Dict mapping source path relative to the input folder (manifest key)
+            to a string that changes whenever its Markdown output changes
+    
+    Returns:
+        Tuple of (documents indexed, documents removed)
+    """
+    conn = open_search_index(output_folder)
+    try:
+        indexed_signatures = dict(conn.execute("SELECT key, signature FROM documents"))
+        stale = [key for key in indexed_signatures if key not in signatures]
+        changed = [key for key, signature in signatures.items() if indexed_signatures.get(key) != signature]
+        if not stale and not changed:
+            return 0, 0
+        
+        with conn:
+            for key in stale + changed:
+                conn.execute("DELETE FROM sections WHERE key = ?", (key,))
+                conn.execute("DELETE FROM documents WHERE key = ?", (key,))
+            indexed = 0
+            for key in changed:
+                markdown_path = os.path.join(output_folder, *key.split("/")) + ".md"
+                title = os.path.basename(key)
+                # A split output is indexed part by part, its own file only lists the parts
+                documents = [(part_path, f"{title} > {os.path.basename(part_path)}") for part_path in list_output_parts(markdown_path)]
+                try:
+                    for document_path, document_title in documents or [(markdown_path, title)]:
+                        with open(document_path, "r", encoding="utf-8") as f:
+                            text = f.read()
+                        conn.executemany(
+                            "INSERT INTO sections (key, heading, body, line) VALUES (?, ?, ?, ?)",
+                            [(key, heading, body, line) for heading, body, line in split_sections(text, document_title)]
+                        )
+                except OSError as e:
+                    print(f"Error indexing {markdown_path}: {e}")
+                    continue
+                conn.execute("INSERT INTO documents (key, signature) VALUES (?, ?)", (key, signatures[key]))
+                indexed += 1
+        return indexed, len(stale)
+    finally:
+        conn.close()
+
+def sync_search_index_from_manifest(output_folder: str, manifest: Dict[str, Any], create: bool = True) -> None:
+    """
+    Sync the search index with the documents listed in a conversion manifest.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+        manifest: Manifest dict from load_manifest
+        create: Create the index if it doesn't exist yet
+    """
+    if not create and not os.path.exists(get_search_db_path(output_folder)):
+        return
+    # Content hash and converter settings together decide what the output contains
+    signatures = {key: f"{entry['hash']}:{entry['settings']}" for key, entry in manifest["files"].items()}
+    try:
+        indexed, removed = sync_search_index(output_folder, signatures)
+    except sqlite3.Error as e:
+        print(f"Error updating search index: {e}")
+        return
+    if indexed or removed:
+        print(f"Search index: {indexed} documents indexed, {removed} removed")
+
+# ----- Queries -----
+
+def build_match_query(query: str) -> str:
+    """
+    Turn free text into an FTS5 query matching all words, so punctuation can't break the syntax.
+    
+    Args:
+        query: Words typed by the user
+    
+    Returns:
+        FTS5 MATCH expression
+    """
+    words = re.findall(r"\w+", query)
+    return " ".join('"{}"'.format(word.replace('"', '""')) for word in words)
+
+def search(output_folder: str, query: str, limit: int = 10, sections_per_file: int = 3, raw: bool = False) -> List[Dict[str, Any]]:
+    """
+    Search the converted documents.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+        query: Words to look for (all must match), or an FTS5 expression if raw is True
+        limit: Maximum number of files returned
+        sections_per_file: Maximum number of matching sections returned per file
+        raw: Pass the query to FTS5 unchanged (supports OR, NEAR, prefix* and column filters)
+    
+    Returns:
+        Files ranked best first, each a dict with path, score and its matching sections
+        (heading, line and snippet)
+    """
+    if not os.path.exists(get_search_db_path(output_folder)):
+        return []
+    match = query if raw else build_match_query(query)
+    if not match:
+        return []
+    
+    conn = open_search_index(output_folder)
+    try:
+        # Files are ranked by their best section in SQL, so a few files with many matching
+        # sections can't crowd out the rest; snippets are only built for the sections returned
+        rows = conn.execute(
+            f"""
+            WITH hits AS (
+                SELECT rowid AS id, key, bm25(sections, 0.0, {HEADING_WEIGHT}, {BODY_WEIGHT}, 0.0) AS score
+                FROM sections WHERE sections MATCH ?
+            ), ranked AS (
+                SELECT id, key, score, ROW_NUMBER() OVER (PARTITION BY key ORDER BY score, id) AS n FROM hits
+            ), files AS (
+                SELECT key, score AS best FROM ranked WHERE n = 1 ORDER BY score, key LIMIT ?
+            ), chosen AS (
+                SELECT id, best, n FROM ranked JOIN files USING (key) WHERE n <= ?
+            )
+            SELECT sections.key, heading, line, snippet(sections, -1, '[', ']', '...', 16), best
+            FROM chosen JOIN sections ON sections.rowid = chosen.id
+            WHERE sections MATCH ? ORDER BY best, sections.key, n
+            """,
+            (match, limit, sections_per_file, match)
+        ).fetchall()
+    finally:
+        conn.close()
+    
+    # Rows come grouped by file, best file first
+    results: Dict[str, Dict[str, Any]] = {}
+    for key, heading, line, snippet, score in rows:
+        result = results.get(key)
+        if result is None:
+            result = results[key] = {
+                "path": os.path.join(output_folder, *key.split("/")) + ".md",
+                "source": key,
+                "score": -score,
+                "sections": []
+            }
+        result["sections"].append({"heading": heading, "line": line, "snippet": snippet})
+    return list(results.values())
+
+def run_search(output_folder: str, query: str, limit: int = 10, raw: bool = False, as_json: bool = False) -> None:
+    """
+    Search the converted documents and print the ranked results.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+        query: Words to look for
+        limit: Maximum number of files shown
+        raw: Pass the query to FTS5 unchanged
+        as_json: Print the results as JSON instead of text
+    """
+    if not os.path.exists(get_search_db_path(output_folder)):
+        print(f"No search index in {output_folder}, run 'cvmd' to convert documents first")
+        return
+    start = time.perf_counter()
+    try:
+        results = search(output_folder, query, limit=limit, raw=raw)
+    except sqlite3.OperationalError as e:
+        print(f"Invalid search query: {e}")
+        return
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    if as_json:
+        import json
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    for rank, result in enumerate(results, 1):
+        print(f"{rank}. {result['path']}  (score {result['score']:.2f})")
+        for section in result["sections"]:
+            snippet = " ".join(section["snippet"].split())
+            print(f"   L{section['line']} {section['heading']}: {snippet}")
+    print(f"{len(results)} files found in {elapsed_ms:.1f} ms")
@@ -0,0 +1,335 @@
+import os
+import json
+import re
+import time
+import threading
+import collections
+import socketserver
+import urllib.parse
+import http.server
+from typing import Any, Deque, Dict, Optional
+
+from convert_utils import get_worker_options, hash_bytes, percentile
+
+# Latencies kept for the percentiles reported by /metrics
+LATENCY_WINDOW = 1024
+
+class ServerBusy(Exception):
+    """Raised for a request that arrives while the queue is full."""
+
+def get_server_options(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the conversion server settings from defaults and the config's server_options.
+    
+    Args:
+        config: Optional configuration dictionary containing server_options
+    
+    Returns:
+        Dict with queue_size and max_request_mb
+    """
+    options = {
+        # Requests waiting for a free worker; more are answered 503 right away
+        "queue_size": 64,
+        "max_request_mb": 256
+    }
+    
+    # Override with settings from config if provided
+    if config and "server_options" in config:
+        options.update(config["server_options"])
+    
+    return options
+
+class ConversionServer:
+    """
+    Pool of pre-warmed MarkItDown workers serving conversions to local clients.
+    
+    Each worker process imports MarkItDown and builds its instance once at
+    start-up, so a request only pays for the conversion. At most jobs
+    requests convert at once and queue_size more wait; any further request
+    is rejected with ServerBusy instead of piling up in memory.
+    """
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None, jobs: Optional[int] = None, queue_size: Optional[int] = None) -> None:
+        """
+        Args:
+            config: Optional configuration dictionary (converter_options, worker_options, ocr_cache, server_options)
+            jobs: Number of worker processes (default: CPU count)
+            queue_size: Requests allowed to wait for a worker (default: server_options.queue_size)
+        """
+        from convert_utils import _init_worker
+        from convert_workers import WorkerPool
+        
+        options = get_server_options(config)
+        self.jobs = max(1, jobs or os.cpu_count() or 1)
+        self.queue_size = max(0, queue_size if queue_size is not None else options["queue_size"])
+        self.max_request_bytes = int(options["max_request_mb"] * 1024 * 1024)
+        # Responses are single documents, never split into parts
+        worker_config = dict(config or {}, split_output={"enabled": False})
+        self.pool = WorkerPool(self.jobs, initializer=_init_worker, initargs=(worker_config,), keep_warm=True, **get_worker_options(config))
+        
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._started = time.time()
+        self._counts = {"requests": 0, "converted": 0, "failed": 0, "rejected": 0}
+        self._max_queue_depth = 0
+        self._latencies: Deque[float] = collections.deque(maxlen=LATENCY_WINDOW)
+        self._convert_times: Deque[float] = collections.deque(maxlen=LATENCY_WINDOW)
+    
+    def convert(self, data: bytes, file_extension: str) -> str:
+        """
+        Convert one document on a warm worker, waiting for a free one if needed.
+        
+        Args:
+            data: Content of the document
+            file_extension: Extension telling MarkItDown the format, with or without the dot
+        
+        Returns:
+            Post-processed Markdown text
+        
+        Raises:
+            ServerBusy: If jobs + queue_size requests are already admitted
+            WorkerError: If the conversion failed, timed out or ran out of memory
+        """
+        from convert_utils import _convert_data
+        from convert_workers import WorkerError
+        
+        start = time.perf_counter()
+        with self._lock:
+            self._counts["requests"] += 1
+            if self._admitted >= self.jobs + self.queue_size:
+                self._counts["rejected"] += 1
+                raise ServerBusy(f"{self._admitted} requests in progress")
+            self._admitted += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._admitted - self.jobs)
+        try:
+            ext = file_extension if file_extension.startswith(".") else f".{file_extension}"
+            # The content hash lets the workers reuse OCR results across requests
+            task = (f"document{ext.lower()}", data, False, hash_bytes(data))
+            text, _, error, metrics = self.pool.submit(_convert_data, task).result()
+            if error is not None:
+                raise WorkerError(error)
+        except Exception:
+            with self._lock:
+                self._counts["failed"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._admitted -= 1
+        with self._lock:
+            self._counts["converted"] += 1
+            self._latencies.append(time.perf_counter() - start)
+            self._convert_times.append(metrics.get("convert_s") or 0.0)
+        return text
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get the request counters, queue depth and latency percentiles.
+        
+        Returns:
+            Dict with uptime_s, workers, queue_size, the request counters, in_flight,
+            queue_depth, max_queue_depth and latency_s/convert_s percentiles (p50, p90, p99)
+        """
+        with self._lock:
+            result: Dict[str, Any] = dict(self._counts)
+            result.update(
+                uptime_s=round(time.time() - self._started, 3),
+                workers=self.jobs,
+                queue_size=self.queue_size,
+                in_flight=self._admitted,
+                queue_depth=max(0, self._admitted - self.jobs),
+                max_queue_depth=self._max_queue_depth
+            )
+            for name, values in (("latency_s", list(self._latencies)), ("convert_s", list(self._convert_times))):
+                result[name] = {f"p{pct}": round(percentile(values, pct), 4) for pct in (50, 90, 99)} if values else None
+        return result
+    
+    def close(self) -> None:
+        """Stop the worker processes."""
+        self.pool.shutdown(cancel=True)
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    HTTP API of ConversionServer.
+    
+    POST /convert?format=pdf converts the request body; POST /convert?path=...
+    converts a local file. GET /metrics returns ConversionServer.metrics as
+    JSON and GET /health answers once the server is up.
+    """
+    
+    server_version = "cvmd"
+    protocol_version = "HTTP/1.1"
+    
+    def do_GET(self) -> None:
+        path = urllib.parse.urlsplit(self.path).path
+        if path == "/health":
+            self._send(200, b"ok\n", "text/plain; charset=utf-8")
+        elif path == "/metrics":
+            self._send_json(200, self.server.conversion.metrics())
+        else:
+            self._send_json(404, {"error": f"unknown path {path}"})
+    
+    def do_POST(self) -> None:
+        from convert_workers import ConversionTimeout, WorkerError
+        
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        conversion = self.server.conversion
+        header = self.headers.get("Content-Length")
+        # int() would also accept signs, underscores and non-ASCII digits
+        length = int(header) if header is not None and re.fullmatch(r"\s*[0-9]+\s*", header) else None
+        if header is not None and length is None:
+            # Without a usable length the body can't be skipped, so the connection is closed
+            self.close_connection = True
+            self._send_json(400, {"error": f"invalid Content-Length {header!r}"})
+            return
+        if length is not None and length > conversion.max_request_bytes:
+            # The connection is closed rather than reading a body that is refused anyway
+            self.close_connection = True
+            self._send_json(413, {"error": "document too large"})
+            return
+        source = query.get("path")
+        if length is None:
+            if url.path == "/convert" and not source:
+                self.close_connection = True
+                self._send_json(400, {"error": "Content-Length is required when converting the request body"})
+                return
+            # A request naming a file on the server needs no body
+            length = 0
+        if url.path != "/convert":
+            self._discard(length)
+            self._send_json(404, {"error": f"unknown path {url.path}"})
+            return
+        
+        file_extension = query.get("format") or (os.path.splitext(source)[1] if source else "")
+        if not file_extension:
+            self._discard(length)
+            self._send_json(400, {"error": "format is required when converting the request body"})
+            return
+        try:
+            if source:
+                self._discard(length)
+                if os.path.getsize(source) > conversion.max_request_bytes:
+                    raise ValueError("document too large")
+                with open(source, "rb") as f:
+                    data = f.read()
+            else:
+                data = self.rfile.read(length)
+        except OSError as e:
+            self._send_json(404, {"error": str(e)})
+            return
+        except ValueError as e:
+            self._send_json(413, {"error": str(e)})
+            return
+        
+        try:
+            text = conversion.convert(data, file_extension)
+        except ServerBusy as e:
+            self._send_json(503, {"error": str(e)}, {"Retry-After": "1"})
+        except ConversionTimeout as e:
+            self._send_json(504, {"error": str(e)})
+        except WorkerError as e:
+            self._send_json(422, {"error": str(e)})
+        else:
+            self._send(200, text.encode("utf-8"), "text/markdown; charset=utf-8")
+    
+    def _discard(self, length: int) -> None:
+        # Unread body bytes would be taken for the next request on a kept-alive connection
+        while length > 0:
+            chunk = self.rfile.read(min(length, 1024 * 1024))
+            if not chunk:
+                break
+            length -= len(chunk)
+    
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+    
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "local"
+    
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class _TCPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def make_http_server(conversion: ConversionServer, host: str = "127.0.0.1", port: int = 8765, socket_path: Optional[str] = None, verbose: bool = False) -> socketserver.BaseServer:
+    """
+    Bind the HTTP API of a conversion server to a local TCP port or Unix socket.
+    
+    Args:
+        conversion: Server doing the conversions
+        host: Address to listen on (default: loopback only)
+        port: TCP port, 0 for any free port
+        socket_path: Unix socket to listen on instead of host and port
+        verbose: Log every request to stderr
+    
+    Returns:
+        Server whose serve_forever handles requests, one thread per connection
+    """
+    if socket_path:
+        # A socket left behind by a server that was killed would make bind fail
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server: socketserver.BaseServer = _UnixServer(socket_path, _RequestHandler)
+    else:
+        server = _TCPServer((host, port), _RequestHandler)
+    server.conversion = conversion  # type: ignore[attr-defined]
+    server.verbose = verbose  # type: ignore[attr-defined]
+    return server
+
+def get_server_address(server: socketserver.BaseServer) -> str:
+    """
+    Describe where a server from make_http_server listens.
+    
+    Args:
+        server: Server from make_http_server
+    
+    Returns:
+        http://host:port URL, or unix:path for a Unix socket
+    """
+    if isinstance(server, _UnixServer):
+        return f"unix:{server.server_address}"
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+def serve(config: Optional[Dict[str, Any]] = None, jobs: Optional[int] = None, host: str = "127.0.0.1", port: int = 8765, socket_path: Optional[str] = None, queue_size: Optional[int] = None, verbose: bool = False) -> None:
+    """
+    Run a conversion server until interrupted.
+    
+    Args:
+        config: Optional configuration dictionary
+        jobs: Number of worker processes (default: CPU count)
+        host: Address to listen on (default: loopback only)
+        port: TCP port
+        socket_path: Unix socket to listen on instead of host and port
+        queue_size: Requests allowed to wait for a worker
+        verbose: Log every request to stderr
+    """
+    conversion = ConversionServer(config, jobs, queue_size)
+    try:
+        server = make_http_server(conversion, host, port, socket_path, verbose)
+    except BaseException:
+        conversion.close()
+        raise
+    print(f"Serving conversions on {get_server_address(server)} with {conversion.jobs} workers (queue: {conversion.queue_size})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        conversion.close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import hashlib
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from convert_utils import get_state_path, write_file_atomic
+
+SNAPSHOT_VERSION = 1
+# A folder changed less than this long before it was listed may change again within the
+# same mtime tick (FAT has 2 s, others 1 s or less), so its listing is not trusted next run
+RACY_NS = 2 * 10**9
+# Unchanged files from which the run summary suggests trust_directory_mtime; at 50k files the
+# per-file stat still makes a no-op run take well over a second
+STAT_HINT_FILES = 10000
+
+def get_snapshot_options(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the directory snapshot settings from defaults and the config's snapshot.
+    
+    Args:
+        config: Optional configuration dictionary containing snapshot
+    
+    Returns:
+        Dict with enabled and trust_directory_mtime
+    """
+    options = {
+        "enabled": True,
+        # Also skip the stat of each file in unchanged folders, for trees whose files are only
+        # ever replaced (saved through a temporary file, copied by rsync, checked out by git)
+        "trust_directory_mtime": False
+    }
+    
+    # Override with settings from config if provided
+    if config and "snapshot" in config:
+        options.update(config["snapshot"])
+    
+    return options
+
+class DirectorySnapshot:
+    """
+    Listing of every folder of the source tree, kept between runs.
+    
+    A folder's mtime changes whenever an entry is added, removed or renamed
+    in it, so a folder whose mtime matches the snapshot is not listed again:
+    its matching files and sub-folders come from the snapshot. The mtime of
+    the matching output folder is recorded at the end of each run too, so
+    outputs known to the manifest are known to still exist while it is
+    unchanged. The snapshot is dropped when the file types or ignore
+    patterns change.
+    """
+    
+    def __init__(self, path: str, scan_key: str) -> None:
+        """
+        Args:
+            path: Snapshot file, see get_snapshot_path
+            scan_key: Hash of everything that decides which files a listing keeps, see make_scan_key
+        """
+        self.path = path
+        self.scan_key = scan_key
+        # Listings of the previous run, by folder path relative to the input folder
+        self._previous: Dict[str, Dict[str, Any]] = {}
+        # Listings of this run
+        self._current: Dict[str, Dict[str, Any]] = {}
+        # Folders whose listing came from the previous run unchanged
+        self._unchanged: Set[str] = set()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if snapshot.get("version") == SNAPSHOT_VERSION and snapshot.get("key") == scan_key:
+                self._previous = snapshot["dirs"]
+        except (OSError, ValueError, KeyError):
+            pass
+    
+    def lookup(self, relative_path: str, mtime_ns: int) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Get the listing of a folder if it didn't change since the previous run.
+        
+        Args:
+            relative_path: Folder path relative to the input folder, "/"-separated ("." for the root)
+            mtime_ns: Current mtime of the folder
+        
+        Returns:
+            Tuple of (matching file names, sub-folders to walk), or None if the folder must be listed
+        """
+        entry = self._previous.get(relative_path)
+        if entry is None or entry["mtime_ns"] != mtime_ns or mtime_ns > entry["listed_ns"] - RACY_NS:
+            return None
+        self._current[relative_path] = entry
+        self._unchanged.add(relative_path)
+        return entry["files"], entry["dirs"]
+    
+    def record(self, relative_path: str, mtime_ns: int, listed_ns: int, files: List[str], dirs: List[str]) -> None:
+        """
+        Store the listing of a folder that was just listed.
+        
+        Args:
+            relative_path: Folder path relative to the input folder
+            mtime_ns: Mtime of the folder before it was listed
+            listed_ns: Time the folder was listed, in nanoseconds since the epoch
+            files: Names of the matching files
+            dirs: Names of the sub-folders to walk
+        """
+        self._current[relative_path] = {"mtime_ns": mtime_ns, "listed_ns": listed_ns, "files": files, "dirs": dirs}
+    
+    def outputs_unchanged(self, relative_path: str, output_folder: str) -> bool:
+        """
+        Tell whether a folder and its output folder are both unchanged since the previous run.
+        
+        Args:
+            relative_path: Folder path relative to the input folder
+            output_folder: Directory for converted Markdown files
+        
+        Returns:
+            True if the outputs of the previous run can be trusted to still exist
+        """
+        if relative_path not in self._unchanged:
+            return False
+        entry = self._previous[relative_path]
+        try:
+            mtime_ns = os.stat(get_output_dir(output_folder, relative_path)).st_mtime_ns
+        except OSError:
+            return False
+        return entry.get("output_mtime_ns") == mtime_ns and mtime_ns <= entry.get("output_listed_ns", 0) - RACY_NS
+    
+    def save(self, output_folder: str) -> None:
+        """
+        Save the listings of this run, with the mtime of each folder's output folder as it is now.
+        
+        Args:
+            output_folder: Directory for converted Markdown files
+        """
+        now_ns = int(time.time() * 10**9)
+        for relative_path, entry in self._current.items():
+            if not entry["files"]:
+                continue
+            try:
+                output_mtime_ns: Optional[int] = os.stat(get_output_dir(output_folder, relative_path)).st_mtime_ns
+            except OSError:
+                output_mtime_ns = None
+            # An output folder seen changing recently is checked again, so it is trusted once it settles
+            racy = output_mtime_ns is not None and output_mtime_ns > entry.get("output_listed_ns", 0) - RACY_NS
+            if output_mtime_ns != entry.get("output_mtime_ns") or racy:
+                self._current[relative_path] = dict(entry, output_mtime_ns=output_mtime_ns, output_listed_ns=now_ns)
+        if self._current == self._previous:
+            return
+        snapshot = {"version": SNAPSHOT_VERSION, "key": self.scan_key, "dirs": self._current}
+        try:
+            write_file_atomic(self.path, json.dumps(snapshot, separators=(",", ":")))
+        except OSError as e:
+            print(f"Error saving directory snapshot {self.path}: {e}")
+        self._previous = self._current
+
+def get_output_dir(output_folder: str, relative_path: str) -> str:
+    """
+    Get the output folder matching a source folder.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+        relative_path: Folder path relative to the input folder, "/"-separated ("." for the root)
+    
+    Returns:
+        Path to the folder holding the folder's converted files
+    """
+    return output_folder if relative_path == "." else os.path.join(output_folder, *relative_path.split("/"))
+
+def get_snapshot_path(output_folder: str, suffix: str = "") -> str:
+    """
+    Get the path of the directory snapshot of an output folder.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+        suffix: Shard suffix, see get_shard_suffix
+    
+    Returns:
+        Path to the snapshot file
+    """
+    return get_state_path(output_folder, f"snapshot{suffix}.json")
+
+def make_scan_key(input_path: str, output_folder: str, file_types: List[str], ignore_patterns: Optional[List[str]]) -> str:
+    """
+    Hash everything that decides which files and folders a listing keeps.
+    
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files
+        file_types: List of file extensions to convert
+        ignore_patterns: Patterns of files and folders to skip
+    
+    Returns:
+        Hex digest
+    """
+    key = json.dumps([os.path.abspath(input_path), os.path.abspath(output_folder), sorted(file_types), ignore_patterns or []])
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
@@ -4,15 +4,14 @@ import importlib.util
 import sys
 import json
 import re
-import re
+import hashlib
+import time
+import itertools
 from datetime import datetime
-from typing import Dict, List, Optional, Set, Any, Union
-import requests
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Any, Tuple, Union
 
-try:
-    from importlib.metadata import version, PackageNotFoundError
-except ImportError:
-    from importlib_metadata import version, PackageNotFoundError  # type: ignore
+# Heavy modules (requests, importlib.metadata, multiprocessing, markitdown) are
+# imported inside the functions that need them to keep CLI startup fast.
 
 # ----- Package & Dependency Management -----
 
@@ -31,7 +30,6 @@ def install_package(package_name: str, extras: Optional[str] = None) -> None:
     if importlib.util.find_spec(package_name) is None:
         print(f"Installing {package_spec}...")
         try:
-            subprocess.check_call([sys.executable, "-m", "pip", "install", package_spec], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             subprocess.check_call([sys.executable, "-m", "pip", "install", package_spec], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             print(f"{package_spec} installed successfully")
         except subprocess.CalledProcessError as e:
@@ -43,16 +41,7 @@ def install_package(package_name: str, extras: Optional[str] = None) -> None:
         subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", package_spec], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         print(f"{package_spec} updated successfully")
     return
-        print(f"{package_spec} already installed")
-        # Ensure the package is up to date
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", package_spec], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        print(f"{package_spec} updated successfully")
-    return
 
-def setup_markitdown() -> None:
-    """
-    Setup MarkItDown with all required dependencies and update PATH if needed.
-    """
 def setup_markitdown() -> None:
     """
     Setup MarkItDown with all required dependencies and update PATH if needed.
@@ -94,59 +83,172 @@ def setup_markitdown() -> None:
     except Exception as e:
         print(f"Warning: Could not update PATH: {e}")
 
-def configure_markitdown(config: Optional[Dict[str, Any]] = None) -> Any:
+# Image formats MarkItDown reads with exiftool or a vision model rather than parsing text
+OCR_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+
+def get_converter_settings(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
-    Configure MarkItDown with optimized settings.
+    Build the MarkItDown settings from defaults and the config's converter_options.
     
     Args:
         config: Optional configuration dictionary containing converter_options
-        
-    Returns:
-        MarkItDown: Configured MarkItDown instance
-    """
-def configure_markitdown(config: Optional[Dict[str, Any]] = None) -> Any:
-    """
-    Configure MarkItDown with optimized settings.
     
-    Args:
-        config: Optional configuration dictionary containing converter_options
-        
     Returns:
-        MarkItDown: Configured MarkItDown instance
+        Dict of keyword arguments for MarkItDown
     """
-    # Ensure markitdown is installed with all extras
-    setup_markitdown()
-    
     # Default settings
     settings = {
         "pdf_ocr": True,
         "excel_table_format": "markdown",
         "pptx_extract_notes": True,
         "pptx_extract_images": False,
-        "output_encoding": "utf-8"
+        "output_encoding": "utf-8",
+        # Post-processing of the converted text, see convert_markdown.POSTPROCESSORS
+        "drop_nan_cells": True,
+        "compact_tables": True,
+        "collapse_blank_lines": True
     }
     
     # Override with settings from config if provided
     if config and "converter_options" in config:
         settings.update(config["converter_options"])
     
-    # Default settings
-    settings = {
-        "pdf_ocr": True,
-        "excel_table_format": "markdown",
-        "pptx_extract_notes": True,
-        "pptx_extract_images": False,
-        "output_encoding": "utf-8"
+    return settings
+
+def get_worker_options(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the worker process limits from defaults and the config's worker_options.
+    
+    Args:
+        config: Optional configuration dictionary containing worker_options
+    
+    Returns:
+        Dict of keyword arguments for WorkerPool
+    """
+    # Default limits: no single document may run longer than 10 minutes,
+    # and workers are replaced regularly to bound slow memory leaks
+    options = {
+        "timeout": 600,
+        "max_memory_mb": None,
+        "max_tasks_per_worker": 100,
+        "recycle_rss_mb": 1024
     }
     
     # Override with settings from config if provided
-    if config and "converter_options" in config:
-        settings.update(config["converter_options"])
+    if config and "worker_options" in config:
+        options.update(config["worker_options"])
+    
+    return options
+
+def get_ocr_cache_options(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the OCR cache settings from defaults and the config's ocr_cache.
+    
+    Args:
+        config: Optional configuration dictionary containing ocr_cache
+    
+    Returns:
+        Dict with enabled, max_size_mb and path (None for the user's cache directory)
+    """
+    options = {
+        "enabled": True,
+        "max_size_mb": 512,
+        "path": None
+    }
+    
+    # Override with settings from config if provided
+    if config and "ocr_cache" in config:
+        options.update(config["ocr_cache"])
+    
+    return options
+
+def get_split_options(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the settings for splitting large outputs from defaults and the config's split_output.
+    
+    Args:
+        config: Optional configuration dictionary containing split_output
+    
+    Returns:
+        Dict with enabled, threshold_mb (output size above which it is split) and part_size_mb
+    """
+    options = {
+        "enabled": True,
+        "threshold_mb": 10,
+        "part_size_mb": 2
+    }
+    
+    # Override with settings from config if provided
+    if config and "split_output" in config:
+        options.update(config["split_output"])
+    
+    return options
+
+def is_ocr_conversion(ext: str, settings: Dict[str, Any]) -> bool:
+    """
+    Tell whether converting a file of this type runs OCR or image recognition.
+    
+    Args:
+        ext: File extension including the dot
+        settings: Converter settings from get_converter_settings
+    
+    Returns:
+        True for images, and for every file when Azure Document Intelligence is configured
+    """
+    return ext.lower() in OCR_EXTENSIONS or bool(settings.get("docintel_endpoint"))
+
+def build_markitdown(config: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Create a MarkItDown instance without touching the installed packages.
+    
+    Args:
+        config: Optional configuration dictionary containing converter_options
     
+    Returns:
+        MarkItDown: Configured MarkItDown instance
+    """
     from markitdown import MarkItDown
-    md = MarkItDown(**settings)
-    md = MarkItDown(**settings)
-    return md
+    return MarkItDown(**get_converter_settings(config))
+
+def configure_markitdown(config: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Configure MarkItDown with optimized settings.
+    
+    Args:
+        config: Optional configuration dictionary containing converter_options
+    
+    Returns:
+        MarkItDown: Configured MarkItDown instance
+    """
+    # Ensure markitdown is installed with all extras
+    setup_markitdown()
+    
+    return build_markitdown(config)
+
+def convert_document(data: bytes, file_extension: str, config: Optional[Dict[str, Any]] = None, md: Any = None) -> str:
+    """
+    Convert one document held in memory to Markdown.
+    
+    Nothing is read or written on disk: no config file, manifest, OCR cache
+    or project setup, so it is safe to call from pipelines once per document.
+    
+    Args:
+        data: Content of the document
+        file_extension: Extension telling MarkItDown the format, with or without the dot
+        config: Optional configuration dictionary containing converter_options
+        md: MarkItDown instance to reuse (default: a new one from build_markitdown)
+    
+    Returns:
+        Post-processed Markdown text
+    """
+    import io
+    from convert_markdown import postprocess_markdown
+    
+    if md is None:
+        md = build_markitdown(config)
+    ext = file_extension if not file_extension or file_extension.startswith(".") else f".{file_extension}"
+    text_content = md.convert_stream(io.BytesIO(data), file_extension=ext.lower()).text_content
+    return postprocess_markdown(text_content, get_converter_settings(config))
 
 # ----- Configuration Management ----
 
@@ -156,12 +258,11 @@ def load_config(config_path: str = "convert_config.json") -> Dict[str, Any]:
     
     Args:
         config_path: Path to the configuration file
-        
+    
     Returns:
         Dict containing configuration settings
     """
     default_config = {
-        "file_types": [".pdf", ".xlsx", ".docx", ".pptx", ".xls", ".doc", ".xlsm", ".png", ".jpg", ".jpeg"],
         "file_types": [".pdf", ".xlsx", ".docx", ".pptx", ".xls", ".doc", ".xlsm", ".png", ".jpg", ".jpeg"],
         "ignore_patterns": ["*"]
     }
@@ -184,29 +285,31 @@ def load_config(config_path: str = "convert_config.json") -> Dict[str, Any]:
             print(f"Default configuration saved to {config_path}")
         except Exception as e:
             print(f"Error creating default config file: {e}")
-        try:
-            with open(config_path, "w", encoding="utf-8") as f:
-                json.dump(default_config, f, indent=4)
-            print(f"Default configuration saved to {config_path}")
-        except Exception as e:
-            print(f"Error creating default config file: {e}")
     
     return default_config
 
-# ----- Environment & Project Setup -----
-
-def update_cursorignore(project_folder: str, ignore_patterns: List[str], file_types: List[str]) -> None:
+def read_config(config_path: Optional[str]) -> Dict[str, Any]:
     """
-    Update or create .cursorignore to exclude original files and folders containing converted files.
+    Read a configuration file without printing or creating anything, unlike load_config.
     
     Args:
-        project_folder: Root folder of the project
-        ignore_patterns: Patterns to ignore
-        file_types: File extensions to ignore
+        config_path: Path to the configuration file, or None for no configuration
+    
+    Returns:
+        Dict containing configuration settings (empty if config_path is None)
+    
+    Raises:
+        OSError: If the file cannot be read
+        ValueError: If the file is not valid JSON
     """
+    if not config_path:
+        return {}
+    with open(config_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 # ----- Environment & Project Setup -----
 
-def update_cursorignore(project_folder: str, ignore_patterns: List[str], file_types: List[str]) -> None:
+def update_cursorignore(project_folder: str, ignore_patterns: List[str], file_types: List[str], result: Optional["ConversionResult"] = None) -> None:
     """
     Update or create .cursorignore to exclude original files and folders containing converted files.
     
@@ -214,6 +317,7 @@ def update_cursorignore(project_folder: str, ignore_patterns: List[str], file_ty
         project_folder: Root folder of the project
         ignore_patterns: Patterns to ignore
         file_types: File extensions to ignore
+        result: Conversion whose source folders are added, if any
     """
     cursorignore_path = os.path.join(project_folder, ".cursorignore")
     
@@ -221,19 +325,15 @@ def update_cursorignore(project_folder: str, ignore_patterns: List[str], file_ty
     patterns_to_add = set()
     
     # Add file types patterns
-    for ext in file_types:
     for ext in file_types:
         patterns_to_add.add(f"*{ext}")
     
     # Add ignore patterns from config
     for pattern in ignore_patterns:
-        # Remove * if present
         # Remove * if present
         clean_pattern = pattern.replace("*", "").replace("/", "\\")
         if clean_pattern:  # Only add non-empty patterns
             patterns_to_add.add(clean_pattern)
-        if clean_pattern:  # Only add non-empty patterns
-            patterns_to_add.add(clean_pattern)
     
     # Read existing patterns from .cursorignore (if it exists)
     existing_patterns = set()
@@ -244,50 +344,29 @@ def update_cursorignore(project_folder: str, ignore_patterns: List[str], file_ty
     # Add new patterns if they don't already exist
     new_patterns = patterns_to_add - existing_patterns
     if new_patterns:
+        print(f"Updated .cursorignore with: {', '.join(new_patterns)}")
+    
+    # Add folders containing converted files (use \\)
+    new_folders: List[str] = []
+    for folder in sorted(result.converted_folders if result is not None else ()):
+        rel_folder = os.path.relpath(folder, project_folder).replace("/", "\\")
+        if not rel_folder.endswith("\\"):
+            rel_folder += "\\"
+        if rel_folder not in existing_patterns and rel_folder not in new_folders:
+            new_folders.append(rel_folder)
+    if new_folders:
+        print(f"Added {len(new_folders)} folders to .cursorignore")
+    
+    # The file is only touched when something is missing from it
+    if new_patterns or new_folders:
         with open(cursorignore_path, "a", encoding="utf-8") as f:
-            for pattern in new_patterns:
+            for pattern in list(new_patterns) + new_folders:
                 f.write(f"{pattern}\n")
-        print(f"Updated .cursorignore with: {', '.join(new_patterns)}")
-        print(f"Updated .cursorignore with: {', '.join(new_patterns)}")
-
-    # Update .cursorignore with folders containing converted files (use \\)
-    folder_patterns = set()
-    if os.path.exists(cursorignore_path):
-        with open(cursorignore_path, "r", encoding="utf-8") as f:
-            for line in f:
-                l = line.strip()
-                if l.endswith("\\"):
-                    folder_patterns.add(l)
-    
-    # Get list of folders from recent conversions (if any)
-    # Get list of folders from recent conversions (if any)
-    if hasattr(update_cursorignore, "converted_folders"):
-        for folder in update_cursorignore.converted_folders:
-            rel_folder = os.path.relpath(folder, project_folder).replace("/", "\\")
-            if not rel_folder.endswith("\\"):
-                rel_folder += "\\"
-            if rel_folder not in folder_patterns:
-                with open(cursorignore_path, "a", encoding="utf-8") as f:
-                    f.write(f"{rel_folder}\n")
-                folder_patterns.add(rel_folder)
-        print(f"Added {len(folder_patterns)} folders to .cursorignore")
-    # Remove attribute after use
-        print(f"Added {len(folder_patterns)} folders to .cursorignore")
-    # Remove attribute after use
-    if hasattr(update_cursorignore, "converted_folders"):
-        del update_cursorignore.converted_folders
 
 def update_vscode_settings(output_folder: str) -> None:
     """
     Update VS Code settings to exclude the output folder.
     
-    Args:
-        output_folder: Path to the output folder
-    """
-def update_vscode_settings(output_folder: str) -> None:
-    """
-    Update VS Code settings to exclude the output folder.
-    
     Args:
         output_folder: Path to the output folder
     """
@@ -305,15 +384,12 @@ def update_vscode_settings(output_folder: str) -> None:
                 settings = json.load(f)
         except json.JSONDecodeError:
             print("Warning: Invalid VS Code settings file. Creating a new one.")
-        try:
-            with open(vscode_settings_path, 'r', encoding='utf-8') as f:
-                settings = json.load(f)
-        except json.JSONDecodeError:
-            print("Warning: Invalid VS Code settings file. Creating a new one.")
     
-    # Update files.exclude
+    # Update files.exclude, leaving the file alone if the folder is already excluded
     files_exclude = settings.get('files.exclude', {})
     relative_output_folder = os.path.relpath(output_folder, os.getcwd()).replace("\\", "/")
+    if files_exclude.get(relative_output_folder) is True:
+        return
     files_exclude[relative_output_folder] = True
     settings['files.exclude'] = files_exclude
     
@@ -324,24 +400,11 @@ def update_vscode_settings(output_folder: str) -> None:
         print(f"Updated VS Code settings to exclude {relative_output_folder}")
     except Exception as e:
         print(f"Error updating VS Code settings: {e}")
-    try:
-        with open(vscode_settings_path, 'w', encoding='utf-8') as f:
-            json.dump(settings, f, indent=4)
-        print(f"Updated VS Code settings to exclude {relative_output_folder}")
-    except Exception as e:
-        print(f"Error updating VS Code settings: {e}")
 
 def update_gitignore(output_folder: str) -> None:
     """
     Add the output folder to .gitignore.
     
-    Args:
-        output_folder: Path to the output folder
-    """
-def update_gitignore(output_folder: str) -> None:
-    """
-    Add the output folder to .gitignore.
-    
     Args:
         output_folder: Path to the output folder
     """
@@ -353,9 +416,10 @@ def update_gitignore(output_folder: str) -> None:
         with open(gitignore_path, 'r', encoding='utf-8') as f:
             existing_patterns = {line.strip() for line in f if line.strip()}
     
-    # Add output folder if not already present
+    # Add output folder if not already present, in any of the forms that ignore it
     relative_output_folder = os.path.relpath(output_folder, os.getcwd()).replace("\\", "/")
-    if relative_output_folder not in existing_patterns:
+    forms = {relative_output_folder, f"{relative_output_folder}/", f"/{relative_output_folder}", f"/{relative_output_folder}/"}
+    if not forms & existing_patterns:
         with open(gitignore_path, 'a', encoding='utf-8') as f:
             f.write(f"{relative_output_folder}/\n")
         print(f"Added {relative_output_folder} to .gitignore")
@@ -401,6 +465,14 @@ def add_cursor_rules_from_docs() -> None:
         print(f"Error reading {docs_path}: {e}")
         return
     
+    # Leave the rules file alone if it is already up to date
+    try:
+        with open(rules_path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return
+    except OSError:
+        pass
+    
     # Write content to cursor_rules.md in the current directory
     try:
         with open(rules_path, 'w', encoding='utf-8') as f:
@@ -417,10 +489,12 @@ def get_latest_github_version(repo: str) -> Optional[str]:
     
     Args:
         repo: GitHub repository in the format "username/repo"
-        
+    
     Returns:
         Latest version tag or None if unavailable
     """
+    import requests
+    
     url = f"https://api.github.com/repos/{repo}/tags"
     try:
         response = requests.get(url, timeout=10)
@@ -440,6 +514,11 @@ def get_local_version() -> Optional[str]:
     Returns:
         Current version or None if unavailable
     """
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        from importlib_metadata import version, PackageNotFoundError  # type: ignore
+    
     try:
         return version("doc2md_tool")
     except PackageNotFoundError:
@@ -470,177 +549,2066 @@ def check_and_upgrade_github_repo() -> None:
     else:
         print("Can't check the local version or GitHub.")
 
-# ----- File Conversion -----
+# ----- Environment Verification -----
+
+# Re-run the pip/GitHub checks at most once per this many hours
+DEFAULT_ENV_CHECK_INTERVAL_HOURS = 24
 
-def convert_files(input_path: str, output_folder: str, file_types: List[str], config: Optional[Dict[str, Any]] = None) -> List[str]:
+def get_cache_dir() -> str:
     """
-    Convert files matching specified types directly from input path.
+    Get the per-user cache directory shared by all projects.
     
-    Args:
-        input_path: Directory containing files to convert
-        output_folder: Directory for converted Markdown files
-        file_types: List of file extensions to convert
-        config: Optional configuration dictionary
-        
     Returns:
-        List of paths to converted files
+        Path to the doc2md_tool folder in the user's cache directory
     """
-    # Check and upgrade markitdown and main repo if needed
-    install_package("markitdown", "all")
-    check_and_upgrade_github_repo()
-    
-    # Create output directory if it doesn't exist
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-    
-    # Update VS Code settings and .gitignore
-    update_vscode_settings(output_folder)
-    update_gitignore(output_folder)
-    
-    # Add cursor rules
-    add_cursor_rules_from_docs()
+    if sys.platform == "win32":
+        cache_dir = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+    else:
+        cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_dir, "doc2md_tool")
+
+def get_env_stamp_path() -> str:
+    """
+    Get the path of the stamp file recording the last successful environment check.
     
-    # Configure MarkItDown with settings from config
-    md = configure_markitdown(config)
-    # Add cursor rules
-    add_cursor_rules_from_docs()
+    Returns:
+        Path to the stamp file in the user's cache directory
+    """
+    return os.path.join(get_cache_dir(), "env_stamp.json")
+
+def is_env_stamp_fresh(interval_hours: float = DEFAULT_ENV_CHECK_INTERVAL_HOURS) -> bool:
+    """
+    Check whether the environment was verified recently for the running interpreter.
     
-    # Configure MarkItDown with settings from config
-    md = configure_markitdown(config)
+    Args:
+        interval_hours: How long a successful check stays valid
     
-    if not os.path.exists(input_path):
-        print(f"Directory {input_path} does not exist")
-        return []
+    Returns:
+        True if the stamp file is recent and markitdown is still importable
+    """
+    stamp_path = get_env_stamp_path()
+    try:
+        with open(stamp_path, "r", encoding="utf-8") as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if stamp.get("python") != sys.executable:
+        return False
+    if time.time() - stamp.get("checked_at", 0) > interval_hours * 3600:
+        return False
+    return importlib.util.find_spec("markitdown") is not None
+
+def write_env_stamp() -> None:
+    """
+    Record that the environment was verified for the running interpreter.
+    """
+    stamp_path = get_env_stamp_path()
+    try:
+        write_file_atomic(stamp_path, json.dumps({"python": sys.executable, "checked_at": time.time()}, indent=4))
+    except OSError as e:
+        print(f"Warning: Could not write environment stamp {stamp_path}: {e}")
+
+def ensure_environment(offline: bool = False, force: bool = False, interval_hours: float = DEFAULT_ENV_CHECK_INTERVAL_HOURS) -> None:
+    """
+    Install/upgrade MarkItDown and check for a newer doc2md-tool, unless done recently.
     
-    # Track all converted files for metadata
-    converted_files: List[str] = []
-    converted_files: List[str] = []
-    # Track all folders containing converted files
-    converted_folders: Set[str] = set()
-    converted_folders: Set[str] = set()
-    # Track created output directories to avoid redundant checks
-    created_output_dirs: Set[str] = set([output_folder])
-    created_output_dirs: Set[str] = set([output_folder])
-    
-    # Process files recursively through all subfolders
-    for root, dirs, files in os.walk(input_path):
-        # Get files to convert in this directory
-        files_to_convert = [
-            filename for filename in files 
-            if os.path.splitext(filename)[1].lower() in file_types
-        ]
-        
-        # Skip directory creation if no files to convert
-        if not files_to_convert:
-            continue
-            
-        # Create the same folder structure in the output directory only if needed
-        relative_path = os.path.relpath(root, input_path)
-        output_dir = os.path.join(output_folder, relative_path) if relative_path != '.' else output_folder
-        
-        # Create output directory if it doesn't exist yet
-        if output_dir not in created_output_dirs and not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            created_output_dirs.add(output_dir)
-        
-        # Process only files with specified extensions
-        for filename in files_to_convert:
-            input_file_path = os.path.join(root, filename)
-            # Preserve folder structure in output path
-            output_path = os.path.join(output_dir, f"{filename}.md")
-            
-            try:
-                # Skip if file is already converted and unchanged
-                if os.path.exists(output_path) and os.path.getmtime(input_file_path) <= os.path.getmtime(output_path):
-                    print(f"Skipping {input_file_path}, already converted")
-                    converted_files.append(output_path)
-                    # Add folder to the set of converted folders
-                    converted_folders.add(os.path.dirname(input_file_path))
-                    continue
-                
-                # Convert file to Markdown
-                # Convert file to Markdown
-                result = md.convert(input_file_path)
-                # Replace all NaN values with empty string
-                result.text_content = result.text_content.replace('NaN', '')
-                
-                with open(output_path, "w", encoding="utf-8") as f:
-                    f.write(result.text_content)
-                print(f"Converted {input_file_path} to {output_path}")
-                converted_files.append(output_path)
-                # Add folder to the set of converted folders
-                converted_folders.add(os.path.dirname(input_file_path))
-            except Exception as e:
-                print(f"Error converting {input_file_path}: {e}")
+    In offline mode no pip or network calls are made at all; the tool only
+    verifies that markitdown can be imported.
     
-    # Store converted folders for updating .cursorignore
-    update_cursorignore.converted_folders = converted_folders
+    Args:
+        offline: Skip all pip installs and GitHub version checks
+        force: Run the checks even if the stamp file is still fresh
+        interval_hours: How long a successful check stays valid
+    """
+    if offline:
+        if importlib.util.find_spec("markitdown") is None:
+            print("Warning: markitdown is not installed. Run 'cvmd --setup-only' while online.")
+        return
     
-    # Return list of converted files
-    # Store converted folders for updating .cursorignore
-    update_cursorignore.converted_folders = converted_folders
+    if not force and is_env_stamp_fresh(interval_hours):
+        return
     
-    # Return list of converted files
-    return converted_files
+    setup_markitdown()
+    check_and_upgrade_github_repo()
+    write_env_stamp()
 
-# ----- Metadata Management -----
+# ----- Source Tree Scanning -----
 
-def update_metadata_file(project_folder: str, converted_files: List[str]) -> None:
+def _glob_to_regex(pattern: str) -> str:
     """
-    Create or update metadata.md to store metadata of Markdown files in doc_base folder.
+    Translate a gitignore-style glob into a regular expression.
     
     Args:
-        project_folder: Root folder of the project
-        converted_files: List of paths to converted files
+        pattern: Glob pattern using "/" as separator
+    
+    Returns:
+        Regular expression source matching the whole path
     """
-# ----- Metadata Management -----
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            parts.append(f"[{body}]")
+            i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(parts)
 
-def update_metadata_file(project_folder: str, converted_files: List[str]) -> None:
+def compile_ignore_patterns(ignore_patterns: Optional[List[str]]) -> Callable[[str, bool], bool]:
     """
-    Create or update metadata.md to store metadata of Markdown files in doc_base folder.
+    Compile ignore patterns into a single gitignore-style matcher.
+    
+    Patterns without a slash match a file or folder name at any depth
+    (e.g. "node_modules", "*.tmp"), patterns with a slash match the path
+    relative to the input folder, and a trailing slash matches folders only.
+    Patterns made only of wildcards are skipped since they would match the
+    whole tree.
     
     Args:
-        project_folder: Root folder of the project
-        converted_files: List of paths to converted files
+        ignore_patterns: Patterns from the configuration
+    
+    Returns:
+        Function taking (relative path with "/" separators, is_dir) and returning True if ignored
     """
-    if not converted_files:
-        print("No files were converted, skipping metadata update")
-        return
+    # Regexes by (matches full path, folders only)
+    regexes: Dict[Tuple[bool, bool], List[str]] = {}
+    for raw_pattern in ignore_patterns or []:
+        pattern = raw_pattern.strip().replace("\\", "/")
+        if not pattern or pattern.startswith("#") or not pattern.strip("*/"):
+            continue
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        anchored = "/" in pattern
+        regexes.setdefault((anchored, dir_only), []).append(_glob_to_regex(pattern.lstrip("/")))
     
-    # Ensure doc_base directory exists
-    # Ensure doc_base directory exists
-    doc_base_folder = os.path.join(project_folder, "doc_base")
-    if not os.path.exists(doc_base_folder):
-        os.makedirs(doc_base_folder)
+    flags = re.IGNORECASE if os.name == "nt" else 0
+    compiled = {
+        key: re.compile("(?:" + "|".join(sources) + r")\Z", flags)
+        for key, sources in regexes.items()
+    }
+    name_any = compiled.get((False, False))
+    name_dir = compiled.get((False, True))
+    path_any = compiled.get((True, False))
+    path_dir = compiled.get((True, True))
+    
+    def is_ignored(relative_path: str, is_dir: bool) -> bool:
+        name = relative_path.rsplit("/", 1)[-1]
+        if name_any and name_any.match(name):
+            return True
+        if path_any and path_any.match(relative_path):
+            return True
+        if is_dir:
+            if name_dir and name_dir.match(name):
+                return True
+            if path_dir and path_dir.match(relative_path):
+                return True
+        return False
+    
+    return is_ignored
+
+def iter_source_files(input_path: str, output_folder: str, file_types: List[str], ignore_patterns: Optional[List[str]] = None, stats: Optional[Dict[str, int]] = None, snapshot: Optional[Any] = None, archives: Optional[Any] = None) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Walk the input folder and yield the files to convert in each folder.
+    
+    Ignored folders and the output folder are pruned from the walk, so their
+    contents are never listed. Folders are visited top-down in listing order,
+    like os.walk.
+    
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files, always skipped
+        file_types: List of file extensions to convert
+        ignore_patterns: Optional gitignore-style patterns of files and folders to skip
+        stats: Optional dictionary updated with scan counters
+        snapshot: Optional DirectorySnapshot; folders it shows unchanged are not listed again
+        archives: Optional ArchiveIndex; zip archives are walked as folders, after the files next to them
+    
+    Yields:
+        Tuple of (folder path, names of matching files in that folder)
+    """
+    is_ignored = compile_ignore_patterns(ignore_patterns)
+    excluded_dirs = {os.path.normcase(os.path.abspath(output_folder))}
+    counters = stats if stats is not None else {}
+    for key in ("dirs_scanned", "dirs_cached", "dirs_pruned", "files_seen", "files_ignored", "files_matched"):
+        counters.setdefault(key, 0)
+    if archives is not None:
+        from convert_archive import ARCHIVE_EXTENSIONS, is_archive
+        counters.setdefault("archives_scanned", 0)
+        counters.setdefault("archives_cached", 0)
+    # Archives are listed along with the documents, then expanded
+    listed_types = set(file_types) | set(ARCHIVE_EXTENSIONS) if archives is not None else file_types
+    
+    # Folders still to visit, as (path, path relative to input_path)
+    stack = [(input_path, ".")]
+    while stack:
+        root, relative_root = stack.pop()
+        prefix = "" if relative_root == "." else f"{relative_root}/"
+        listing = None
+        if snapshot is not None:
+            try:
+                mtime_ns = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+            listing = snapshot.lookup(relative_root, mtime_ns)
+        
+        if listing is not None:
+            counters["dirs_cached"] += 1
+            files_to_convert, kept_dirs = listing
+        else:
+            listed_ns = int(time.time() * 10**9)
+            try:
+                with os.scandir(root) as it:
+                    entries = list(it)
+            except OSError:
+                # Unreadable folders are skipped, as os.walk does
+                continue
+            counters["dirs_scanned"] += 1
+            dirs, files = [], []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    files.append(entry.name)
+                elif not entry.is_symlink():
+                    # Symlinked folders are not followed
+                    dirs.append(entry.name)
+            
+            # Prune ignored folders so they are never listed
+            kept_dirs = [
+                d for d in dirs
+                if not is_ignored(prefix + d, True)
+                and os.path.normcase(os.path.abspath(os.path.join(root, d))) not in excluded_dirs
+            ]
+            counters["dirs_pruned"] += len(dirs) - len(kept_dirs)
+            
+            counters["files_seen"] += len(files)
+            files_to_convert = []
+            for filename in files:
+                if os.path.splitext(filename)[1].lower() not in listed_types:
+                    continue
+                if is_ignored(prefix + filename, False):
+                    counters["files_ignored"] += 1
+                    continue
+                files_to_convert.append(filename)
+            if snapshot is not None:
+                snapshot.record(relative_root, mtime_ns, listed_ns, files_to_convert, kept_dirs)
+        archive_names: List[str] = []
+        if archives is not None:
+            archive_names = [filename for filename in files_to_convert if is_archive(filename)]
+            if archive_names:
+                files_to_convert = [filename for filename in files_to_convert if not is_archive(filename)]
+        counters["files_matched"] += len(files_to_convert)
+        
+        if files_to_convert:
+            yield root, files_to_convert
+        for filename in archive_names:
+            yield from archives.expand(os.path.join(root, filename), prefix + filename, file_types, is_ignored, counters)
+        # Pushed in reverse so sub-folders are visited in listing order
+        for d in reversed(kept_dirs):
+            stack.append((os.path.join(root, d), prefix + d))
+
+def scan_files(input_path: str, output_folder: str, file_types: List[str], ignore_patterns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Walk the input folder without converting anything and time the scan.
+    
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files, always skipped
+        file_types: List of file extensions to convert
+        ignore_patterns: Optional gitignore-style patterns of files and folders to skip
+    
+    Returns:
+        Dict of scan counters and the elapsed time in seconds
+    """
+    stats: Dict[str, Any] = {}
+    start = time.perf_counter()
+    for _ in iter_source_files(input_path, output_folder, file_types, ignore_patterns, stats):
+        pass
+    stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+# ----- Incremental Conversion Manifest -----
+
+# Folder inside the output directory that holds the tool's own state files
+STATE_DIRNAME = ".cvmd"
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+def get_state_path(output_folder: str, filename: str) -> str:
+    """
+    Get the path of a state file kept inside the output folder.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+        filename: Name of the state file
+    
+    Returns:
+        Path to the state file
+    """
+    return os.path.join(output_folder, STATE_DIRNAME, filename)
+
+def write_file_atomic(path: str, content: str) -> None:
+    """
+    Write text to a file through a temporary file so readers never see a partial write.
+    
+    Args:
+        path: Destination file path
+        content: Text content to write
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the content hash of a file.
+    
+    Args:
+        file_path: Path to the file
+        chunk_size: Number of bytes read per iteration
+    
+    Returns:
+        Hex digest of the file content
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_bytes(data: bytes) -> str:
+    """
+    Compute the content hash of data already in memory, matching hash_file.
+    
+    Args:
+        data: File content
+    
+    Returns:
+        Hex digest of the content
+    """
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+def hash_settings(config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Compute a hash of the converter settings so outputs are redone when they change.
+    
+    Args:
+        config: Optional configuration dictionary containing converter_options and split_output
+    
+    Returns:
+        Hex digest of the effective converter settings
+    """
+    # Splitting decides the layout of the output files, so it counts as a setting too
+    settings = get_converter_settings(config)
+    split_options = get_split_options(config)
+    if split_options["enabled"]:
+        settings = dict(settings, split_output=split_options)
+    settings = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.blake2b(settings.encode("utf-8"), digest_size=20).hexdigest()
+
+def load_manifest(output_folder: str, filename: str = MANIFEST_FILENAME) -> Dict[str, Any]:
+    """
+    Load the conversion manifest from the output folder.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+        filename: Manifest file name, shards each keep their own
+    
+    Returns:
+        Manifest dictionary with a "files" mapping of source path to entry
+    """
+    manifest_path = get_state_path(output_folder, filename)
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION and isinstance(manifest.get("files"), dict):
+                return manifest
+            print(f"Manifest {manifest_path} has an unknown format, rebuilding it")
+        except (OSError, ValueError) as e:
+            print(f"Error loading manifest {manifest_path}: {e}")
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+def save_manifest(output_folder: str, manifest: Dict[str, Any], filename: str = MANIFEST_FILENAME) -> None:
+    """
+    Save the conversion manifest to the output folder.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+        manifest: Manifest dictionary to save
+        filename: Manifest file name, shards each keep their own
+    """
+    manifest_path = get_state_path(output_folder, filename)
+    try:
+        write_file_atomic(manifest_path, json.dumps(manifest, indent=1, sort_keys=True))
+    except OSError as e:
+        print(f"Error saving manifest {manifest_path}: {e}")
+
+def check_manifest_entry(entry: Optional[Dict[str, Any]], input_file_path: str, stat: os.stat_result, settings_hash: str) -> Tuple[bool, Optional[str]]:
+    """
+    Decide whether a source file needs to be converted again.
+    
+    The file content is hashed only when its size or mtime differs from the
+    manifest entry, so unchanged trees cost a single stat per file.
+    
+    Args:
+        entry: Manifest entry of the source file, if any
+        input_file_path: Path to the source file
+        stat: Result of os.stat on the source file
+        settings_hash: Hash of the current converter settings
+    
+    Returns:
+        Tuple of (is up to date, content hash if it was computed)
+    """
+    if not entry or entry.get("settings") != settings_hash:
+        return False, None
+    if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return True, entry.get("hash")
+    digest = hash_file(input_file_path)
+    return digest == entry.get("hash"), digest
+
+def make_failure_entry(stat: os.stat_result, manifest_key: str, error: str, settings_hash: str, crc: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Build the manifest entry of a source file that failed to convert.
+    
+    Entries are keyed by content hash in the manifest's "failures", so the
+    same content is not converted again until the settings change.
+    
+    Args:
+        stat: Result of os.stat on the source file
+        manifest_key: Source path relative to the input folder
+        error: Error message of the failed conversion
+        settings_hash: Hash of the converter settings used
+        crc: CRC listed in the archive, for a source inside a zip archive
+    
+    Returns:
+        Failure entry dictionary
+    """
+    entry = {
+        "path": manifest_key,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "error": error,
+        "settings": settings_hash,
+        "failed_at": datetime.now().isoformat(timespec="seconds")
+    }
+    if crc is not None:
+        entry["crc"] = crc
+    return entry
+
+def make_manifest_entry(stat: os.stat_result, digest: str, settings_hash: str, crc: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Build a manifest entry for a converted source file.
+    
+    Args:
+        stat: Result of os.stat on the source file
+        digest: Content hash of the source file
+        settings_hash: Hash of the converter settings used
+        crc: CRC listed in the archive, for a source inside a zip archive; later
+            runs compare it instead of reading the member
+    
+    Returns:
+        Manifest entry dictionary
+    """
+    entry = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": digest,
+        "settings": settings_hash
+    }
+    if crc is not None:
+        entry["crc"] = crc
+    return entry
+
+def group_duplicate_outputs(output_folder: str, entries: Dict[str, Any]) -> List[List[str]]:
+    """
+    Group the outputs of manifest entries that were converted from the same content.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+        entries: Manifest "files" mapping of source path to entry
+    
+    Returns:
+        Lists of two or more output paths with the same content hash and settings, in manifest order
+    """
+    outputs_by_content: Dict[Tuple[str, str], List[str]] = {}
+    for key, entry in entries.items():
+        outputs_by_content.setdefault((entry.get("hash"), entry.get("settings")), []).append(key)
+    return [
+        [os.path.join(output_folder, *key.split("/")) + ".md" for key in keys]
+        for keys in outputs_by_content.values() if len(keys) > 1
+    ]
+
+# ----- Run Report -----
+
+REPORT_FILENAME = "report.jsonl"
+PROFILE_FILENAME = "profile.pstats"
+# Phases timed for each file, in the order they run
+REPORT_PHASES = ["stat_s", "read_s", "hash_s", "convert_s", "write_s"]
+_RUN_RECORD_TEMPLATE: Dict[str, Any] = {
+    "path": None,
+    "ext": None,
+    "cache": "miss",
+    "status": "pending",
+    **{phase: None for phase in REPORT_PHASES},
+    "input_bytes": None, "output_bytes": None, "duplicate_of": None, "link": None, "saved_s": None, "ocr_cache": None, "parts": None, "predicted_s": None, "error": None
+}
+
+def make_run_record(manifest_key: str) -> Dict[str, Any]:
+    """
+    Create the telemetry record of one source file with every field unset.
+    
+    Args:
+        manifest_key: Source path relative to the input folder
+    
+    Returns:
+        Dict with the file's path, extension, cache result, status, phase timings, sizes,
+        predicted conversion time and error
+    """
+    # Copied from a template: one record is made per file on every run, unchanged ones included
+    return dict(_RUN_RECORD_TEMPLATE, path=manifest_key, ext=os.path.splitext(manifest_key)[1].lower())
+
+def get_record_seconds(record: Dict[str, Any]) -> float:
+    """
+    Get the total time spent on one file across all phases.
+    
+    Args:
+        record: Telemetry record from make_run_record
+    
+    Returns:
+        Sum of the phase timings in seconds
+    """
+    return sum(record[phase] or 0.0 for phase in REPORT_PHASES)
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Get a percentile of a list of values using the nearest-rank method.
+    
+    Args:
+        values: Non-empty list of values
+        pct: Percentile between 0 and 100
+    
+    Returns:
+        The value at that percentile
+    """
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+class RunReport:
+    """
+    Per-file telemetry of a run, written as JSON lines while results arrive and aggregated
+    into run totals on the fly, so memory does not grow with the size of the tree.
+    """
+    
+    def __init__(self, report_path: Optional[str] = None, top_n: int = 10) -> None:
+        """
+        Args:
+            report_path: JSON-lines report to write, or None to only aggregate
+            top_n: Number of slowest files to list
+        """
+        self.report_path = report_path
+        self.top_n = top_n
+        self._file = None
+        self._tmp_path = f"{report_path}.{os.getpid()}.tmp" if report_path else None
+        if self._tmp_path:
+            try:
+                os.makedirs(os.path.dirname(self._tmp_path), exist_ok=True)
+                self._file = open(self._tmp_path, "w", encoding="utf-8")
+            except OSError as e:
+                print(f"Error writing run report {report_path}: {e}")
+                self.report_path = None
+        self._summary: Dict[str, Any] = {
+            "files": 0,
+            "hits": 0,
+            "converted": 0,
+            "failed": 0,
+            "duplicates": 0,
+            "saved_s": 0.0,
+            "ocr_hits": 0,
+            "ocr_misses": 0,
+            "input_bytes": 0,
+            "output_bytes": 0,
+            "phases": {phase: 0.0 for phase in REPORT_PHASES}
+        }
+        # Only converted files are kept past add(), and only their timings
+        self._seconds_by_ext: Dict[str, List[float]] = {}
+        self._errors: List[float] = []
+        self._predicted_s = 0.0
+        self._actual_s = 0.0
+        self._slowest: List[Tuple[float, str]] = []
+    
+    def add(self, record: Dict[str, Any]) -> None:
+        """
+        Write one file's record to the report and add it to the run totals.
+        
+        Args:
+            record: Telemetry record from make_run_record
+        """
+        import heapq
+        seconds = get_record_seconds(record)
+        if self._file is not None:
+            line = dict(record, total_s=seconds)
+            try:
+                self._file.write(json.dumps({key: round(value, 6) if isinstance(value, float) else value for key, value in line.items()}) + "\n")
+            except OSError as e:
+                print(f"Error writing run report {self.report_path}: {e}")
+                self._discard()
+        
+        summary = self._summary
+        summary["files"] += 1
+        summary["hits"] += record["cache"] == "hit"
+        summary["failed"] += record["status"] == "failed"
+        summary["duplicates"] += record["status"] == "duplicate"
+        summary["saved_s"] += record["saved_s"] or 0.0
+        summary["ocr_hits"] += record["ocr_cache"] == "hit"
+        summary["ocr_misses"] += record["ocr_cache"] == "miss"
+        for phase in REPORT_PHASES:
+            summary["phases"][phase] += record[phase] or 0.0
+        if record["status"] != "converted":
+            return
+        summary["converted"] += 1
+        summary["input_bytes"] += record["input_bytes"] or 0
+        summary["output_bytes"] += record["output_bytes"] or 0
+        self._seconds_by_ext.setdefault(record["ext"], []).append(seconds)
+        # Scheduling estimates against the measured conversion times
+        if record["predicted_s"] is not None and record["convert_s"] is not None:
+            self._errors.append(abs(record["convert_s"] - record["predicted_s"]) / max(record["convert_s"], record["predicted_s"], 0.001))
+            self._predicted_s += record["predicted_s"]
+            self._actual_s += record["convert_s"]
+        if len(self._slowest) < self.top_n:
+            heapq.heappush(self._slowest, (seconds, record["path"]))
+        elif self._slowest and seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (seconds, record["path"]))
+    
+    def close(self) -> Optional[str]:
+        """
+        Finish the report file; readers only ever see a complete report.
+        
+        Returns:
+            Path to the report, or None if it couldn't be written
+        """
+        if self._file is None:
+            return None
+        try:
+            self._file.close()
+            os.replace(self._tmp_path, self.report_path)
+        except OSError as e:
+            print(f"Error writing run report {self.report_path}: {e}")
+            self._discard()
+            return None
+        self._file = None
+        return self.report_path
+    
+    def _discard(self) -> None:
+        # A report that failed to write is dropped, the run itself goes on
+        try:
+            self._file.close()
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+        self._file = None
+        self.report_path = None
+    
+    def summarize(self) -> Dict[str, Any]:
+        """
+        Get the run totals, per-extension percentiles and the slowest files.
+        
+        Returns:
+            Dict with totals, per-extension statistics and the slowest converted files
+        """
+        summary = dict(self._summary, phases=dict(self._summary["phases"]), predicted=None, extensions={})
+        for ext, seconds in sorted(self._seconds_by_ext.items()):
+            summary["extensions"][ext] = {
+                "files": len(seconds),
+                "total": sum(seconds),
+                "p50": percentile(seconds, 50),
+                "p90": percentile(seconds, 90),
+                "p99": percentile(seconds, 99)
+            }
+        if self._errors:
+            summary["predicted"] = {
+                "files": len(self._errors),
+                "predicted_s": self._predicted_s,
+                "actual_s": self._actual_s,
+                "p50_error": percentile(self._errors, 50)
+            }
+        summary["slowest"] = [(path, seconds) for seconds, path in sorted(self._slowest, reverse=True)]
+        return summary
+
+def summarize_run(records: Iterable[Dict[str, Any]], top_n: int = 10) -> Dict[str, Any]:
+    """
+    Aggregate per-file telemetry into run totals, per-extension percentiles and the slowest files.
+    
+    Args:
+        records: Telemetry records from make_run_record
+        top_n: Number of slowest files to list
+    
+    Returns:
+        Dict with totals, per-extension statistics and the slowest converted files
+    """
+    report = RunReport(top_n=top_n)
+    for record in records:
+        report.add(record)
+    return report.summarize()
+
+def print_run_summary(summary: Dict[str, Any], report_path: Optional[str]) -> None:
+    """
+    Print the end-of-run telemetry summary.
+    
+    Args:
+        summary: Result of summarize_run
+        report_path: Path to the JSON-lines report, if written
+    """
+    if report_path:
+        print(f"Run report: {report_path}")
+    if summary["duplicates"]:
+        # Copies of outputs from earlier runs have no measured conversion time to count
+        saved = f", saving about {summary['saved_s']:.2f}s of conversion" if summary["saved_s"] else ""
+        print(f"  Deduplicated {summary['duplicates']} files with identical content{saved}")
+    if summary["ocr_hits"] or summary["ocr_misses"]:
+        print(f"  OCR cache: {summary['ocr_hits']} hits, {summary['ocr_misses']} misses")
+    if not summary["converted"]:
+        return
+    phases = ", ".join(f"{phase[:-2]} {seconds:.2f}s" for phase, seconds in summary["phases"].items())
+    print(f"  Time by phase: {phases}")
+    print(f"  Converted {summary['input_bytes'] / (1024 * 1024):.1f} MB into {summary['output_bytes'] / (1024 * 1024):.1f} MB of Markdown")
+    if summary["predicted"]:
+        predicted = summary["predicted"]
+        print(f"  Conversion time: predicted {predicted['predicted_s']:.2f}s, actual {predicted['actual_s']:.2f}s over {predicted['files']} files (median error {predicted['p50_error']:.0%})")
+    print("  Seconds per file by extension:")
+    for ext, stats in summary["extensions"].items():
+        print(f"    {ext or '(none)':<8} n={stats['files']:<5} total={stats['total']:.2f} p50={stats['p50']:.2f} p90={stats['p90']:.2f} p99={stats['p99']:.2f}")
+    print("  Slowest files:")
+    for path, seconds in summary["slowest"]:
+        print(f"    {seconds:8.2f}s  {path}")
+
+def merge_profiles(profile_dir: str, profile_path: str, top_n: int = 15) -> None:
+    """
+    Merge the per-worker cProfile dumps into one pstats file and print the top functions.
+    
+    Args:
+        profile_dir: Folder holding the per-worker dumps, removed afterwards
+        profile_path: Destination of the merged stats
+        top_n: Number of functions to print, by cumulative time
+    """
+    import io
+    import shutil
+    import pstats
+    
+    dumps = [os.path.join(profile_dir, name) for name in sorted(os.listdir(profile_dir)) if name.endswith(".prof")]
+    if not dumps:
+        print("No profile data was collected")
+        return
+    stream = io.StringIO()
+    stats = pstats.Stats(*dumps, stream=stream)
+    stats.dump_stats(profile_path)
+    shutil.rmtree(profile_dir, ignore_errors=True)
+    
+    stats.sort_stats("cumulative").print_stats(top_n)
+    print(stream.getvalue().rstrip())
+    print(f"Profile written to {profile_path} (view with: python -m pstats {profile_path})")
+
+# ----- Deduplication -----
+
+# Linux ioctl cloning a file's extents (copy-on-write) on btrfs, XFS and similar
+FICLONE = 0x40049409
+
+def _reflink(source_path: str, target_path: str) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(source_path, "rb") as source, open(target_path, "wb") as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        return True
+    except OSError:
+        if os.path.exists(target_path):
+            os.remove(target_path)
+        return False
+
+def link_or_copy(source_path: str, target_path: str) -> str:
+    """
+    Materialize a file at target_path with the content of source_path as cheaply as possible.
+    
+    Tries a hardlink, then a reflink (copy-on-write clone), then a plain copy.
+    The target is replaced atomically; since outputs are always rewritten
+    through a temporary file, reconverting one linked output never changes
+    the others.
+    
+    Args:
+        source_path: Existing file
+        target_path: Path to create or replace
+    
+    Returns:
+        Method used: "hardlink", "reflink" or "copy"
+    """
+    import shutil
+    
+    os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+    tmp_path = f"{target_path}.{os.getpid()}.tmp"
+    try:
+        try:
+            os.link(source_path, tmp_path)
+            method = "hardlink"
+        except OSError:
+            if _reflink(source_path, tmp_path):
+                method = "reflink"
+            else:
+                shutil.copyfile(source_path, tmp_path)
+                method = "copy"
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return method
+
+# ----- Sharding -----
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    Parse a shard specification such as "2/4".
+    
+    Args:
+        spec: Shard number (1-based) and shard count separated by "/"
+    
+    Returns:
+        Tuple of (shard number, shard count)
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise ValueError(f"Invalid shard {spec!r}, expected i/N with 1 <= i <= N")
+    return int(match.group(1)), int(match.group(2))
+
+def get_shard_suffix(config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Get the suffix naming the state files of the configured shard.
+    
+    Args:
+        config: Optional configuration dictionary containing shard
+    
+    Returns:
+        ".shard-<i>-of-<N>", or "" when not sharded
+    """
+    if not config or not config.get("shard"):
+        return ""
+    shard_index, shard_count = config["shard"]
+    return f".shard-{shard_index}-of-{shard_count}"
+
+def select_shard(input_path: str, sources: Iterable[Tuple[str, List[str]]], shard_index: int, shard_count: int, archives: Optional[Any] = None) -> List[Tuple[str, List[str]]]:
+    """
+    Keep only the files assigned to one shard.
+    
+    Files are taken largest first, ties broken by a stable hash of their
+    relative path, and each goes to the shard with the least bytes so far.
+    Every machine walking the same tree computes the same assignment, and
+    shards end up with about the same amount of data to convert.
+    
+    The assignment depends on the whole tree, not on each path alone: adding,
+    removing or resizing a file can move smaller files to other shards, which
+    then convert them again since their manifests don't list them yet.
+    
+    Args:
+        input_path: Directory containing files to convert
+        sources: Iterable of (folder path, names of files to convert in that folder)
+        shard_index: Shard to keep (1-based)
+        shard_count: Total number of shards
+        archives: ArchiveIndex the sources were walked with, for the sizes of files inside archives
+    
+    Returns:
+        List of (folder path, names of files of this shard in that folder)
+    """
+    import heapq
+    
+    files: List[Tuple[int, str, str, str]] = []
+    for root, names in sources:
+        for filename in names:
+            file_path = os.path.join(root, filename)
+            relative_path = os.path.relpath(file_path, input_path).replace(os.sep, "/")
+            try:
+                size = archives.stat(file_path).st_size if archives is not None else os.path.getsize(file_path)
+            except OSError:
+                size = 0
+            path_hash = hashlib.blake2b(relative_path.encode("utf-8"), digest_size=8).hexdigest()
+            files.append((size, path_hash, root, filename))
+    files.sort(key=lambda item: (-item[0], item[1]))
+    
+    loads = [(0, shard) for shard in range(shard_count)]
+    selected: Dict[str, List[str]] = {}
+    for size, _, root, filename in files:
+        load, shard = heapq.heappop(loads)
+        heapq.heappush(loads, (load + max(size, 1), shard))
+        if shard == shard_index - 1:
+            selected.setdefault(root, []).append(filename)
+    return list(selected.items())
+
+def merge_shards(shard_folders: List[str], input_path: str, output_folder: str, config: Optional[Dict[str, Any]] = None) -> "ConversionResult":
+    """
+    Combine the outputs and manifests of sharded runs into one output folder without converting anything.
+    
+    Args:
+        shard_folders: Output folders of the shards, may include output_folder itself
+            when shards wrote to a shared folder
+        input_path: Directory the shards converted files from
+        output_folder: Directory receiving the merged Markdown files
+        config: Optional configuration dictionary
+    
+    Returns:
+        ConversionResult listing all merged converted files
+    """
+    from convert_markdown import link_output
+    
+    os.makedirs(output_folder, exist_ok=True)
+    update_vscode_settings(output_folder)
+    update_gitignore(output_folder)
+    
+    # Shard manifests found in each folder, as (folder, file name, shard count)
+    shard_manifests: List[Tuple[str, str, int]] = []
+    for shard_folder in shard_folders:
+        state_dir = os.path.join(shard_folder, STATE_DIRNAME)
+        names = os.listdir(state_dir) if os.path.isdir(state_dir) else []
+        matches = [(name, re.fullmatch(r"manifest\.shard-(\d+)-of-(\d+)\.json", name)) for name in sorted(names)]
+        found = [(shard_folder, name, int(match.group(2))) for name, match in matches if match]
+        if not found:
+            print(f"No shard manifests found in {shard_folder}")
+        shard_manifests.extend(found)
+    
+    # Manifests left over from a run with another shard count would bring back stale entries
+    counts = {count for _, _, count in shard_manifests}
+    if len(counts) > 1:
+        newest = max(shard_manifests, key=lambda item: os.path.getmtime(get_state_path(item[0], item[1])))
+        print(f"Found manifests for {sorted(counts)} shards, merging only the {newest[2]}-shard run")
+        shard_manifests = [item for item in shard_manifests if item[2] == newest[2]]
+    
+    merged: Dict[str, Any] = {}
+    merged_failures: Dict[str, Any] = {}
+    sections_versions: Set[Any] = set()
+    copied = 0
+    for shard_folder, name, _ in shard_manifests:
+        same_folder = os.path.normcase(os.path.abspath(shard_folder)) == os.path.normcase(os.path.abspath(output_folder))
+        shard_manifest = load_manifest(shard_folder, name)
+        entries = shard_manifest["files"]
+        sections_versions.add(shard_manifest.get("sections_version"))
+        # Known failures are kept so unsharded runs of the merged folder skip them too
+        for digest, failure in shard_manifest.get("failures", {}).items():
+            if failure.get("failed_at", "") >= merged_failures.get(digest, {}).get("failed_at", ""):
+                merged_failures[digest] = failure
+        for key, entry in entries.items():
+            source_path = os.path.join(shard_folder, *key.split("/")) + ".md"
+            target_path = os.path.join(output_folder, *key.split("/")) + ".md"
+            if not same_folder:
+                try:
+                    link_output(source_path, target_path)
+                except OSError as e:
+                    print(f"Error merging {source_path}: {e}")
+                    continue
+                copied += 1
+            if key in merged and merged[key] != entry:
+                print(f"Warning: {key} was converted by more than one shard, keeping {name}")
+            merged[key] = entry
+        print(f"Merged {len(entries)} files from {get_state_path(shard_folder, name)}")
+    
+    # Content another shard did convert with the same settings is no longer a failure
+    converted = {(entry["hash"], entry["settings"]) for entry in merged.values()}
+    merged_failures = {digest: failure for digest, failure in merged_failures.items() if (digest, failure.get("settings")) not in converted}
+    manifest = {"version": MANIFEST_VERSION, "files": dict(sorted(merged.items())), "failures": dict(sorted(merged_failures.items()))}
+    if len(sections_versions) == 1 and None not in sections_versions:
+        # Section indexes are only up to date if every shard's are
+        manifest["sections_version"] = sections_versions.pop()
+    save_manifest(output_folder, manifest)
+    failed = f", {len(merged_failures)} known failures" if merged_failures else ""
+    print(f"Merged {len(merged)} files into {output_folder} ({copied} copied{failed})")
+    
+    if not config or config.get("search_index", True):
+        from convert_search import sync_search_index_from_manifest
+        sync_search_index_from_manifest(output_folder, manifest)
+    
+    # Copies converted on different shards are only found now, by their content hash
+    result = ConversionResult()
+    originals: Dict[Tuple[str, str], str] = {}
+    for key, entry in manifest["files"].items():
+        output_path = os.path.join(output_folder, *key.split("/")) + ".md"
+        result.append(output_path)
+        original = originals.setdefault((entry["hash"], entry["settings"]), output_path)
+        if original != output_path:
+            result.duplicates[output_path] = original
+    result.converted_folders = {os.path.dirname(os.path.join(input_path, *key.split("/"))) for key in manifest["files"]}
+    result.duplicate_groups = group_duplicate_outputs(output_folder, manifest["files"])
+    return result
+
+# ----- File Conversion -----
+
+# Result statuses of files that have an up-to-date output
+CONVERTED_STATUSES = ("skipped", "converted", "duplicate")
+
+class ConversionResult(list):
+    """
+    Output paths of one conversion run, carrying what the metadata.md and
+    .cursorignore updates that follow it need to know about the run.
+    """
+    
+    def __init__(self, paths: Iterable[str] = ()) -> None:
+        """
+        Args:
+            paths: Output paths to start with
+        """
+        super().__init__(paths)
+        # Outputs rewritten by the run; None when unknown, so every output is checked
+        self.changed_files: Optional[Set[str]] = None
+        # Outputs materialized from another output with the same content, mapped to that output
+        self.duplicates: Dict[str, str] = {}
+        # Outputs sharing their content, or None when the manifest didn't change
+        self.duplicate_groups: Optional[List[List[str]]] = None
+        # Manifest saved by the run
+        self.manifest_path: Optional[str] = None
+        # Source folders with converted files
+        self.converted_folders: Set[str] = set()
+
+# MarkItDown instance owned by the current worker process
+_worker_md: Any = None
+# Profiler of the current worker process and the folder its stats are dumped to
+_worker_profiler: Any = None
+_worker_profile_path: Optional[str] = None
+# Cache of OCR results shared by all workers, and the settings its keys depend on
+_worker_ocr_cache: Any = None
+_worker_settings: Dict[str, Any] = {}
+_worker_settings_hash = ""
+# Output size above which documents are split into parts, and the size of each part, in bytes
+_worker_split_bytes: Optional[int] = None
+_worker_part_bytes = 0
+# Folder the parts of split outputs are written to before the parent moves them into place
+_worker_staging_dir: Optional[str] = None
+
+def _init_worker(config: Optional[Dict[str, Any]] = None, profile_dir: Optional[str] = None, staging_dir: Optional[str] = None) -> None:
+    """
+    Build the MarkItDown instance once per worker process.
+    
+    Args:
+        config: Optional configuration dictionary containing converter_options
+        profile_dir: Folder for this worker's cProfile dump, or None to not profile
+        staging_dir: Folder for the parts of split outputs, on the output's file system
+            (default: the system temporary folder)
+    """
+    global _worker_md, _worker_profiler, _worker_profile_path, _worker_ocr_cache, _worker_settings, _worker_settings_hash, _worker_split_bytes, _worker_part_bytes, _worker_staging_dir
+    _worker_md = build_markitdown(config)
+    _worker_settings = get_converter_settings(config)
+    _worker_settings_hash = hash_settings(config)
+    split_options = get_split_options(config)
+    if split_options["enabled"]:
+        _worker_split_bytes = int(split_options["threshold_mb"] * 1024 * 1024)
+        _worker_part_bytes = int(split_options["part_size_mb"] * 1024 * 1024)
+        if staging_dir is None:
+            import tempfile
+            staging_dir = tempfile.gettempdir()
+        _worker_staging_dir = staging_dir
+    ocr_cache_options = get_ocr_cache_options(config)
+    if ocr_cache_options["enabled"]:
+        from convert_cache import OcrCache
+        _worker_ocr_cache = OcrCache(ocr_cache_options["path"], ocr_cache_options["max_size_mb"])
+    if profile_dir:
+        import cProfile
+        _worker_profiler = cProfile.Profile()
+        _worker_profile_path = os.path.join(profile_dir, f"worker-{os.getpid()}.prof")
+
+def _convert_data(task: Tuple[str, bytes, bool, Optional[str]]) -> Tuple[Union[str, List[Dict[str, Any]], None], Optional[List[Dict[str, Any]]], Optional[str], Dict[str, Any]]:
+    """
+    Convert the content of one file to Markdown with the worker's MarkItDown instance.
+    
+    Reading and writing happen in the parent's pipeline, so the worker only
+    spends its time converting. Files whose conversion is OCR are looked up
+    in the OCR cache first. Outputs larger than the split threshold are
+    written to the staging folder part by part, and only the parts' paths
+    and sections go back to the parent (see stage_parts).
+    
+    Args:
+        task: Tuple of (input file path, file content, whether to split the output into sections, content hash)
+    
+    Returns:
+        Tuple of (Markdown text or its staged parts, sections from split_markdown or None, error message or None, phase timings)
+    """
+    input_file_path, data, with_sections, digest = task
+    metrics: Dict[str, Any] = {}
+    if _worker_profiler is not None:
+        _worker_profiler.enable()
+    try:
+        import io
+        ext = os.path.splitext(input_file_path)[1]
+        
+        # Convert file to Markdown, unless the same content was already OCR'd with the same settings
+        start = time.perf_counter()
+        cache_key = None
+        if _worker_ocr_cache is not None and digest and is_ocr_conversion(ext, _worker_settings):
+            cache_key = f"{digest}:{_worker_settings_hash}"
+        text_content = _worker_ocr_cache.get(cache_key) if cache_key else None
+        if text_content is None:
+            text_content = _worker_md.convert_stream(io.BytesIO(data), file_extension=ext).text_content
+            if cache_key:
+                _worker_ocr_cache.put(cache_key, text_content)
+                metrics["ocr_cache"] = "miss"
+        else:
+            metrics["ocr_cache"] = "hit"
+        # Empty spreadsheet cells, table padding and blank runs, in one pass
+        from convert_markdown import postprocess_markdown, split_markdown, split_parts, stage_parts
+        text_content = postprocess_markdown(text_content, _worker_settings)
+        sections = None
+        char_starts: List[int] = []
+        if with_sections or _worker_split_bytes is not None:
+            sections = split_markdown(text_content, ext, char_starts)
+        if _worker_split_bytes is not None and sections and sections[-1]["end"] > _worker_split_bytes:
+            # Large outputs become one file per sheet, slide or range of pages, each
+            # written out as soon as it is sliced so the text is only held once
+            parts = stage_parts(split_parts(text_content, sections, char_starts, _worker_part_bytes), _worker_staging_dir)
+            del text_content, sections
+            metrics["parts"] = len(parts)
+            metrics["convert_s"] = time.perf_counter() - start
+            return parts, None, None, metrics
+        metrics["convert_s"] = time.perf_counter() - start
+        return text_content, sections if with_sections else None, None, metrics
+    except Exception as e:
+        return None, None, str(e), metrics
+    finally:
+        if _worker_profiler is not None:
+            _worker_profiler.disable()
+            # Dumped after every file so workers that are recycled or killed still leave their stats
+            _worker_profiler.dump_stats(_worker_profile_path)
+
+def convert_files(input_path: str, output_folder: str, file_types: List[str], config: Optional[Dict[str, Any]] = None, jobs: Optional[int] = None) -> ConversionResult:
+    """
+    Convert files matching specified types directly from input path.
     
-    metadata_file = os.path.join(doc_base_folder, "metadata.md")
-    metadata_lines = [
-        "# Metadata of Markdown Files", 
-        "", 
-        "| Filename | Path | Last Modified |", 
-        "|----------|------|---------------|"
-    ]
-    metadata_lines = [
-        "# Metadata of Markdown Files", 
-        "", 
-        "| Filename | Path | Last Modified |", 
-        "|----------|------|---------------|"
-    ]
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files
+        file_types: List of file extensions to convert
+        config: Optional configuration dictionary
+        jobs: Number of worker processes (default: CPU count)
     
-    # Process all converted files
-    for file_path in converted_files:
+    Returns:
+        ConversionResult listing the paths to converted files, to pass on to update_metadata_file
+    """
+    # Create output directory if it doesn't exist
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    
+    # Update VS Code settings and .gitignore
+    update_vscode_settings(output_folder)
+    update_gitignore(output_folder)
+    
+    # Add cursor rules
+    add_cursor_rules_from_docs()
+    
+    # Only output paths are kept, results are not held while the tree is converted
+    result = ConversionResult()
+    for _ in iter_convert(input_path, output_folder, file_types, config, jobs, result=result):
+        pass
+    return result
+
+def iter_convert(input_path: str, output_folder: str, file_types: List[str], config: Optional[Dict[str, Any]] = None, jobs: Optional[int] = None, with_markdown: bool = False, max_in_flight: Optional[int] = None, result: Optional[ConversionResult] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Convert files matching specified types and yield a result for each file as soon as it is done.
+    
+    Unchanged files are yielded while the tree is scanned, converted files in
+    the order they finish. At most max_in_flight files are handed to the
+    workers at a time, so a slow consumer holds back the conversion instead
+    of letting results pile up. Closing the generator early stops the run;
+    the manifest keeps every file finished so far.
+    
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files
+        file_types: List of file extensions to convert
+        config: Optional configuration dictionary
+        jobs: Number of worker processes (default: CPU count)
+        with_markdown: Add the converted text to each result as "markdown", and the paths of
+            its part files as "parts" (for split outputs "markdown" only lists the parts)
+        max_in_flight: Maximum files queued on or running in the workers (default: twice the worker count)
+        result: ConversionResult filled with the converted outputs and, once the run is
+            done, what update_metadata_file and update_cursorignore need from it
+    
+    Yields:
+        The file's run record (see make_run_record) plus "source" and "output" paths;
+        status is "skipped", "converted", "duplicate" or "failed"
+    """
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    if not os.path.exists(input_path):
+        print(f"Directory {input_path} does not exist")
+        return
+    
+    # Process files recursively through all subfolders, skipping ignored folders
+    ignore_patterns = config.get("ignore_patterns", []) if config else []
+    archives = None
+    listed_types = file_types
+    from convert_archive import ARCHIVE_EXTENSIONS, ArchiveIndex, get_archive_options, get_archives_path
+    archive_options = get_archive_options(config)
+    if archive_options["enabled"]:
+        # Documents inside zip archives are converted without extracting the archives
+        archives = ArchiveIndex(get_archives_path(output_folder, get_shard_suffix(config)), archive_options)
+        listed_types = list(file_types) + list(ARCHIVE_EXTENSIONS)
+    snapshot = None
+    from convert_snapshot import DirectorySnapshot, get_snapshot_options, get_snapshot_path, make_scan_key
+    if get_snapshot_options(config)["enabled"]:
+        # Folders unchanged since the last run are not listed again
+        snapshot_path = get_snapshot_path(output_folder, get_shard_suffix(config))
+        snapshot = DirectorySnapshot(snapshot_path, make_scan_key(input_path, output_folder, listed_types, ignore_patterns))
+    sources = iter_source_files(input_path, output_folder, file_types, ignore_patterns, snapshot=snapshot, archives=archives)
+    if config and config.get("shard"):
+        shard_index, shard_count = config["shard"]
+        sources = select_shard(input_path, sources, shard_index, shard_count, archives)
+    yield from _iter_convert_sources(input_path, output_folder, sources, config, jobs, True, with_markdown, max_in_flight, snapshot, archives, result)
+
+def convert_changed_files(input_path: str, output_folder: str, file_paths: Iterable[str], config: Optional[Dict[str, Any]] = None, jobs: Optional[int] = None, file_types: Optional[List[str]] = None) -> ConversionResult:
+    """
+    Convert only the given source files, keeping the manifest entries of all other files.
+    
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files
+        file_paths: Paths of source files under input_path that were added or modified
+        config: Optional configuration dictionary
+        jobs: Number of worker processes (default: CPU count)
+        file_types: List of file extensions to convert; zip archives among file_paths are
+            expanded to their matching members when given
+    
+    Returns:
+        ConversionResult listing the paths to converted files
+    """
+    from convert_archive import ArchiveIndex, get_archive_options, get_archives_path, is_archive
+    archives = None
+    archive_options = get_archive_options(config)
+    if file_types is not None and archive_options["enabled"]:
+        archives = ArchiveIndex(get_archives_path(output_folder, get_shard_suffix(config)), archive_options)
+    
+    # Group files by folder, the same shape iter_source_files yields
+    files_by_folder: Dict[str, List[str]] = {}
+    archive_paths: List[str] = []
+    for file_path in file_paths:
+        if archives is not None and is_archive(file_path):
+            archive_paths.append(os.path.abspath(file_path))
+            continue
+        folder, filename = os.path.split(os.path.abspath(file_path))
+        files_by_folder.setdefault(folder, []).append(filename)
+    sources: List[Tuple[str, List[str]]] = list(files_by_folder.items())
+    if archive_paths:
+        is_ignored = compile_ignore_patterns(config.get("ignore_patterns", []) if config else [])
+        for archive_path in archive_paths:
+            relative_path = os.path.relpath(archive_path, input_path).replace(os.sep, "/")
+            sources.extend(archives.expand(archive_path, relative_path, file_types, is_ignored))
+    return _convert_sources(input_path, output_folder, sources, config, jobs, full_scan=False, archives=archives)
+
+def find_removed_members(input_path: str, output_folder: str, archive_paths: Iterable[str], file_types: List[str], config: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Find the converted members of changed zip archives that are no longer in them.
+    
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files
+        archive_paths: Paths of zip archives under input_path that were modified
+        file_types: List of file extensions to convert
+        config: Optional configuration dictionary
+    
+    Returns:
+        Paths of the members to pass to remove_converted_files
+    """
+    from convert_archive import ArchiveIndex, get_archive_options, get_archives_path
+    archives = ArchiveIndex(get_archives_path(output_folder, get_shard_suffix(config)), get_archive_options(config))
+    is_ignored = compile_ignore_patterns(config.get("ignore_patterns", []) if config else [])
+    entries: Dict[str, Any] = load_manifest(output_folder)["files"]
+    removed: List[str] = []
+    for archive_path in archive_paths:
+        relative_path = os.path.relpath(os.path.abspath(archive_path), input_path).replace(os.sep, "/")
+        current = {
+            os.path.relpath(os.path.join(root, filename), input_path).replace(os.sep, "/")
+            for root, names in archives.expand(archive_path, relative_path, file_types, is_ignored)
+            for filename in names
+        }
+        removed.extend(os.path.join(input_path, *key.split("/")) for key in entries if key.startswith(f"{relative_path}/") and key not in current)
+    return removed
+
+def remove_converted_files(input_path: str, output_folder: str, file_paths: Iterable[str]) -> ConversionResult:
+    """
+    Remove the Markdown outputs and manifest entries of deleted source files or folders.
+    
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files
+        file_paths: Paths of deleted source files or folders under input_path
+    
+    Returns:
+        ConversionResult listing the paths to removed Markdown files
+    """
+    manifest = load_manifest(output_folder)
+    entries: Dict[str, Any] = manifest["files"]
+    removed_files = ConversionResult()
+    
+    for file_path in file_paths:
+        manifest_key = os.path.relpath(os.path.abspath(file_path), input_path).replace(os.sep, "/")
+        # A deleted folder takes every manifest entry below it along
+        keys = [key for key in entries if key == manifest_key or key.startswith(f"{manifest_key}/")]
+        for key in keys:
+            del entries[key]
+        removed_files += _remove_outputs(output_folder, keys)
+    
+    if removed_files:
+        save_manifest(output_folder, manifest)
+        from convert_search import sync_search_index_from_manifest
+        sync_search_index_from_manifest(output_folder, manifest, create=False)
+        # Copies of a removed original lose their Duplicate Of in metadata.md
+        removed_files.duplicate_groups = group_duplicate_outputs(output_folder, entries)
+    return removed_files
+
+def _remove_outputs(output_folder: str, keys: Iterable[str]) -> List[str]:
+    """
+    Remove the Markdown outputs of the given sources along with their section indexes and parts.
+    
+    Args:
+        output_folder: Directory for converted Markdown files
+        keys: Manifest keys of the sources
+    
+    Returns:
+        List of paths to removed Markdown files
+    """
+    from convert_markdown import get_section_index_path, remove_output_parts
+    removed_files: List[str] = []
+    for key in keys:
+        output_path = os.path.join(output_folder, *key.split("/")) + ".md"
+        try:
+            os.remove(output_path)
+            removed_files.append(output_path)
+            print(f"Removed {output_path}")
+            if os.path.exists(get_section_index_path(output_path)):
+                os.remove(get_section_index_path(output_path))
+            remove_output_parts(output_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing {output_path}: {e}")
+            continue
+        # Drop output folders left empty
+        output_dir = os.path.dirname(output_path)
+        while os.path.normcase(output_dir) != os.path.normcase(output_folder):
+            try:
+                os.rmdir(output_dir)
+            except OSError:
+                break
+            output_dir = os.path.dirname(output_dir)
+    return removed_files
+
+def _convert_sources(input_path: str, output_folder: str, sources: Iterable[Tuple[str, List[str]]], config: Optional[Dict[str, Any]], jobs: Optional[int], full_scan: bool, archives: Optional[Any] = None) -> ConversionResult:
+    """
+    Convert the given source files, skipping those the manifest shows are unchanged.
+    
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files
+        sources: Iterable of (folder path, names of files to convert in that folder)
+        config: Optional configuration dictionary
+        jobs: Number of worker processes (default: CPU count)
+        full_scan: True if sources cover the whole tree, so manifest entries not seen are dropped
+        archives: ArchiveIndex the members among sources were found with
+    
+    Returns:
+        ConversionResult listing the paths to converted files
+    """
+    result = ConversionResult()
+    for _ in _iter_convert_sources(input_path, output_folder, sources, config, jobs, full_scan, archives=archives, run_result=result):
+        pass
+    return result
+
+def _iter_convert_sources(input_path: str, output_folder: str, sources: Iterable[Tuple[str, List[str]]], config: Optional[Dict[str, Any]], jobs: Optional[int], full_scan: bool, with_markdown: bool = False, max_in_flight: Optional[int] = None, snapshot: Optional[Any] = None, archives: Optional[Any] = None, run_result: Optional[ConversionResult] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Convert the given source files, skipping those the manifest shows are unchanged, and yield each file's result.
+    
+    Scanning, manifest checks, reads, conversion and writes run as overlapping
+    stages of a ConversionPipeline; this generator keeps the manifest and the
+    run report up to date as files come out of it.
+    
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files
+        sources: Iterable of (folder path, names of files to convert in that folder)
+        config: Optional configuration dictionary
+        jobs: Number of worker processes (default: CPU count)
+        full_scan: True if sources cover the whole tree, so manifest entries not seen are dropped
+        with_markdown: Add the converted text to each result
+        max_in_flight: Maximum documents between their read and their write (default: twice the worker count)
+        snapshot: DirectorySnapshot the sources were walked with, saved once the run finishes; files in folders
+            it shows unchanged along with their outputs skip the manifest check
+        archives: ArchiveIndex the sources were walked with; members are read from their archives, their
+            CRCs stand in for size and mtime, and the archive listings are saved once the run finishes
+        run_result: ConversionResult to fill, see iter_convert's result
+    
+    Yields:
+        Result dicts, see iter_convert
+    """
+    from convert_pipeline import ConversionPipeline, get_pipeline_options
+    
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    
+    # Track all folders containing converted files
+    converted_folders: Set[str] = set()
+    
+    # Manifest of previous conversions, keyed by source path relative to input_path
+    shard_suffix = get_shard_suffix(config)
+    manifest_filename = f"manifest{shard_suffix}.json"
+    manifest = load_manifest(output_folder, manifest_filename)
+    previous_entries: Dict[str, Any] = manifest["files"]
+    # Entries of deleted sources are dropped by keeping only what a full scan saw
+    current_entries: Dict[str, Any] = {} if full_scan else dict(previous_entries)
+    settings_hash = hash_settings(config)
+    hits = misses = 0
+    # Contents that failed to convert, by content hash, skipped until the file or the settings change
+    previous_failures: Dict[str, Any] = manifest.get("failures", {})
+    current_failures: Dict[str, Any] = {} if full_scan else dict(previous_failures)
+    retry_failed = bool(config and config.get("retry_failed"))
+    failures_by_path = {entry["path"]: digest for digest, entry in previous_failures.items() if entry.get("settings") == settings_hash}
+    section_index = config.get("section_index", True) if config else True
+    rebuild_sections = False
+    if section_index:
+        from convert_markdown import SECTIONS_VERSION, get_section_index_path, get_parts_dir, write_section_index
+        # Indexes from an older way of splitting are rebuilt once from the existing outputs
+        rebuild_sections = manifest.get("sections_version") != SECTIONS_VERSION
+    
+    # Files that failed to convert, with the reason
+    failures: List[Tuple[str, str]] = []
+    # Their manifest keys, so their earlier outputs are not taken for those of deleted sources
+    failed_keys: Set[str] = set()
+    # Outputs rewritten in this run
+    written_files: Set[str] = set()
+    # Outputs materialized from another output with the same content
+    duplicate_outputs: Dict[str, str] = {}
+    
+    def check_source(input_file_path: str, output_path: str, manifest_key: str) -> Tuple[os.stat_result, bool, Optional[str]]:
+        # Runs on the pipeline's I/O threads and only reads shared state
+        stat = archives.stat(input_file_path) if archives is not None else os.stat(input_file_path)
+        crc = archives.crc(input_file_path) if archives is not None else None
+        entry = previous_entries.get(manifest_key)
+        output_exists = os.path.exists(output_path)
+        
+        if crc is not None:
+            # Members inside archives are compared by the CRC in the archive's listing, never read
+            is_current = bool(output_exists and entry and entry.get("settings") == settings_hash and entry.get("crc") == crc and entry.get("size") == stat.st_size)
+            digest = entry.get("hash") if is_current else None
+        elif entry is None and output_exists and stat.st_mtime <= os.path.getmtime(output_path):
+            # Adopt outputs converted before the manifest existed
+            is_current, digest = True, hash_file(input_file_path)
+        elif output_exists:
+            is_current, digest = check_manifest_entry(entry, input_file_path, stat, settings_hash)
+        else:
+            is_current, digest = False, None
+        
+        # Skip if file is already converted and its content and settings are unchanged
+        is_current = bool(is_current and digest)
+        if not is_current and digest is None and manifest_key in failures_by_path:
+            # A file that failed before is only hashed again once its size or mtime changes
+            failure = previous_failures[failures_by_path[manifest_key]]
+            if failure.get("size") == stat.st_size and failure.get("mtime_ns") == stat.st_mtime_ns and failure.get("crc") == crc:
+                digest = failures_by_path[manifest_key]
+        if is_current and section_index and rebuild_sections and os.path.isdir(get_parts_dir(output_path)):
+            # A split output's index is built from the whole document, so it is converted again
+            is_current = False
+        elif is_current and section_index and (rebuild_sections or not os.path.exists(get_section_index_path(output_path))) and not os.path.isdir(get_parts_dir(output_path)):
+            # Outputs converted before section indexes existed get one without reconverting
+            try:
+                with open(output_path, "r", encoding="utf-8") as f:
+                    write_section_index(output_path, f.read(), os.path.splitext(input_file_path)[1])
+            except (OSError, ValueError) as e:
+                # An unreadable output is simply converted again
+                print(f"Error indexing {output_path}, converting it again: {e}")
+                is_current = False
+        return stat, is_current, digest
+    
+    # Files stopped by the worker limits are tried again once the limits change
+    worker_limits = {key: value for key, value in get_worker_options(config).items() if key in ("timeout", "max_memory_mb")}
+    
+    def known_failure(digest: str) -> Optional[str]:
+        failure = previous_failures.get(digest)
+        if not failure or failure.get("settings") != settings_hash:
+            return None
+        if "limits" in failure and failure["limits"] != worker_limits:
+            return None
+        return failure["error"]
+    
+    trust_directory_mtime = False
+    if snapshot is not None:
+        from convert_snapshot import get_snapshot_options, STAT_HINT_FILES
+        trust_directory_mtime = get_snapshot_options(config)["trust_directory_mtime"]
+    
+    def quick_check(root: str, names: List[str]) -> Dict[str, Tuple[Optional[os.stat_result], str]]:
+        # Runs on the pipeline's I/O threads: a folder and its output folder unchanged since the
+        # last run means no file was added, removed or replaced and every output still exists
+        relative_root = os.path.relpath(root, input_path).replace(os.sep, "/")
+        if not snapshot.outputs_unchanged(relative_root, output_folder):
+            return {}
+        prefix = "" if relative_root == "." else f"{relative_root}/"
+        current: Dict[str, Tuple[Optional[os.stat_result], str]] = {}
+        for filename in names:
+            entry = previous_entries.get(prefix + filename)
+            if not entry or entry.get("settings") != settings_hash or not entry.get("hash"):
+                continue
+            if trust_directory_mtime:
+                current[filename] = (None, entry["hash"])
+                continue
+            # Files edited in place don't change their folder's mtime, so they are still stat'ed
+            try:
+                stat = os.stat(os.path.join(root, filename))
+            except OSError:
+                continue
+            if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+                current[filename] = (stat, entry["hash"])
+        return current
+    
+    # Worker processes are only started once a file actually needs converting
+    pool = None
+    profile_dir = get_state_path(output_folder, "profile") if config and config.get("profile") else None
+    # Parts of split outputs written by the workers, moved into place by the write stage
+    staging_dir = get_state_path(output_folder, f"staging{shard_suffix}")
+    
+    def submit(task: Tuple[str, bytes, bool, str]) -> Any:
+        nonlocal pool
+        if pool is None:
+            from convert_workers import WorkerPool
+            if profile_dir:
+                # Per-worker cProfile dumps, merged into one file after the run
+                import shutil
+                shutil.rmtree(profile_dir, ignore_errors=True)
+                os.makedirs(profile_dir)
+            # Each worker builds its own MarkItDown once; a worker that hangs, grows
+            # too large or crashes only fails its own file and is replaced
+            pool = WorkerPool(jobs, initializer=_init_worker, initargs=(config, profile_dir, staging_dir), **get_worker_options(config))
+        return pool.submit(_convert_data, task)
+    
+    def get_folder(input_file_path: str) -> str:
+        # Folder on disk of a source, the archive's folder for a member
+        return os.path.dirname(archives.get_archive_path(input_file_path) if archives is not None else input_file_path)
+    
+    # Longest predicted conversion first within a memory budget, from the timings of previous runs
+    from convert_schedule import CostModel, estimate_memory_mb, get_costs_path, get_schedule_options
+    schedule_options = get_schedule_options(config)
+    cost_model = CostModel(get_costs_path(output_folder, shard_suffix)) if schedule_options["enabled"] else None
+    
+    def schedule(item: Dict[str, Any]) -> Tuple[float, float]:
+        ext, size = item["record"]["ext"], item["stat"].st_size
+        return cost_model.predict(ext, size), estimate_memory_mb(ext, size, schedule_options["memory_factor"])
+    
+    pipeline = ConversionPipeline(
+        input_path,
+        output_folder,
+        sources,
+        check_source,
+        submit,
+        options=get_pipeline_options(config),
+        max_in_flight=max_in_flight or 2 * jobs,
+        # Convert each distinct content once; other copies reuse its output
+        dedupe=not config or config.get("dedupe", True),
+        section_index=section_index,
+        quick_check=quick_check if snapshot is not None and not rebuild_sections else None,
+        schedule=schedule if cost_model is not None else None,
+        memory_budget_mb=schedule_options["memory_budget_mb"],
+        schedule_window=schedule_options["window"],
+        # --retry-failed converts known failures again
+        known_failure=None if retry_failed else known_failure,
+        read=archives.read if archives is not None else None
+    )
+    
+    # The manifest is saved however the run ends, including when the caller stops iterating
+    finished = False
+    quick_hits = 0
+    # Files skipped because they failed in an earlier run, with the reason
+    known_failures: List[Tuple[str, str]] = []
+    # Per-file telemetry, written to the run report as results arrive
+    report = RunReport(get_state_path(output_folder, f"report{shard_suffix}.jsonl"))
+    try:
+        for item in pipeline.results():
+            input_file_path, output_path, manifest_key = item["source"], item["output"], item["key"]
+            record = item["record"]
+            status = record["status"]
+            if item["quick"]:
+                # Known unchanged from the snapshot: the manifest entry is kept as is and the
+                # file is left out of the report, so no-op runs cost next to nothing per file
+                hits += 1
+                quick_hits += 1
+                current_entries[manifest_key] = previous_entries[manifest_key]
+                converted_folders.add(get_folder(input_file_path))
+                if run_result is not None:
+                    run_result.append(output_path)
+                yield dict(record, source=input_file_path, output=output_path)
+                continue
+            report.add(record)
+            if record["cache"] == "miss" and item["stat"] is not None:
+                misses += 1
+            if status == "failed":
+                failed_keys.add(manifest_key)
+            
+            if status == "failed" and record["cache"] == "failed":
+                print(f"Skipping {input_file_path}, failed in an earlier run: {record['error']}")
+                known_failures.append((input_file_path, record["error"]))
+                failure = previous_failures[item["digest"]]
+                if failure["path"] == manifest_key and item["stat"] is not None:
+                    # Touched but unchanged: its new mtime saves hashing it again next run
+                    failure = dict(failure, size=item["stat"].st_size, mtime_ns=item["stat"].st_mtime_ns)
+                current_failures[item["digest"]] = failure
+            elif status == "failed":
+                print(f"Error converting {input_file_path}: {record['error']}")
+                failures.append((input_file_path, record["error"]))
+                if item.get("convert_failed") and item["digest"]:
+                    # Read and write errors may be transient, only the converter's own failures are kept
+                    crc = archives.crc(input_file_path) if archives is not None else None
+                    failure = make_failure_entry(item["stat"], manifest_key, record["error"], settings_hash, crc)
+                    if item.get("limit_exceeded"):
+                        failure["limits"] = worker_limits
+                    current_failures[item["digest"]] = failure
+            else:
+                if status == "skipped":
+                    print(f"Skipping {input_file_path}, already converted")
+                    hits += 1
+                elif status == "converted":
+                    print(f"Converted {input_file_path} to {output_path}")
+                    written_files.add(output_path)
+                    current_failures.pop(item["digest"], None)
+                    # OCR cache hits took no conversion time and would skew the estimates
+                    if cost_model is not None and record["convert_s"] is not None and record["ocr_cache"] != "hit":
+                        cost_model.observe(record["ext"], record["input_bytes"] or 0, record["convert_s"])
+                else:
+                    print(f"Linked {input_file_path} to {output_path} ({record['link']} of {item['source_output']})")
+                    written_files.add(output_path)
+                    duplicate_outputs[output_path] = item["source_output"]
+                crc = archives.crc(input_file_path) if archives is not None else None
+                current_entries[manifest_key] = make_manifest_entry(item["stat"], item["digest"], settings_hash, crc)
+                # Add folder to the set of converted folders
+                converted_folders.add(get_folder(input_file_path))
+            
+            if run_result is not None and status in CONVERTED_STATUSES:
+                run_result.append(output_path)
+            result = dict(record, source=input_file_path, output=output_path)
+            if with_markdown and status in CONVERTED_STATUSES:
+                # Read back from disk so results waiting to be consumed never hold their text
+                try:
+                    with open(output_path, "r", encoding="utf-8") as f:
+                        result["markdown"] = f.read()
+                    # A split output's own file only lists its parts
+                    from convert_markdown import list_output_parts
+                    result["parts"] = list_output_parts(output_path)
+                except OSError as e:
+                    result.update(markdown=None, error=str(e))
+            yield result
+        finished = True
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel=not finished)
+            # Parts of documents that were never written, after a failure or an early stop
+            import shutil
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        # Entries of files not reached before an early stop are kept for the next run
+        if not finished:
+            current_entries = dict(previous_entries, **current_entries)
+            current_failures = dict(previous_failures, **current_failures)
+        sections_rebuilt = rebuild_sections and finished
+        if current_entries != previous_entries or current_failures != previous_failures or sections_rebuilt:
+            manifest["files"] = current_entries
+            manifest["failures"] = current_failures
+            if sections_rebuilt:
+                manifest["sections_version"] = SECTIONS_VERSION
+            save_manifest(output_folder, manifest, manifest_filename)
+        if snapshot is not None and finished:
+            snapshot.save(output_folder)
+        if archives is not None:
+            archives.close()
+            archives.save(complete=full_scan and finished)
+        # An early stop keeps the records of the files reached so far
+        report_path = report.close()
+    
+    if full_scan and not shard_suffix:
+        # Sources the whole tree no longer has lose their outputs. Shards sharing an output folder
+        # can see a file move to another shard, so theirs are left to an unsharded run.
+        deleted_keys = previous_entries.keys() - current_entries.keys() - failed_keys
+        removed_files = _remove_outputs(output_folder, sorted(deleted_keys))
+        if removed_files:
+            print(f"Removed the outputs of {len(removed_files)} deleted files")
+    if quick_hits:
+        print(f"Skipping {quick_hits} files in unchanged folders, already converted")
+        if not trust_directory_mtime and quick_hits >= STAT_HINT_FILES:
+            # Stat'ing every file is most of what a no-op run on a large tree costs
+            print("  Each of them was still stat'ed; set snapshot.trust_directory_mtime if files are only replaced, never edited in place")
+    if failures:
+        # Each failed file is tried once per run and reported, never retried in a loop
+        print(f"Failed to convert {len(failures)} files:")
+        for input_file_path, error in failures:
+            print(f"  {input_file_path}: {error}")
+    if known_failures:
+        print(f"Skipped {len(known_failures)} files that failed in an earlier run (use --retry-failed to convert them again):")
+        for input_file_path, error in known_failures:
+            print(f"  {input_file_path}: {error}")
+    print(f"Manifest: {hits} hits, {misses} misses")
+    
+    # Re-index only documents whose output changed since the last run; shards are indexed by cvmd merge
+    if (not config or config.get("search_index", True)) and not shard_suffix:
+        from convert_search import sync_search_index_from_manifest
+        sync_search_index_from_manifest(output_folder, manifest)
+    
+    if cost_model is not None:
+        cost_model.save()
+    summary = report.summarize()
+    summary["files"] += quick_hits
+    summary["hits"] += quick_hits
+    print_run_summary(summary, report_path)
+    if profile_dir and pool is not None:
+        merge_profiles(profile_dir, get_state_path(output_folder, PROFILE_FILENAME))
+    
+    if run_result is not None:
+        run_result.converted_folders = converted_folders
+        # Rewritten outputs, so update_metadata_file only re-stats those
+        run_result.changed_files = written_files
+        run_result.duplicates = duplicate_outputs
+        if current_entries != previous_entries:
+            # Copies whose original was reconverted with other content are only found from the manifest
+            run_result.duplicate_groups = group_duplicate_outputs(output_folder, current_entries)
+        # A metadata index saved after the manifest already lists every output of this run
+        run_result.manifest_path = get_state_path(output_folder, manifest_filename)
+
+# ----- Metadata Management -----
+
+METADATA_NAME = "metadata"
+METADATA_INDEX_VERSION = 3
+METADATA_HEADER = [
+    "# Metadata of Markdown Files", 
+    "", 
+    "| Filename | Path | Last Modified | Duplicate Of | Part Of |", 
+    "|----------|------|---------------|--------------|---------|"
+]
+
+def load_metadata_index(doc_base_folder: str, name: str = METADATA_NAME) -> Dict[str, Any]:
+    """
+    Load the metadata index that metadata.md is rendered from.
+    
+    Args:
+        doc_base_folder: Folder holding metadata.md
+        name: Base name of the metadata files, shards each keep their own
+    
+    Returns:
+        Index dict with "rows" keyed by Markdown path relative to the project folder
+        and "rendered" telling whether metadata.md matches the rows
+    """
+    index_path = get_state_path(doc_base_folder, f"{name}.json")
+    if os.path.exists(index_path):
         try:
-            filename = os.path.basename(file_path)
-            last_modified = datetime.fromtimestamp(os.path.getmtime(file_path)).strftime("%Y-%m-%d %H:%M")
-            relative_path = os.path.relpath(file_path, project_folder)
-            metadata_lines.append(f"| {filename} | {relative_path} | {last_modified} |")
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") == METADATA_INDEX_VERSION and isinstance(index.get("rows"), dict):
+                return index
+            print(f"Metadata index {index_path} has an unknown format, rebuilding it")
         except Exception as e:
-            print(f"Error indexing {file_path}: {e}")
+            print(f"Error loading metadata index {index_path}: {e}")
+    return {"version": METADATA_INDEX_VERSION, "rendered": False, "rows": {}}
+
+def save_metadata_index(doc_base_folder: str, index: Dict[str, Any], name: str = METADATA_NAME) -> None:
+    """
+    Save the metadata index atomically.
+    
+    Args:
+        doc_base_folder: Folder holding metadata.md
+        index: Index dict from load_metadata_index
+        name: Base name of the metadata files
+    """
+    index_path = get_state_path(doc_base_folder, f"{name}.json")
+    try:
+        write_file_atomic(index_path, json.dumps(index, ensure_ascii=False))
+    except Exception as e:
+        print(f"Error saving metadata index {index_path}: {e}")
+
+def make_metadata_row(file_path: str, project_folder: str, duplicate_of: Optional[str] = None, part_of: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the metadata row of a converted file.
+    
+    Args:
+        file_path: Path to the converted Markdown file
+        project_folder: Root folder of the project
+        duplicate_of: Path to the converted file this one is a copy of, if any
+        part_of: Path to the split output this file is a part of, if any
+    
+    Returns:
+        Tuple of (path relative to the project folder, row dict)
+    """
+    mtime = os.path.getmtime(file_path)
+    relative_path = os.path.relpath(file_path, project_folder)
+    return relative_path, {
+        "filename": os.path.basename(file_path),
+        "path": relative_path,
+        "last_modified": datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M"),
+        "mtime": mtime,
+        "duplicate_of": os.path.relpath(duplicate_of, project_folder) if duplicate_of else None,
+        "part_of": os.path.relpath(part_of, project_folder) if part_of else None
+    }
+
+def make_metadata_rows(file_path: str, project_folder: str, duplicate_of: Optional[str] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Build the metadata rows of a converted file and, if it was split, of each of its parts.
+    
+    Args:
+        file_path: Path to the converted Markdown file
+        project_folder: Root folder of the project
+        duplicate_of: Path to the converted file this one is a copy of, if any
+    
+    Returns:
+        List of (path relative to the project folder, row dict), the file's own row first;
+        it lists the relative paths of the part rows under "parts"
+    """
+    from convert_markdown import list_output_parts
+    
+    rows = [make_metadata_row(file_path, project_folder, duplicate_of)]
+    rows.extend(make_metadata_row(part_path, project_folder, part_of=file_path) for part_path in list_output_parts(file_path))
+    rows[0][1]["parts"] = [relative_path for relative_path, _ in rows[1:]]
+    return rows
+
+def relink_duplicate_rows(rows: Dict[str, Dict[str, Any]], duplicate_groups: List[List[str]], project_folder: str) -> None:
+    """
+    Fix the Duplicate Of column of rows whose original no longer has the same content.
+    
+    A row keeps its duplicate_of while both outputs are in the same group. A copy
+    whose original was reconverted with other content or removed points at another
+    output of its group instead, or at nothing if it is the only one left.
+    
+    Args:
+        rows: Index rows keyed by relative path, updated in place
+        duplicate_groups: Output paths sharing a content hash, see group_duplicate_outputs
+        project_folder: Root folder of the project
+    """
+    group_of: Dict[str, int] = {}
+    for group, output_paths in enumerate(duplicate_groups):
+        for output_path in output_paths:
+            group_of[os.path.relpath(output_path, project_folder)] = group
+    # The first output of each group that is nobody's copy stays its original
+    originals: Dict[int, str] = {}
+    for relative_path, group in group_of.items():
+        row = rows.get(relative_path)
+        if row is not None and not row.get("duplicate_of"):
+            originals.setdefault(group, relative_path)
+    
+    for relative_path, row in list(rows.items()):
+        duplicate_of = row.get("duplicate_of")
+        if not duplicate_of:
+            continue
+        group = group_of.get(relative_path)
+        if group is not None and group_of.get(duplicate_of) == group and duplicate_of in rows:
+            continue
+        original = originals.setdefault(group, relative_path) if group is not None else None
+        # Rows may be shared with the previous index, so they are replaced rather than changed
+        rows[relative_path] = dict(row, duplicate_of=original if original != relative_path else None)
+
+def render_metadata(rows: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Render the metadata.md table from index rows.
+    
+    Args:
+        rows: Index rows keyed by relative path
     
+    Returns:
+        Markdown content of metadata.md
+    """
+    lines = list(METADATA_HEADER)
+    for row in rows.values():
+        lines.append(f"| {row['filename']} | {row['path']} | {row['last_modified']} | {row.get('duplicate_of') or ''} | {row.get('part_of') or ''} |")
+    return "\n".join(lines)
+
+def write_metadata(doc_base_folder: str, index: Dict[str, Any], name: str = METADATA_NAME) -> bool:
+    """
+    Render metadata.md from the index if it is out of date, then save the index.
+    
+    Args:
+        doc_base_folder: Folder holding metadata.md
+        index: Index dict whose "rendered" flag is False when rows changed
+        name: Base name of the metadata files
+    
+    Returns:
+        True if metadata.md was written or already up to date
+    """
+    metadata_file = os.path.join(doc_base_folder, f"{name}.md")
+    if index["rendered"] and os.path.exists(metadata_file):
+        print(f"Metadata file is up to date: {metadata_file}")
+        return True
     try:
-        with open(metadata_file, "w", encoding="utf-8") as f:
-            f.write("\n".join(metadata_lines))
+        write_file_atomic(metadata_file, render_metadata(index["rows"]))
         print(f"Metadata file updated: {metadata_file}")
     except Exception as e:
-        print(f"Error writing metadata.md: {e}")
-        sys.exit(1) 
+        print(f"Error writing {name}.md: {e}")
+        return False
+    index["rendered"] = True
+    save_metadata_index(doc_base_folder, index, name)
+    return True
+
+def query_metadata(project_folder: str, path_pattern: Optional[str] = None, modified_since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Look up converted documents in the metadata index.
+    
+    Args:
+        project_folder: Root folder of the project
+        path_pattern: Optional glob matched against the relative Markdown path (e.g. "doc_base/specs/*.pdf.md")
+        modified_since: Optional datetime, only rows modified at or after it are returned
+    
+    Returns:
+        List of row dicts with filename, path, last_modified, mtime, duplicate_of and part_of
+    """
+    import fnmatch
+    
+    rows = load_metadata_index(os.path.join(project_folder, "doc_base"))["rows"].values()
+    if path_pattern:
+        rows = [row for row in rows if fnmatch.fnmatch(row["path"].replace(os.sep, "/"), path_pattern)]
+    if modified_since:
+        rows = [row for row in rows if row["mtime"] >= modified_since.timestamp()]
+    return list(rows)
+
+def update_metadata_file(project_folder: str, converted_files: List[str], name: str = METADATA_NAME) -> None:
+    """
+    Create or update metadata.md to store metadata of Markdown files in doc_base folder.
+    
+    Rows are kept in an index at doc_base/.cvmd/metadata.json. Only files the
+    last conversion rewrote (or that have no row yet) are stat-ed, rows of
+    files missing from converted_files are dropped, and metadata.md is only
+    rewritten when a row changed.
+    
+    Args:
+        project_folder: Root folder of the project
+        converted_files: List of paths to all current converted files; when it is the
+            ConversionResult of the run, only the outputs that run rewrote are re-stat-ed
+        name: Base name of the metadata files (e.g. "metadata.shard-1-of-4" for a shard)
+    """
+    if not converted_files:
+        print("No files were converted, skipping metadata update")
+        return
+    
+    # Ensure doc_base directory exists
+    doc_base_folder = os.path.join(project_folder, "doc_base")
+    if not os.path.exists(doc_base_folder):
+        os.makedirs(doc_base_folder)
+    
+    # A plain list of paths says nothing about the run, so every file is checked
+    run = converted_files if isinstance(converted_files, ConversionResult) else ConversionResult()
+    changed_files = run.changed_files
+    duplicates = run.duplicates
+    duplicate_groups = run.duplicate_groups
+    manifest_path = run.manifest_path
+    
+    # Nothing rewritten and the manifest unchanged since the index was saved: no file was
+    # added or removed, so the index isn't even loaded
+    index_path = get_state_path(doc_base_folder, f"{name}.json")
+    metadata_file = os.path.join(doc_base_folder, f"{name}.md")
+    if changed_files is not None and not changed_files and manifest_path and os.path.exists(metadata_file):
+        try:
+            if os.stat(index_path).st_mtime_ns > os.stat(manifest_path).st_mtime_ns:
+                print(f"Metadata file is up to date: {metadata_file}")
+                return
+        except OSError:
+            pass
+    
+    index = load_metadata_index(doc_base_folder, name)
+    previous_rows: Dict[str, Dict[str, Any]] = index["rows"]
+    rows: Dict[str, Dict[str, Any]] = {}
+    
+    # Process all converted files
+    for file_path in converted_files:
+        relative_path = os.path.relpath(file_path, project_folder)
+        row = previous_rows.get(relative_path)
+        if row is None or changed_files is None or file_path in changed_files:
+            try:
+                rows.update(make_metadata_rows(file_path, project_folder, duplicates.get(file_path)))
+            except Exception as e:
+                print(f"Error indexing {file_path}: {e}")
+            continue
+        rows[relative_path] = row
+        # Parts of unchanged split outputs are unchanged too
+        for part_path in row.get("parts", []):
+            if part_path in previous_rows:
+                rows[part_path] = previous_rows[part_path]
+    if duplicate_groups is not None:
+        relink_duplicate_rows(rows, duplicate_groups, project_folder)
+    
+    if rows != previous_rows:
+        index["rows"] = rows
+        index["rendered"] = False
+    if not write_metadata(doc_base_folder, index, name):
+        sys.exit(1)
+    if rows == previous_rows and os.path.exists(index_path):
+        # Marks the index as checked against the current manifest, so the next no-op run returns early
+        os.utime(index_path)
+
+def update_metadata_entries(project_folder: str, added_files: List[str], removed_files: List[str]) -> None:
+    """
+    Update only the given rows of the metadata index and re-render metadata.md.
+    
+    Args:
+        project_folder: Root folder of the project
+        added_files: Paths to converted files that were added or modified, as the
+            ConversionResult of convert_changed_files to link duplicates
+        removed_files: Paths to converted files that were removed, as the
+            ConversionResult of remove_converted_files to unlink copies of them
+    """
+    if not added_files and not removed_files:
+        return
+    
+    doc_base_folder = os.path.join(project_folder, "doc_base")
+    index = load_metadata_index(doc_base_folder)
+    rows: Dict[str, Dict[str, Any]] = index["rows"]
+    
+    def drop_rows(relative_path: str) -> None:
+        # The rows of a file's parts go with it
+        row = rows.pop(relative_path, None)
+        if row is not None:
+            for part_path in row.get("parts", []):
+                rows.pop(part_path, None)
+            index["rendered"] = False
+    
+    for file_path in removed_files:
+        drop_rows(os.path.relpath(file_path, project_folder))
+    
+    duplicates = added_files.duplicates if isinstance(added_files, ConversionResult) else {}
+    # The conversion ran after the removal, so its groups already leave removed outputs out
+    duplicate_groups = None
+    for run in (added_files, removed_files):
+        if isinstance(run, ConversionResult) and run.duplicate_groups is not None:
+            duplicate_groups = run.duplicate_groups
+            break
+    for file_path in added_files:
+        try:
+            file_rows = make_metadata_rows(file_path, project_folder, duplicates.get(file_path))
+        except Exception as e:
+            print(f"Error indexing {file_path}: {e}")
+            continue
+        relative_path = file_rows[0][0]
+        if all(rows.get(path) == row for path, row in file_rows):
+            continue
+        drop_rows(relative_path)
+        rows.update(file_rows)
+        index["rendered"] = False
+    if duplicate_groups is not None:
+        previous_rows = dict(rows)
+        relink_duplicate_rows(rows, duplicate_groups, project_folder)
+        if rows != previous_rows:
+            index["rendered"] = False
+    
+    write_metadata(doc_base_folder, index)
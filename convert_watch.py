@@ -0,0 +1,281 @@
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from convert_archive import ARCHIVE_EXTENSIONS, get_archive_options, is_archive
+from convert_utils import (
+    ConversionResult,
+    compile_ignore_patterns,
+    iter_source_files,
+    convert_files,
+    convert_changed_files,
+    find_removed_members,
+    remove_converted_files,
+    update_cursorignore,
+    update_metadata_file,
+    update_metadata_entries
+)
+
+# Event kinds put on the watch queue
+CHANGED = "changed"
+DELETED = "deleted"
+
+# ----- Event Sources -----
+
+def start_native_watcher(input_path: str, events: "queue.Queue[Tuple[str, str]]") -> Optional[Any]:
+    """
+    Start a watchdog observer (inotify on Linux) that feeds file events into a queue.
+    
+    Args:
+        input_path: Directory to watch recursively
+        events: Queue receiving (kind, path) tuples
+    
+    Returns:
+        The running observer, or None if watchdog is not installed
+    """
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+    
+    def queue_tree(path: str) -> None:
+        # Files copied in together with a new folder may not get their own events
+        for root, _, files in os.walk(path):
+            for filename in files:
+                events.put((CHANGED, os.path.join(root, filename)))
+    
+    class QueueHandler(FileSystemEventHandler):
+        def on_created(self, event: Any) -> None:
+            if event.is_directory:
+                queue_tree(event.src_path)
+            else:
+                events.put((CHANGED, event.src_path))
+        
+        def on_modified(self, event: Any) -> None:
+            if not event.is_directory:
+                events.put((CHANGED, event.src_path))
+        
+        def on_deleted(self, event: Any) -> None:
+            events.put((DELETED, event.src_path))
+        
+        def on_moved(self, event: Any) -> None:
+            events.put((DELETED, event.src_path))
+            if event.is_directory:
+                queue_tree(event.dest_path)
+            else:
+                events.put((CHANGED, event.dest_path))
+    
+    observer = Observer()
+    observer.schedule(QueueHandler(), input_path, recursive=True)
+    observer.daemon = True
+    observer.start()
+    return observer
+
+def snapshot_tree(input_path: str, output_folder: str, file_types: List[str], ignore_patterns: Optional[List[str]]) -> Dict[str, Tuple[int, int]]:
+    """
+    Record size and mtime of every file that would be converted.
+    
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files, always skipped
+        file_types: List of file extensions to convert
+        ignore_patterns: Optional gitignore-style patterns of files and folders to skip
+    
+    Returns:
+        Dict mapping file path to (size, mtime_ns)
+    """
+    snapshot: Dict[str, Tuple[int, int]] = {}
+    for root, files in iter_source_files(input_path, output_folder, file_types, ignore_patterns):
+        for filename in files:
+            file_path = os.path.join(root, filename)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            snapshot[file_path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+def start_polling_watcher(input_path: str, output_folder: str, file_types: List[str], ignore_patterns: Optional[List[str]], interval: float, events: "queue.Queue[Tuple[str, str]]") -> threading.Event:
+    """
+    Poll the input tree in a background thread and feed differences into a queue.
+    
+    Only files matching file_types are stat-ed and ignored folders are pruned,
+    so each poll costs one stat per candidate document.
+    
+    Args:
+        input_path: Directory to watch recursively
+        output_folder: Directory for converted Markdown files, always skipped
+        file_types: List of file extensions to convert
+        ignore_patterns: Optional gitignore-style patterns of files and folders to skip
+        interval: Seconds between polls
+        events: Queue receiving (kind, path) tuples
+    
+    Returns:
+        Event that stops the polling thread when set
+    """
+    stop = threading.Event()
+    
+    def poll() -> None:
+        previous = snapshot_tree(input_path, output_folder, file_types, ignore_patterns)
+        while not stop.wait(interval):
+            current = snapshot_tree(input_path, output_folder, file_types, ignore_patterns)
+            for file_path, signature in current.items():
+                if previous.get(file_path) != signature:
+                    events.put((CHANGED, file_path))
+            for file_path in previous.keys() - current.keys():
+                events.put((DELETED, file_path))
+            previous = current
+    
+    threading.Thread(target=poll, name="cvmd-poller", daemon=True).start()
+    return stop
+
+# ----- Watch Loop -----
+
+def collect_events(events: "queue.Queue[Tuple[str, str]]", debounce: float) -> Dict[str, str]:
+    """
+    Wait for events and coalesce them until the tree has been quiet for the debounce period.
+    
+    Args:
+        events: Queue of (kind, path) tuples
+        debounce: Seconds without new events before the batch is returned
+    
+    Returns:
+        Dict mapping path to the last event kind seen for it
+    """
+    kind, path = events.get()
+    batch = {path: kind}
+    while True:
+        try:
+            kind, path = events.get(timeout=debounce)
+        except queue.Empty:
+            return batch
+        batch[path] = kind
+
+def make_path_filter(input_path: str, output_folder: str, ignore_patterns: Optional[List[str]]) -> Callable[[str], bool]:
+    """
+    Build a filter rejecting paths outside the input folder, inside the output folder or ignored.
+    
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files
+        ignore_patterns: Optional gitignore-style patterns of files and folders to skip
+    
+    Returns:
+        Function returning True if events for the path should be handled
+    """
+    is_ignored = compile_ignore_patterns(ignore_patterns)
+    output_prefix = os.path.normcase(os.path.abspath(output_folder)) + os.sep
+    
+    def is_relevant(path: str) -> bool:
+        path = os.path.abspath(path)
+        if (os.path.normcase(path) + os.sep).startswith(output_prefix):
+            return False
+        relative_path = os.path.relpath(path, input_path).replace(os.sep, "/")
+        if relative_path.startswith("../") or relative_path in (".", ".."):
+            return False
+        parts = relative_path.split("/")
+        # Any ignored parent folder hides the whole subtree, as in the walk
+        for i in range(1, len(parts)):
+            if is_ignored("/".join(parts[:i]), True):
+                return False
+        return not is_ignored(relative_path, os.path.isdir(path))
+    
+    return is_relevant
+
+def apply_changes(input_path: str, output_folder: str, project_folder: str, file_types: List[str], config: Optional[Dict[str, Any]], jobs: Optional[int], batch: Dict[str, str]) -> None:
+    """
+    Reconvert added or modified documents and remove outputs of deleted ones.
+    
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files
+        project_folder: Root folder of the project
+        file_types: List of file extensions to convert
+        config: Optional configuration dictionary
+        jobs: Number of worker processes (default: CPU count)
+        batch: Dict mapping path to its coalesced event kind
+    """
+    archives_enabled = get_archive_options(config)["enabled"]
+    changed: List[str] = []
+    deleted: List[str] = []
+    for path, kind in batch.items():
+        if kind == CHANGED and os.path.isfile(path):
+            if os.path.splitext(path)[1].lower() in file_types or (archives_enabled and is_archive(path)):
+                changed.append(path)
+        elif not os.path.exists(path):
+            deleted.append(path)
+    
+    removed_files = remove_converted_files(input_path, output_folder, deleted) if deleted else ConversionResult()
+    converted_files = convert_changed_files(input_path, output_folder, changed, config, jobs, file_types) if changed else ConversionResult()
+    changed_archives = [path for path in changed if archives_enabled and is_archive(path)]
+    if changed_archives:
+        # Members taken out of a changed archive lose their outputs like deleted files
+        removed_members = find_removed_members(input_path, output_folder, changed_archives, file_types, config)
+        if removed_members:
+            removed_outputs = remove_converted_files(input_path, output_folder, removed_members)
+            if removed_outputs.duplicate_groups is not None:
+                # Found after the conversion, so these are the current groups
+                converted_files.duplicate_groups = removed_outputs.duplicate_groups
+            removed_files += removed_outputs
+    
+    update_metadata_entries(project_folder, converted_files, removed_files)
+    if converted_files:
+        # Appends only folders that are not in .cursorignore yet
+        update_cursorignore(project_folder, config.get("ignore_patterns", []) if config else [], file_types, converted_files)
+
+def watch(input_path: str, output_folder: str, file_types: List[str], config: Optional[Dict[str, Any]] = None, project_folder: Optional[str] = None, jobs: Optional[int] = None, debounce: float = 1.0, poll_interval: float = 2.0) -> None:
+    """
+    Convert the input folder once, then keep the output folder in sync until interrupted.
+    
+    Uses native file system events (inotify on Linux) when watchdog is
+    installed and falls back to polling otherwise.
+    
+    Args:
+        input_path: Directory containing files to convert
+        output_folder: Directory for converted Markdown files
+        file_types: List of file extensions to convert
+        config: Optional configuration dictionary
+        project_folder: Root folder of the project (default: current directory)
+        jobs: Number of worker processes (default: CPU count)
+        debounce: Seconds without new events before a batch is converted
+        poll_interval: Seconds between polls when native events are unavailable
+    """
+    project_folder = project_folder or os.getcwd()
+    ignore_patterns = config.get("ignore_patterns", []) if config else []
+    
+    # Start watching before the initial pass so changes made during it are not lost
+    events: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+    observer = start_native_watcher(input_path, events)
+    stop_polling = None
+    if observer is None:
+        print(f"watchdog is not installed, polling every {poll_interval}s")
+        # Zip archives are polled too, their members are converted when they change
+        polled_types = list(file_types) + list(ARCHIVE_EXTENSIONS) if get_archive_options(config)["enabled"] else file_types
+        stop_polling = start_polling_watcher(input_path, output_folder, polled_types, ignore_patterns, poll_interval, events)
+    
+    converted_files = convert_files(input_path, output_folder, file_types, config, jobs=jobs)
+    if converted_files:
+        update_metadata_file(project_folder, converted_files)
+    update_cursorignore(project_folder, ignore_patterns, file_types, converted_files)
+    
+    is_relevant = make_path_filter(input_path, output_folder, ignore_patterns)
+    print(f"Watching {input_path} for changes (Ctrl+C to stop)")
+    try:
+        while True:
+            batch = {path: kind for path, kind in collect_events(events, debounce).items() if is_relevant(path)}
+            if not batch:
+                continue
+            start = time.perf_counter()
+            apply_changes(input_path, output_folder, project_folder, file_types, config, jobs, batch)
+            print(f"Synced {len(batch)} changed paths in {time.perf_counter() - start:.2f}s")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+        if stop_polling is not None:
+            stop_polling.set()
@@ -0,0 +1,347 @@
+import os
+import time
+import threading
+import collections
+import concurrent.futures
+import multiprocessing
+import multiprocessing.connection
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# ----- Errors -----
+
+class WorkerError(Exception):
+    """Raised for a task whose worker process failed outside the task itself."""
+
+class ConversionTimeout(WorkerError):
+    """Raised for a task that exceeded its wall-clock timeout."""
+
+class ConversionMemoryExceeded(WorkerError):
+    """Raised for a task whose worker grew past the memory ceiling."""
+
+# ----- Memory Probes -----
+
+def get_process_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """
+    Get the resident set size of a process.
+    
+    Args:
+        pid: Process id (default: current process)
+    
+    Returns:
+        RSS in megabytes, or None if it can't be measured on this platform
+    """
+    pid = pid or os.getpid()
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+# ----- Worker Process -----
+
+def _worker_main(conn: Any, initializer: Optional[Callable[..., None]], initargs: Tuple[Any, ...], max_tasks: Optional[int], recycle_rss_mb: Optional[float]) -> None:
+    """
+    Run tasks received over a pipe until told to stop or due for recycling.
+    
+    Args:
+        conn: Pipe end connected to the supervisor
+        initializer: Optional function run once when the worker starts
+        initargs: Arguments for the initializer
+        max_tasks: Exit after this many tasks
+        recycle_rss_mb: Exit after a task that leaves RSS above this many megabytes
+    """
+    if initializer is not None:
+        initializer(*initargs)
+    # Tell the supervisor the worker is ready, so start-up isn't counted against the first task's timeout
+    conn.send(None)
+    done = 0
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+        task_id, fn, args = message
+        try:
+            result, error = fn(*args), None
+        except BaseException as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+        done += 1
+        rss = get_process_rss_mb() if recycle_rss_mb else None
+        recycle = bool(max_tasks and done >= max_tasks) or bool(rss and rss > recycle_rss_mb)
+        conn.send((task_id, result, error, recycle))
+        if recycle:
+            break
+    conn.close()
+
+# ----- Worker Pool -----
+
+class _Worker:
+    """Supervisor-side state of one worker process."""
+    
+    def __init__(self, process: Any, conn: Any) -> None:
+        self.process = process
+        self.conn = conn
+        self.task_id: Optional[int] = None
+        self.started = 0.0
+        self.ready = False
+
+class WorkerPool:
+    """
+    Process pool with a wall-clock timeout and memory ceiling per task.
+    
+    Unlike multiprocessing.Pool, a worker that hangs, grows too large or
+    crashes only fails its own task: it is killed and replaced while the
+    other tasks carry on. Workers are also recycled after a number of tasks
+    or when their RSS stays above a threshold, bounding slow leaks.
+    """
+    
+    def __init__(self, processes: int, initializer: Optional[Callable[..., None]] = None, initargs: Tuple[Any, ...] = (), timeout: Optional[float] = None, max_memory_mb: Optional[float] = None, max_tasks_per_worker: Optional[int] = None, recycle_rss_mb: Optional[float] = None, keep_warm: bool = False) -> None:
+        """
+        Args:
+            processes: Maximum number of worker processes
+            initializer: Optional function run once in each worker when it starts
+            initargs: Arguments for the initializer
+            timeout: Seconds a single task may run before its worker is killed
+            max_memory_mb: RSS in megabytes above which a busy worker is killed
+            max_tasks_per_worker: Replace a worker after this many tasks
+            recycle_rss_mb: Replace a worker whose RSS is above this after a task
+            keep_warm: Start every worker right away and replace recycled ones before any
+                task needs them, instead of starting workers on demand
+        """
+        self.processes = max(1, processes)
+        self.initializer = initializer
+        self.initargs = initargs
+        self.timeout = timeout
+        self.max_memory_mb = max_memory_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.recycle_rss_mb = recycle_rss_mb
+        self.keep_warm = keep_warm
+        
+        # Workers are started while I/O threads run lazy imports; a plain fork of a threaded
+        # process can leave a child stuck on a lock one of those threads held
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        if self._context.get_start_method() == "forkserver" and initializer is not None:
+            # Recycled workers fork from a server that already imported the initializer's module
+            self._context.set_forkserver_preload(["__main__", initializer.__module__])
+        self._workers: List[_Worker] = []
+        self._pending: Deque[Tuple[int, Callable[..., Any], Tuple[Any, ...]]] = collections.deque()
+        self._futures: Dict[int, "concurrent.futures.Future[Any]"] = {}
+        self._next_task_id = 0
+        self._lock = threading.Lock()
+        self._closing = False
+        self._cancelling = False
+        self._wake_reader, self._wake_writer = multiprocessing.Pipe(duplex=False)
+        self._wake_pending = False
+        self._supervisor = threading.Thread(target=self._supervise, name="cvmd-supervisor", daemon=True)
+        self._supervisor.start()
+    
+    def submit(self, fn: Callable[..., Any], *args: Any) -> "concurrent.futures.Future[Any]":
+        """
+        Schedule fn(*args) on a worker process.
+        
+        Args:
+            fn: Module-level function to run in the worker
+            *args: Picklable arguments for fn
+        
+        Returns:
+            Future resolved with the result, or failed with WorkerError/ConversionTimeout/ConversionMemoryExceeded
+        """
+        future: "concurrent.futures.Future[Any]" = concurrent.futures.Future()
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("cannot submit to a pool that is shutting down")
+            task_id = self._next_task_id
+            self._next_task_id += 1
+            self._futures[task_id] = future
+            self._pending.append((task_id, fn, args))
+        self._wake()
+        return future
+    
+    def shutdown(self, cancel: bool = False) -> None:
+        """
+        Stop the pool once submitted tasks are finished.
+        
+        Args:
+            cancel: Cancel tasks not started yet and kill busy workers instead of waiting
+        """
+        if not self._supervisor.is_alive():
+            return
+        with self._lock:
+            self._closing = True
+            if cancel:
+                self._cancelling = True
+                while self._pending:
+                    task_id, _, _ = self._pending.popleft()
+                    self._futures.pop(task_id).cancel()
+        self._wake()
+        self._supervisor.join()
+    
+    def __enter__(self) -> "WorkerPool":
+        return self
+    
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.shutdown(cancel=exc_type is not None)
+    
+    def _wake(self) -> None:
+        with self._lock:
+            if self._wake_pending:
+                return
+            self._wake_pending = True
+        self._wake_writer.send(None)
+    
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.initializer, self.initargs, self.max_tasks_per_worker, self.recycle_rss_mb),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        self._workers.append(worker)
+        return worker
+    
+    def _kill(self, worker: _Worker) -> None:
+        worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+        self._workers.remove(worker)
+    
+    def _retire(self, worker: _Worker) -> None:
+        worker.process.join()
+        worker.conn.close()
+        self._workers.remove(worker)
+    
+    def _fail(self, worker: _Worker, error: Exception) -> None:
+        future = self._futures.pop(worker.task_id, None) if worker.task_id is not None else None
+        worker.task_id = None
+        if future is not None:
+            future.set_exception(error)
+    
+    def _dispatch(self) -> None:
+        sends: List[Tuple[_Worker, Tuple[int, Callable[..., Any], Tuple[Any, ...]]]] = []
+        with self._lock:
+            # Start enough workers for the queued tasks; they take work once ready
+            starting = sum(1 for w in self._workers if not w.ready)
+            warm = self.keep_warm and not self._closing
+            while len(self._workers) < self.processes and (warm or starting < len(self._pending)):
+                self._spawn()
+                starting += 1
+            while self._pending:
+                idle = next((w for w in self._workers if w.ready and w.task_id is None), None)
+                if idle is None:
+                    break
+                task_id, fn, args = self._pending.popleft()
+                if not self._futures[task_id].set_running_or_notify_cancel():
+                    del self._futures[task_id]
+                    continue
+                idle.task_id = task_id
+                sends.append((idle, (task_id, fn, args)))
+        # Documents are sent outside the lock, so sending a large one doesn't hold up submit()
+        for worker, message in sends:
+            try:
+                worker.conn.send(message)
+            except OSError:
+                # The worker died, its closed pipe fails the task on the next wait
+                pass
+            worker.started = time.monotonic()
+    
+    def _check_limits(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for worker in list(self._workers):
+                if worker.task_id is None:
+                    continue
+                if self._cancelling:
+                    self._kill(worker)
+                    self._fail(worker, WorkerError("cancelled"))
+                    continue
+                if self.timeout and now - worker.started > self.timeout:
+                    self._kill(worker)
+                    self._fail(worker, ConversionTimeout(f"timed out after {self.timeout:g}s"))
+                    continue
+                if self.max_memory_mb:
+                    rss = get_process_rss_mb(worker.process.pid)
+                    if rss is not None and rss > self.max_memory_mb:
+                        self._kill(worker)
+                        self._fail(worker, ConversionMemoryExceeded(f"killed at {rss:.0f} MB RSS (limit {self.max_memory_mb:g} MB)"))
+    
+    def _handle_message(self, worker: _Worker) -> None:
+        with self._lock:
+            try:
+                message = worker.conn.recv()
+            except (EOFError, OSError):
+                # The worker died mid-task (crash, OOM killer, ...)
+                worker.process.join(timeout=1)
+                exitcode = worker.process.exitcode
+                self._kill(worker)
+                if not worker.ready:
+                    # The initializer itself fails, respawning would only loop
+                    self.keep_warm = False
+                    while self._pending:
+                        task_id, _, _ = self._pending.popleft()
+                        self._futures.pop(task_id).set_exception(WorkerError(f"worker failed to start (exit code {exitcode})"))
+                    return
+                self._fail(worker, WorkerError(f"worker exited unexpectedly (exit code {exitcode})"))
+                return
+            if message is None:
+                worker.ready = True
+                return
+            task_id, result, error, recycle = message
+            future = self._futures.pop(task_id, None)
+            worker.task_id = None
+            if recycle:
+                self._retire(worker)
+        if future is None:
+            return
+        if error is not None:
+            future.set_exception(WorkerError(error))
+        else:
+            future.set_result(result)
+    
+    def _supervise(self) -> None:
+        # Poll often enough to enforce limits, otherwise sleep until woken
+        interval = 0.25 if (self.timeout or self.max_memory_mb) else None
+        while True:
+            self._dispatch()
+            with self._lock:
+                done = self._closing and not self._pending and all(w.task_id is None for w in self._workers)
+                conns = [w.conn for w in self._workers if w.task_id is not None or not w.ready]
+            if done:
+                break
+            ready = multiprocessing.connection.wait(conns + [self._wake_reader], timeout=interval)
+            for conn in ready:
+                if conn is self._wake_reader:
+                    with self._lock:
+                        self._wake_pending = False
+                    self._wake_reader.recv()
+                    continue
+                worker = next((w for w in self._workers if w.conn is conn), None)
+                if worker is not None:
+                    self._handle_message(worker)
+            self._check_limits()
+        
+        # Ask idle workers to exit, kill any that don't
+        for worker in list(self._workers):
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+            worker.conn.close()
+        self._workers.clear()
+        self._wake_reader.close()
+        self._wake_writer.close()
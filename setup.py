@@ -15,13 +15,16 @@ setup(
     long_description=long_description,
     long_description_content_type='text/markdown',
     url='https://github.com/chient369/doc2md_tool',
-    py_modules=['convert_utils', 'convert_cli'],
+    py_modules=['convert_utils', 'convert_cli', 'convert_watch', 'convert_workers', 'convert_search', 'convert_markdown', 'convert_pipeline', 'convert_cache', 'convert_snapshot', 'convert_server', 'convert_schedule', 'convert_archive'],
     packages=find_packages(),
     include_package_data=True,
     install_requires=[
         'markitdown',
         'requests>=2.25.0',
     ],
+    extras_require={
+        'watch': ['watchdog'],
+    },
     entry_points={
         'console_scripts': [
             'cvmd=convert_cli:main',
@@ -0,0 +1,47 @@
+"""
+Startup budget of the cvmd CLI.
+
+"cvmd --help" must stay close to a bare interpreter start and must not load
+the conversion stack, which is only imported once a file needs converting.
+"""
+import os
+import sys
+import time
+import statistics
+import subprocess
+from typing import List, Set
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Allowed "cvmd --help" wall time above "python -c pass", in milliseconds
+STARTUP_BUDGET_MS = 100
+# Modules that must not be imported just to print the CLI help
+HEAVY_MODULES = ["markitdown", "requests", "pdfminer", "pandas", "concurrent", "multiprocessing"]
+# Runs per measurement, the median is compared so one slow start doesn't fail the test
+REPEAT = 5
+
+def run_python(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable] + args, cwd=REPO_DIR, capture_output=True, text=True, check=True)
+
+def wall_ms(args: List[str]) -> float:
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        run_python(args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def imported_packages(args: List[str]) -> Set[str]:
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    stderr = run_python(["-X", "importtime"] + args).stderr
+    names = [line.rsplit("|", 1)[-1].strip() for line in stderr.splitlines() if line.startswith("import time:") and "|" in line]
+    return {name.split(".")[0] for name in names}
+
+def test_help_does_not_import_heavy_modules():
+    loaded = imported_packages(["convert_cli.py", "--help"])
+    assert [name for name in HEAVY_MODULES if name in loaded] == []
+
+def test_help_within_startup_budget():
+    run_python(["convert_cli.py", "--help"])  # warm the bytecode cache
+    overhead_ms = wall_ms(["convert_cli.py", "--help"]) - wall_ms(["-c", "pass"])
+    assert overhead_ms <= STARTUP_BUDGET_MS, f"cvmd --help took {overhead_ms:.1f} ms above a bare interpreter"